@@ -0,0 +1,71 @@
+"""
+Сравнение двух файлов результатов benchmarks/ml_services.py (например, двух коммитов).
+
+Сочетания сопоставляются по методу, степени, размеру изображения и числу потоков. Для каждого выводится
+изменение медианы полного времени, времени этапов и пикового Rss. Код возврата 1, если медиана какого-либо
+сочетания выросла больше чем на --threshold процентов (для проверки регрессий в CI).
+
+Запуск из папки tg-bot:
+    python -m benchmarks.compare bench-results/base.json bench-results/new.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+
+def load_results(path: str) -> tuple[dict, dict]:
+    with open(path) as f:
+        report = json.load(f)
+
+    results = {(r["method"], r["degree"], r["imsize"], r["threads"]): r for r in report["results"]}
+    return report["meta"], results
+
+
+def change(base: float, new: float) -> float:
+    return 100 * (new - base) / base if base else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=None, help="допустимый рост медианы времени, %%")
+    args = parser.parse_args()
+
+    base_meta, base_results = load_results(args.base)
+    new_meta, new_results = load_results(args.new)
+
+    print(f"base: {base_meta.get('commit')} ({base_meta.get('created_at')})")
+    print(f"new:  {new_meta.get('commit')} ({new_meta.get('created_at')})")
+    if base_meta.get("platform") != new_meta.get("platform") or base_meta.get("torch") != new_meta.get("torch"):
+        print("Внимание: результаты получены в разных окружениях")
+
+    print(f"{'method':>6} | {'degree':>6} | {'imsize':>6} | {'threads':>7} | {'base, s':>8} | {'new, s':>8} | "
+          f"{'change':>7} | {'rss':>7} | stages (change)")
+
+    regressions = []
+
+    for key in sorted(base_results.keys() & new_results.keys()):
+        base, new = base_results[key], new_results[key]
+
+        latency_change = change(base["latency"]["median"], new["latency"]["median"])
+        rss_change = change(base["peak_rss"], new["peak_rss"])
+        stages = " ".join(f"{stage}={change(seconds, new['stages'][stage]):+.0f}%"
+                          for stage, seconds in base["stages"].items() if stage in new["stages"])
+
+        print(f"{key[0]:>6} | {key[1]:>6} | {key[2]:>6} | {key[3]:>7} | {base['latency']['median']:>8.3f} | "
+              f"{new['latency']['median']:>8.3f} | {latency_change:>+6.1f}% | {rss_change:>+6.1f}% | {stages}")
+
+        if args.threshold is not None and latency_change > args.threshold:
+            regressions.append(key)
+
+    for key in sorted(base_results.keys() ^ new_results.keys()):
+        print(f"Сочетание {key} есть только в {'base' if key in base_results else 'new'}")
+
+    if regressions:
+        print(f"Регрессии больше {args.threshold}%: {len(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Сравнение оптимизации Гатиса по одной задаче (GatysModel) и батчами задач разных пользователей (BatchedGatysModel).
+
+Набор задач - пары контент/стиль из materials/test-data, все задачи приходят одновременно и выполняют одинаковое
+число итераций (без досрочной остановки). Задачи оптимизируются по одной или батчами по --batch-sizes; выводятся:
+* пропускная способность, задач в час
+* средняя задержка задачи: от прихода всех задач до готовности её результата
+* максимальное отличие результата задачи от её одиночной оптимизации (0 - побитовое совпадение)
+
+Запуск из папки tg-bot:
+    python -m benchmarks.gatys_batching --degree 3 --steps 50 --batch-sizes 2 4
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+import torch
+from PIL import Image
+from torchvision.transforms import ToTensor
+
+from ml_services.gatys_model import GatysModel, BatchedGatysModel, gatys_model_config, bf16_supported
+from ml_services.model_loader import load_base_cnn
+
+
+TEST_DATA_DIR = os.path.join("..", "materials", "test-data")
+
+
+def load_image(path: str, imsize) -> torch.Tensor:
+    return ToTensor()(Image.open(path).convert("RGB").resize(imsize)).unsqueeze(0)
+
+
+def optimize(model_class, base_cnn, content, style, degree: str, steps: int, mixed_precision: bool):
+    config = gatys_model_config[degree]
+    device = gatys_model_config["DEVICE"]
+
+    model = model_class(base_cnn=base_cnn, content_img=content, style_img=style, device=device,
+                        content_layers=config["CONTENT_LAYERS"], style_layers=config["STYLE_LAYERS"])
+
+    return model.transfer_style(content.clone(), device, optimizer_class=gatys_model_config["OPTIMIZER"],
+                                lr=config["LR"], num_steps=steps, style_weight=config["STYLE_WEIGHT"],
+                                scheduler_step=config["SCHEDULER_STEP"], gamma=config["GAMMA"],
+                                mixed_precision=mixed_precision)
+
+
+def run(base_cnn, contents, styles, degree: str, steps: int, batch_size: int | None,
+        mixed_precision: bool) -> tuple[list[torch.Tensor], list[float], float]:
+    """
+    Результаты задач, задержка каждой задачи и общее время. batch_size=None - по одной задаче через GatysModel.
+    """
+    outputs = []
+    latencies = []
+
+    started_at = time.perf_counter()
+    for start in range(0, len(contents), batch_size or 1):
+        end = start + (batch_size or 1)
+
+        if batch_size is None:
+            outputs.append(optimize(GatysModel, base_cnn, contents[start], styles[start], degree, steps,
+                                    mixed_precision).detach())
+        else:
+            outputs.extend(optimize(BatchedGatysModel, base_cnn, torch.cat(contents[start:end]),
+                                    torch.cat(styles[start:end]), degree, steps, mixed_precision))
+
+        latencies.extend([time.perf_counter() - started_at] * (len(outputs) - len(latencies)))
+
+    return outputs, latencies, time.perf_counter() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contents", nargs="+", default=[os.path.join(TEST_DATA_DIR, "contents", name) for name in
+                                                          ("duck.jpg", "forest.jpg", "koala.jpg", "me.jpg")])
+    parser.add_argument("--styles", nargs="+", default=[os.path.join(TEST_DATA_DIR, "styles", name) for name in
+                                                        ("vangog.jpg", "picasso.jpg", "mun.jpg", "popart1.jpg")],
+                        help="i-я задача стилизуется (i mod число стилей)-м стилем")
+    parser.add_argument("--degree", default="3", choices=["1", "2", "3", "4", "5"])
+    parser.add_argument("--imsize", type=int, default=gatys_model_config["IMSIZE"][0])
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[2, 4])
+    parser.add_argument("--mixed-precision", action="store_true",
+                        help="bfloat16 (если устройство его поддерживает)")
+    parser.add_argument("--output", default=None, help="JSON-файл результатов")
+    args = parser.parse_args()
+
+    device = gatys_model_config["DEVICE"]
+    mixed_precision = args.mixed_precision and bf16_supported(device)
+    imsize = (args.imsize, args.imsize)
+
+    base_cnn = load_base_cnn(device, fold_normalization=gatys_model_config["FOLD_NORMALIZATION"])
+    contents = [load_image(path, imsize).to(device) for path in args.contents]
+    styles = [load_image(args.styles[i % len(args.styles)], imsize).to(device) for i in range(len(contents))]
+
+    # прогрев: выделение памяти и пулы потоков под размер изображения
+    optimize(GatysModel, base_cnn, contents[0], styles[0], args.degree, 2, mixed_precision)
+
+    print(f"device={device} imsize={imsize} degree={args.degree} steps={args.steps} jobs={len(contents)} "
+          f"threads={torch.get_num_threads()}{' bf16' if mixed_precision else ''}")
+    print(f"{'batch':>5} | {'time, s':>8} | {'jobs/hour':>9} | {'speedup':>7} | {'mean latency, s':>15} | "
+          f"{'max diff':>8}")
+
+    references = None
+    single_seconds = None
+    results = []
+
+    for batch_size in [None] + args.batch_sizes:
+        outputs, latencies, seconds = run(base_cnn, contents, styles, args.degree, args.steps, batch_size,
+                                          mixed_precision)
+
+        if references is None:
+            references = outputs
+            single_seconds = seconds
+
+        max_diff = max((output - reference).abs().max().item() for output, reference in zip(outputs, references))
+
+        result = {
+            "batch_size": batch_size or 1,
+            "batched": batch_size is not None,
+            "seconds": seconds,
+            "jobs_per_hour": len(contents) * 3600 / seconds,
+            "speedup": single_seconds / seconds,
+            "mean_latency": statistics.fmean(latencies),
+            "max_diff": max_diff
+        }
+        results.append(result)
+
+        label = str(batch_size) if batch_size is not None else "-"
+        print(f"{label:>5} | {seconds:>8.2f} | {result['jobs_per_hour']:>9.0f} | {result['speedup']:>6.2f}x | "
+              f"{result['mean_latency']:>15.2f} | {max_diff:>8.1e}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "device": str(device), "threads": torch.get_num_threads(),
+                       "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
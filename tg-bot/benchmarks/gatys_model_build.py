@@ -0,0 +1,111 @@
+"""
+Сравнение времени построения GatysModel с прежним способом построения модели.
+
+Прежний способ на каждом слое с потерей прогонял изображение через всю уже собранную часть сети,
+а сеть всегда состояла из всех 35 слоёв VGG-19. Текущий - один прямой проход на изображение и сеть,
+обрезанная после самого глубокого слоя с потерей.
+
+Запуск из папки tg-bot:
+    python -m benchmarks.gatys_model_build
+"""
+import argparse
+import os
+import time
+
+import torch
+import torch.nn as nn
+from torchvision.models import vgg19
+from torchvision.transforms import ToTensor
+from PIL import Image
+
+from ml_services.gatys_model import GatysModel, gatys_model_config
+from ml_services.gatys_model.gatys_model import VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD
+from ml_services.gatys_model.modules import Normalization, ContentLoss, StyleLoss
+
+
+TEST_DATA_DIR = os.path.join("..", "materials", "test-data")
+VGG19_WEIGHTS = os.path.join("ml_services", "models", "vgg19_encoder_weights.pt")
+
+
+def build_legacy(base_cnn, content_img, style_img, device, content_layers, style_layers) -> nn.Sequential:
+    """
+    Прежний алгоритм построения модели (для сравнения).
+    """
+    model = nn.Sequential().to(device)
+    model.add_module("ImageNorm", Normalization(mean=VGG19_NORMALIZATION_MEAN, std=VGG19_NORMALIZATION_STD))
+
+    conv_counter = 0
+    module_name = ""
+
+    for layer in base_cnn.children():
+        if isinstance(layer, nn.Conv2d):
+            conv_counter += 1
+            module_name = f"Conv_{conv_counter}"
+        elif isinstance(layer, nn.ReLU):
+            module_name = f"ReLU_{conv_counter}"
+            layer = nn.ReLU(inplace=False)
+        elif isinstance(layer, nn.MaxPool2d):
+            module_name = f"MaxPool2d_{conv_counter}"
+
+        model.add_module(module_name, layer.to(device))
+
+        if module_name in content_layers:
+            model.add_module(f"ContentLoss_{conv_counter}", ContentLoss(model(content_img).detach()))
+
+        if module_name in style_layers:
+            model.add_module(f"StyleLoss_{conv_counter}", StyleLoss(model(style_img).detach()))
+
+    return model
+
+
+def load_image(path: str, imsize) -> torch.Tensor:
+    return ToTensor()(Image.open(path).resize(imsize))[:3].unsqueeze(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--content", default=os.path.join(TEST_DATA_DIR, "contents", "koala.jpg"))
+    parser.add_argument("--style", default=os.path.join(TEST_DATA_DIR, "styles", "vangog.jpg"))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    device = gatys_model_config["DEVICE"]
+    imsize = gatys_model_config["IMSIZE"]
+
+    base_cnn = vgg19().features[0: 35]
+    if os.path.exists(VGG19_WEIGHTS):
+        base_cnn.load_state_dict(torch.load(VGG19_WEIGHTS, map_location=device))
+    base_cnn = base_cnn.to(device)
+    for param in base_cnn.parameters():
+        param.requires_grad = False
+
+    content = load_image(args.content, imsize).to(device)
+    style = load_image(args.style, imsize).to(device)
+
+    print(f"device={device} imsize={imsize} repeats={args.repeats}")
+    print(f"{'degree':>6} | {'legacy, s':>9} | {'single-pass, s':>14} | {'speedup':>7} | {'layers':>7}")
+
+    for degree in map(str, range(1, 6)):
+        content_layers = gatys_model_config[degree]["CONTENT_LAYERS"]
+        style_layers = gatys_model_config[degree]["STYLE_LAYERS"]
+
+        legacy_time = new_time = 0.0
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            legacy_model = build_legacy(base_cnn, content, style, device, content_layers, style_layers)
+            legacy_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            new_model = GatysModel(base_cnn=base_cnn, content_img=content, style_img=style, device=device,
+                                   content_layers=content_layers, style_layers=style_layers)
+            new_time += time.perf_counter() - start
+
+        legacy_time /= args.repeats
+        new_time /= args.repeats
+
+        print(f"{degree:>6} | {legacy_time:>9.3f} | {new_time:>14.3f} | {legacy_time / new_time:>6.1f}x | "
+              f"{len(legacy_model):>3}->{len(new_model.model):<3}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Воспроизводимый бенчмарк ML-сервисов.
+
+Задачи стилизации (ml_services/transfer_style.py) вызываются напрямую в текущем процессе, без брокера
+и воркеров celery, на изображениях из materials/test-data. Для каждого сочетания метода, степени стилизации,
+размера изображения и числа потоков torch измеряются:
+* время этапов задачи (ml_services/stage_timer.py): decode, resize, build, optimize / infer, encode
+  (batch_wait - только при батчинге Гатиса)
+* полное время задачи (медиана, p90) и пропускная способность (изображений в секунду при последовательном запуске)
+* пиковый Rss процесса (Linux: пик сбрасывается перед каждым сочетанием через /proc/self/clear_refs)
+
+Чтобы объём работы не зависел от скорости машины, по умолчанию у Гатиса отключены досрочная остановка
+(STOPPING) и пирамида, а окна микробатчеров равны нулю (задачи запускаются по одной, батчинг Гатиса
+сравнивается отдельно - benchmarks/gatys_batching.py). Статистики стиля AdaIN не кэшируются между запусками
+(измеряется холодный путь), если не указан --style-cache. Redis для бенчмарка не нужен.
+
+Результаты пишутся в JSON вместе с коммитом и окружением, два файла сравниваются скриптом benchmarks/compare.py.
+
+Запуск из папки tg-bot:
+    python -m benchmarks.ml_services --output bench-results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.ml_services --methods adain --sizes 256 512 --threads 1 4 --repeats 5
+"""
+import argparse
+import copy
+import datetime
+import json
+import logging
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import time
+import uuid
+
+import torch
+from redis import RedisError
+
+from celery_config import TASK_REQUESTERS_KEY
+from ml_services import transfer_style, cancellation, task_events
+from ml_services.adain_model import adain_model_config, StyleStatsCache
+from ml_services.gatys_model import gatys_model_config, bf16_supported
+from ml_services.stage_timer import STAGE_TIMER, STAGES
+
+
+TEST_DATA_DIR = os.path.join("..", "materials", "test-data")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def list_images(directory: str) -> list[str]:
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def git_commit() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout
+        status = subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+    return {"commit": commit.strip(), "dirty": bool(status.strip())}
+
+
+def reset_peak_rss() -> bool:
+    """
+    Сброс пикового Rss процесса (VmHWM). Возвращает False, если сброс не поддерживается -
+    тогда пик считается за всё время жизни процесса.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """
+    Пиковый Rss процесса в байтах.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    # ru_maxrss в Linux - в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(round(q * (len(values) - 1))), len(values) - 1)]
+
+
+def configure(method: str, imsize: int, args):
+    """
+    Изменение конфигурации моделей под сочетание бенчмарка (исходная конфигурация восстанавливается после него).
+    """
+    if method == "gatys":
+        gatys_model_config["IMSIZE"] = (imsize, imsize)
+        if not args.pyramid:
+            gatys_model_config["PYRAMID"]["ENABLED"] = False
+
+        for degree in map(str, range(1, 6)):
+            if not args.early_stop:
+                gatys_model_config[degree].pop("STOPPING", None)
+            if args.gatys_steps is not None:
+                gatys_model_config[degree]["NUM_STEPS"] = args.gatys_steps
+            if args.mixed_precision:
+                gatys_model_config[degree]["MIXED_PRECISION"] = True
+
+        transfer_style.GATYS_BATCHER.window = args.batch_window
+    else:
+        adain_model_config["IMSIZE"] = (imsize, imsize)
+        transfer_style.ADAIN_BATCHER.window = args.batch_window
+
+    # без кэша статистик стиля каждый запуск AdaIN кодирует стиль заново
+    transfer_style.STYLE_CACHE = StyleStatsCache(max_bytes=adain_model_config["STYLE_CACHE_MAX_BYTES"]
+                                                 if args.style_cache else 0)
+
+
+def run_task(method: str, content_key: str, style_key: str, degree: int) -> float:
+    """
+    Вызов задачи в текущем процессе. Возвращает полное время задачи в секундах.
+    """
+    task = transfer_style.transfer_style_by_gatys if method == "gatys" else transfer_style.transfer_style_by_adain
+    task_id = f"benchmark-{uuid.uuid4()}"
+
+    # задача без ожидающих не запускается; без Redis проверка отмены пропускается
+    try:
+        cancellation.redis.sadd(TASK_REQUESTERS_KEY.format(task_id=task_id), 0)
+        cancellation.redis.expire(TASK_REQUESTERS_KEY.format(task_id=task_id), 60 * 60)
+    except RedisError:
+        pass
+
+    started_at = time.perf_counter()
+    transfer_style.BLOB_STORE.delete(task.apply(args=(content_key, style_key, degree), task_id=task_id).get())
+    return time.perf_counter() - started_at
+
+
+def benchmark(method: str, degree: int, imsize: int, threads: int, pairs: list[tuple[str, str]], args) -> dict:
+    torch.set_num_threads(threads)
+    torch.manual_seed(0)
+
+    # прогревочный запуск: выделение памяти и пулы потоков под новый размер и число потоков
+    run_task(method, *pairs[0], degree)
+
+    peak_resettable = reset_peak_rss()
+
+    latencies = []
+    stages = {}
+    for _ in range(args.repeats):
+        for content_key, style_key in pairs:
+            latencies.append(run_task(method, content_key, style_key, degree))
+            for stage, seconds in STAGE_TIMER.stages().items():
+                stages.setdefault(stage, []).append(seconds)
+
+    return {
+        "method": method,
+        "degree": degree,
+        "imsize": imsize,
+        "threads": threads,
+        "samples": len(latencies),
+        "latency": {
+            "median": statistics.median(latencies),
+            "p90": percentile(latencies, 0.9),
+            "mean": statistics.fmean(latencies),
+            "min": min(latencies)
+        },
+        "stages": {stage: statistics.median(stages[stage]) for stage in STAGES if stage in stages},
+        "throughput": len(latencies) / sum(latencies),
+        "peak_rss": peak_rss(),
+        "peak_rss_resettable": peak_resettable
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contents", nargs="+", default=None, help="по умолчанию - все изображения test-data/contents")
+    parser.add_argument("--style", default=os.path.join(TEST_DATA_DIR, "styles", "vangog.jpg"))
+    parser.add_argument("--methods", nargs="+", choices=["gatys", "adain"], default=["gatys", "adain"])
+    parser.add_argument("--degrees", nargs="+", type=int, default=[1, 2, 3, 4, 5])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[256, 512])
+    parser.add_argument("--threads", nargs="+", type=int, default=sorted({1, torch.get_num_threads()}))
+    parser.add_argument("--repeats", type=int, default=3, help="повторов на каждое изображение контента")
+    parser.add_argument("--gatys-steps", type=int, default=None, help="NUM_STEPS для всех степеней Гатиса")
+    parser.add_argument("--early-stop", action="store_true", help="не отключать досрочную остановку Гатиса")
+    parser.add_argument("--pyramid", action="store_true", help="не отключать пирамидальный режим Гатиса")
+    parser.add_argument("--mixed-precision", action="store_true",
+                        help="Гатис в bfloat16 для всех степеней (если устройство его поддерживает)")
+    parser.add_argument("--batch-window", type=float, default=0.0, help="окно микробатчеров, с")
+    parser.add_argument("--style-cache", action="store_true", help="кэшировать статистики стиля AdaIN")
+    parser.add_argument("--output", default=None, help="JSON-файл результатов")
+    args = parser.parse_args()
+
+    if args.contents is None:
+        args.contents = list_images(os.path.join(TEST_DATA_DIR, "contents"))
+
+    # без Redis каждая задача предупреждала бы о неопубликованных событиях
+    logging.getLogger(task_events.__name__).setLevel(logging.ERROR)
+
+    transfer_style.load_models()
+    transfer_style.warm_up_models()
+
+    with open(args.style, "rb") as f:
+        style_key = transfer_style.BLOB_STORE.put(f.read())
+
+    pairs = []
+    for path in args.contents:
+        with open(path, "rb") as f:
+            pairs.append((transfer_style.BLOB_STORE.put(f.read()), style_key))
+
+    original_configs = copy.deepcopy(gatys_model_config), copy.deepcopy(adain_model_config)
+    original_threads = torch.get_num_threads()
+
+    results = []
+
+    print(f"contents={len(pairs)} repeats={args.repeats}")
+    print(f"{'method':>6} | {'degree':>6} | {'imsize':>6} | {'threads':>7} | {'median, s':>9} | {'p90, s':>7} | "
+          f"{'img/s':>6} | {'peak rss, MB':>12} | stages (median, ms)")
+
+    try:
+        for method in args.methods:
+            for imsize in args.sizes:
+                for threads in args.threads:
+                    for degree in args.degrees:
+                        configure(method, imsize, args)
+
+                        result = benchmark(method, degree, imsize, threads, pairs, args)
+                        results.append(result)
+
+                        gatys_model_config.update(copy.deepcopy(original_configs[0]))
+                        adain_model_config.update(copy.deepcopy(original_configs[1]))
+
+                        stages = " ".join(f"{stage}={seconds * 1000:.0f}"
+                                          for stage, seconds in result["stages"].items())
+                        print(f"{method:>6} | {degree:>6} | {imsize:>6} | {threads:>7} | "
+                              f"{result['latency']['median']:>9.3f} | {result['latency']['p90']:>7.3f} | "
+                              f"{result['throughput']:>6.2f} | {result['peak_rss'] / 2**20:>12.1f} | {stages}")
+    finally:
+        torch.set_num_threads(original_threads)
+
+        for key in {style_key for _, style_key in pairs} | {content_key for content_key, _ in pairs}:
+            transfer_style.BLOB_STORE.delete(key)
+
+    report = {
+        "meta": {
+            **git_commit(),
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "gatys_device": str(gatys_model_config["DEVICE"]),
+            "gatys_bf16_supported": bf16_supported(gatys_model_config["DEVICE"]),
+            "adain_device": str(adain_model_config["DEVICE"]),
+            "adain_backend": adain_model_config["BACKEND"],
+            "adain_quantized": adain_model_config["QUANTIZED"],
+            "args": vars(args)
+        },
+        "results": results
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Результаты записаны в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
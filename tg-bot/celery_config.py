@@ -7,4 +7,47 @@ app = Celery(
     'ml_services',
     broker=f'redis://{app_config.redis.HOST}:{app_config.redis.PORT}/1',
     backend=f'redis://{app_config.redis.HOST}:{app_config.redis.PORT}/1',
-)
\ No newline at end of file
+)
+
+# Через celery передаются только ключи изображений (см. services/blob_store.py),
+# а результаты задач удаляются из Redis одновременно с самими изображениями.
+app.conf.result_expires = app_config.blob_store.TTL
+
+
+# Отдельные очереди для методов: долгие задачи Гатиса не задерживают быстрые задачи AdaIN.
+# Воркеры каждой очереди запускаются отдельно (см. entrypoint.sh).
+GATYS_QUEUE = "gatys"
+ADAIN_QUEUE = "adain"
+
+app.conf.task_routes = {
+    "ml_services.transfer_style.transfer_style_by_gatys": {"queue": GATYS_QUEUE},
+    "ml_services.transfer_style.transfer_style_by_adain": {"queue": ADAIN_QUEUE},
+    "ml_services.transfer_style.transfer_style_by_adain_album": {"queue": ADAIN_QUEUE},
+}
+
+# Воркер не резервирует задачи впрок: пока он занят долгой задачей, остальные задачи очереди достаются свободным
+# воркерам. Подтверждение - после выполнения, чтобы задача упавшего воркера вернулась в очередь.
+app.conf.worker_prefetch_multiplier = 1
+app.conf.task_acks_late = True
+
+# Приоритеты задач (0 - наивысший) в Redis-брокере: по подочереди на каждый приоритет (см. services/fair_queue.py)
+app.conf.broker_transport_options = {
+    "queue_order_strategy": "priority",
+    "priority_steps": list(range(10)),
+    "sep": ":",
+}
+
+
+# канал Redis pub/sub, в который воркеры публикуют события задач (завершение и т.п.)
+TASK_EVENTS_CHANNEL = "ml_services:task_events"
+
+# множество пользователей, ожидающих результат задачи (ключ в db 1, общей для бота и воркеров):
+# если множество пусто или его время жизни (дедлайн задачи) истекло, задача отменяется
+TASK_REQUESTERS_KEY = "ml_services:requesters:{task_id}"
+TASK_REQUESTERS_DB = 1
+
+# заголовок задачи со временем её постановки в очередь (time.time() на стороне бота), см. ml_services/task_metrics.py
+TASK_ENQUEUED_AT_HEADER = "enqueued_at"
+
+# состояние событий прогресса долгих задач (остальные события - завершение задачи)
+PROGRESS_STATE = "PROGRESS"
\ No newline at end of file
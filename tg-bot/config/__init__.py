@@ -1 +1 @@
-from .config import Config, load_config
\ No newline at end of file
+from .config import Config, SpoolConfig, load_config
\ No newline at end of file
@@ -1,4 +1,6 @@
 import dataclasses
+import os
+
 import environs
 
 
@@ -15,10 +17,53 @@ class RedisConfig:
     PORT: int
 
 
+@dataclasses.dataclass
+class BlobStoreConfig:
+    DIR: str
+    TTL: int
+
+
+@dataclasses.dataclass
+class SpoolConfig:
+    BACKEND: str
+    MAX_BYTES: int
+    TTL: int
+
+
+@dataclasses.dataclass
+class ResultCacheConfig:
+    MAX_BYTES: int
+
+
+@dataclasses.dataclass
+class QueuesConfig:
+    QUOTA_WINDOW: int
+    GATYS_QUOTA: int
+    ADAIN_QUOTA: int
+    GATYS_DEADLINE: int
+    ADAIN_DEADLINE: int
+
+
+@dataclasses.dataclass
+class MetricsConfig:
+    PORT: int
+
+
+@dataclasses.dataclass
+class TracingConfig:
+    FILE: str
+
+
 @dataclasses.dataclass
 class Config:
     bot: BotConfig
     redis: RedisConfig
+    blob_store: BlobStoreConfig
+    spool: SpoolConfig
+    result_cache: ResultCacheConfig
+    queues: QueuesConfig
+    metrics: MetricsConfig
+    tracing: TracingConfig
 
 
 def load_config() -> Config:
@@ -34,5 +79,30 @@ def load_config() -> Config:
         redis=RedisConfig(
             HOST=env("REDIS_HOST"),
             PORT=env("REDIS_PORT")
+        ),
+        blob_store=BlobStoreConfig(
+            DIR=env("BLOB_STORE_DIR", os.path.join(env("BOT_DIR"), "blobs")),
+            TTL=env.int("BLOB_STORE_TTL", 6 * 60 * 60)
+        ),
+        spool=SpoolConfig(
+            BACKEND=env("SPOOL_BACKEND", "memory"),
+            MAX_BYTES=env.int("SPOOL_MAX_BYTES", 256 * 1024 * 1024),
+            TTL=env.int("SPOOL_TTL", 60 * 60)
+        ),
+        result_cache=ResultCacheConfig(
+            MAX_BYTES=env.int("RESULT_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+        ),
+        queues=QueuesConfig(
+            QUOTA_WINDOW=env.int("QUOTA_WINDOW", 60 * 60),
+            GATYS_QUOTA=env.int("GATYS_QUOTA", 10),
+            ADAIN_QUOTA=env.int("ADAIN_QUOTA", 60),
+            GATYS_DEADLINE=env.int("GATYS_DEADLINE", 15 * 60),
+            ADAIN_DEADLINE=env.int("ADAIN_DEADLINE", 2 * 60)
+        ),
+        metrics=MetricsConfig(
+            PORT=env.int("METRICS_PORT", 8000)
+        ),
+        tracing=TracingConfig(
+            FILE=env("TRACE_FILE", os.path.join(env("BOT_DIR"), "traces.jsonl"))
         )
     )
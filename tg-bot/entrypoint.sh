@@ -1,4 +1,32 @@
 #!/bin/bash
-python3 -m celery -A ml_services.transfer_style worker --loglevel=INFO &
+# Отдельные воркеры для очередей gatys и adain (см. celery_config.py), чтобы долгие задачи Гатиса
+# не задерживали быстрые задачи AdaIN. Воркер загружает только модель своей очереди (WORKER_MODELS); веса
+# отображены из файлов (mmap), поэтому воркеры одной очереди делят одну копию весов в памяти.
 
-python3 main.py
\ No newline at end of file
+# Метрики Prometheus: все процессы пишут их в общую папку, бот отдаёт сумму на METRICS_PORT (services/metrics.py).
+# Папка очищается при старте, иначе в метрики попадут значения процессов прошлого запуска.
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Гатис: воркеры с пулом потоков - задачи из разных потоков одного воркера оптимизируются батчером одним батчем.
+# Одновременно выполняется столько задач, сколько ядер хватает при GATYS_TORCH_THREADS потоках torch на задачу:
+# по умолчанию столько же воркеров по одной задаче; при GATYS_WORKERS=1 (GPU, батчи) - все задачи в одном воркере
+GATYS_TORCH_THREADS=${GATYS_TORCH_THREADS:-4}
+GATYS_SLOTS=$(( $(nproc) / GATYS_TORCH_THREADS > 0 ? $(nproc) / GATYS_TORCH_THREADS : 1 ))
+GATYS_WORKERS=${GATYS_WORKERS:-$GATYS_SLOTS}
+GATYS_CONCURRENCY=${GATYS_CONCURRENCY:-$(( GATYS_SLOTS / GATYS_WORKERS > 0 ? GATYS_SLOTS / GATYS_WORKERS : 1 ))}
+
+for i in $(seq 1 $GATYS_WORKERS); do
+    WORKER_MODELS=gatys TORCH_NUM_THREADS=$GATYS_TORCH_THREADS \
+        python3 -m celery -A ml_services.transfer_style worker \
+        -Q gatys -n gatys$i@%h --pool=threads --concurrency=$GATYS_CONCURRENCY --loglevel=INFO &
+done
+
+# AdaIN: несколько воркеров с пулом потоков: задачи AdaIN из разных потоков собираются батчером в один батч
+for i in $(seq 1 ${ADAIN_WORKERS:-2}); do
+    WORKER_MODELS=adain TORCH_NUM_THREADS=${ADAIN_TORCH_THREADS:-2} \
+        python3 -m celery -A ml_services.transfer_style worker \
+        -Q adain -n adain$i@%h --pool=threads --concurrency=8 --loglevel=INFO &
+done
+
+python3 main.py
@@ -4,7 +4,8 @@ from aiogram.filters import Command, StateFilter
 from aiogram.fsm.state import default_state
 from aiogram.fsm.context import FSMContext
 from lexicon import LEXICON_RU
-from services import delete_user_temp_dir
+from services import delete_user_images
+from fsm import FsmNstData
 
 from keyboards import start_keyboard
 
@@ -33,11 +34,12 @@ async def handle_useless_cancel(message: Message):
     await message.answer(LEXICON_RU["commands"]["no_cancel"])
 
 
-@basic_router.message(Command(commands=["cancel"]), ~StateFilter(default_state))
+@basic_router.message(Command(commands=["cancel"]), ~StateFilter(default_state, FsmNstData.wait_result))
 async def handle_cancel(message: Message, state: FSMContext):
     """
     Обработка команды /cancel от пользователя, находящемся в каком-то из состояний
+    (отмена ожидаемой стилизации - в nst_handlers.cancel_stylization)
     """
     await message.answer(LEXICON_RU["commands"]["cancel"])
-    await delete_user_temp_dir(user_id=message.from_user.id)
+    await delete_user_images(user_id=message.from_user.id)
     await state.clear()
\ No newline at end of file
@@ -1,34 +1,48 @@
-import asyncio
-
 from aiogram import Router
 from aiogram import F
-from aiogram.types import Message, FSInputFile, CallbackQuery
+from aiogram.types import Message, BufferedInputFile, CallbackQuery, InputMediaPhoto
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.state import default_state
 from aiogram.fsm.context import FSMContext
 
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from celery.exceptions import TaskRevokedError
 
+import asyncio
+import json
 import logging
 import sys
+import time
+import uuid
 
 from config import load_config
+from celery_config import TASK_EVENTS_CHANNEL, TASK_REQUESTERS_DB, TASK_ENQUEUED_AT_HEADER
 from lexicon import LEXICON_RU
 from fsm import FsmNstData
 
-from services import create_user_temp_file, read_user_temp_file, delete_user_temp_dir, get_user_dir_full_path
-from services.exceptions import BaseServerError
+from services import (save_user_image, read_user_image, delete_user_images, TaskEventsListener, BlobStore,
+                      ResultCache, request_key, FairQueue, ProgressMessage, TaskRequesters, MediaGroupCollector,
+                      parse_weights, REQUEST_SECONDS, TELEGRAM_SECONDS, JOBS_IN_FLIGHT, install_trace_logging,
+                      start_trace, span, trace_headers)
+from services.exceptions import BaseServerError, BlobNotFound, QuotaExceeded, TaskNotSubmitted
 
-from ml_services.transfer_style import transfer_style_by_adain, transfer_style_by_gatys
-from keyboards import start_keyboard, degree_keyboard, method_keyboard
+from ml_services.transfer_style import (transfer_style_by_adain, transfer_style_by_gatys, transfer_style_by_adain_album,
+                                        model_version, COMPARE_DEGREE)
+from ml_services.cancellation import TaskCancelled
+from keyboards import start_keyboard, degree_keyboard, adain_degree_keyboard, method_keyboard
 
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 logger.propagate = False
 
+# trace_id запроса на стилизацию - в каждой записи лога (см. services/tracing.py)
+install_trace_logging()
+
 formatter = logging.Formatter(
-    '[{asctime}] #{levelname:8} {filename}: {lineno} - {name} - {message}',
+    '[{asctime}] #{levelname:8} {filename}: {lineno} - {name} - [{trace_id}] {message}',
     style='{'
 )
 
@@ -42,6 +56,7 @@ class DebugFilter(logging.Filter):
 
 debug_handler = logging.StreamHandler(sys.stdout)
 debug_handler.addFilter(DebugFilter())
+debug_handler.setFormatter(formatter)
 
 logger.addHandler(error_handler)
 logger.addHandler(debug_handler)
@@ -52,10 +67,194 @@ app_config = load_config()
 
 redis = Redis(host=app_config.redis.HOST, port=app_config.redis.PORT, db=2)
 
+# воркеры сообщают о завершении задач через Redis pub/sub
+task_events = TaskEventsListener(redis=redis, channel=TASK_EVENTS_CHANNEL)
+
+# изображения передаются воркерам через общее хранилище, в сообщениях celery - только ключи
+blob_store = BlobStore(root=app_config.blob_store.DIR, ttl=app_config.blob_store.TTL)
+
+# результаты одинаковых запросов берутся из кэша, одновременные одинаковые запросы выполняются одной задачей
+result_cache = ResultCache(redis=redis, max_bytes=app_config.result_cache.MAX_BYTES, ttl=app_config.blob_store.TTL)
+
+# квоты и приоритеты задач пользователей в очередях celery
+fair_queue = FairQueue(redis=redis, window=app_config.queues.QUOTA_WINDOW,
+                       max_requests={"gatys": app_config.queues.GATYS_QUOTA, "adain": app_config.queues.ADAIN_QUOTA})
+
+# пользователи, ожидающие задачу: если все откажутся от неё (или истечёт дедлайн), воркер прервёт задачу
+task_requesters = TaskRequesters(redis=Redis(host=app_config.redis.HOST, port=app_config.redis.PORT,
+                                             db=TASK_REQUESTERS_DB))
+deadlines = {"gatys": app_config.queues.GATYS_DEADLINE, "adain": app_config.queues.ADAIN_DEADLINE}
+
+# кнопки клавиатуры степени стилизации
+DEGREE_BUTTONS = [str(i) for i in range(1, 6)] + ["compare"]
+
+# альбомы: фотографии альбома приходят отдельными сообщениями и собираются вместе
+media_groups = MediaGroupCollector()
+
+# Telegram отправляет не больше 10 фото в одном альбоме
+MEDIA_GROUP_SIZE = 10
+
+# ожидание результата пользователем: user_id -> (задача asyncio обработчика, id задачи celery); нужно для /cancel
+waiting_tasks: dict[int, tuple[asyncio.Task, str]] = {}
+
 
 nst_router = Router()
 
 
+async def abandon_task(task, task_id: str):
+    """
+    Задача task_id так и не поставлена в очередь. Одинаковые запросы, успевшие присоединиться к ней, получают
+    ошибку TaskNotSubmitted (в бэкенде результатов и событием о завершении) и выполняют запрос заново.
+    """
+    try:
+        await asyncio.to_thread(task.backend.mark_as_failure, task_id,
+                                TaskNotSubmitted(f"Задача {task_id} не поставлена в очередь"))
+        await redis.publish(TASK_EVENTS_CHANNEL, json.dumps({"task_id": task_id, "state": "FAILURE"}))
+    except (RedisError, OSError) as error:
+        # ожидающие задачу дождутся её дедлайна
+        logger.error(f"Не удалось сообщить, что задача {task_id} не поставлена в очередь: {error}")
+
+
+async def get_stylization(user_id: int, method: str, content_keys: list[str], style_keys: list[str],
+                          style_weights: list[float], degree: int,
+                          progress: ProgressMessage | None = None) -> list[str]:
+    """
+    Ключи результатов стилизации (по одному на изображение контента) в хранилище изображений: из кэша результатов,
+    от уже выполняющейся задачи с таким же запросом или от новой задачи celery (с учётом квоты пользователя,
+    иначе - исключение QuotaExceeded). Альбом (несколько изображений контента или стилей) - одна задача AdaIN.
+    * progress - сообщение статуса, обновляемое по событиям прогресса задачи
+    """
+    is_album = len(content_keys) > 1 or len(style_keys) > 1
+    started_at = time.perf_counter()
+
+    style_part = ",".join(style_keys)
+    if len(style_keys) > 1:
+        style_part += ":" + ",".join(map(str, style_weights))
+    key = request_key(",".join(content_keys), style_part, method, degree, model_version(method))
+
+    # результаты альбома хранятся в кэше одной записью - ключами через запятую
+    with span("result_cache") as attributes:
+        cached = await result_cache.get(key)
+        attributes["hit"] = cached is not None
+    if cached is not None:
+        try:
+            for result_key in cached.split(","):
+                await asyncio.to_thread(blob_store.touch, result_key)
+            REQUEST_SECONDS.labels(method, "cache").observe(time.perf_counter() - started_at)
+            return cached.split(",")
+        except BlobNotFound:
+            await result_cache.discard(key)
+
+    if is_album:
+        task = transfer_style_by_adain_album
+        args = (content_keys, style_keys, style_weights, degree)
+    else:
+        task = transfer_style_by_gatys if method == 'gatys' else transfer_style_by_adain
+        args = (content_keys[0], style_keys[0], degree)
+
+    on_progress = progress.update if progress is not None else None
+
+    task_id = str(uuid.uuid4())
+    running_task_id = await result_cache.claim(key, task_id)
+
+    # такой же запрос уже выполняется - ждём его задачу
+    if running_task_id is not None:
+        await task_requesters.add(running_task_id, user_id, deadlines[method])
+        waiting_tasks[user_id] = (asyncio.current_task(), running_task_id)
+
+        result = task.AsyncResult(running_task_id)
+        with span("wait_coalesced", task_id=running_task_id), \
+                JOBS_IN_FLIGHT.labels(method, "bot").track_inprogress():
+            await task_events.wait(result, on_progress=on_progress, timeout=deadlines[method])
+
+        try:
+            result_keys = result.get() if is_album else [result.get()]
+        except TaskNotSubmitted as error:
+            # запрос, занявший ключ, не смог поставить задачу в очередь - выполняем запрос заново
+            logger.debug(error)
+            return await get_stylization(user_id, method, content_keys, style_keys, style_weights, degree, progress)
+
+        REQUEST_SECONDS.labels(method, "coalesced").observe(time.perf_counter() - started_at)
+        return result_keys
+
+    submitted = False
+    try:
+        priority = await fair_queue.admit(user_id, method)
+
+        # ожидающий регистрируется до постановки задачи в очередь: задачу без ожидающих воркер не начнёт
+        await task_requesters.add(task_id, user_id, deadlines[method])
+        waiting_tasks[user_id] = (asyncio.current_task(), task_id)
+
+        # span'ы воркера (ожидание в очереди, выполнение задачи) - дочерние для wait_task
+        with span("wait_task", task_id=task_id, priority=priority), \
+                JOBS_IN_FLIGHT.labels(method, "bot").track_inprogress():
+            result = task.apply_async(args, task_id=task_id, priority=priority, expires=deadlines[method],
+                                      headers={TASK_ENQUEUED_AT_HEADER: time.time(), **trace_headers()})
+            submitted = True
+
+            # пока задача не выполнена, ждем результат, пользователь должен быть в состоянии ожидания
+            await task_events.wait(result, on_progress=on_progress, timeout=deadlines[method])
+        result_keys = result.get() if is_album else [result.get()]
+        REQUEST_SECONDS.labels(method, "task").observe(time.perf_counter() - started_at)
+
+        size = 0
+        for result_key in result_keys:
+            size += await asyncio.to_thread(blob_store.size, result_key)
+
+        for evicted in await result_cache.put(key, ",".join(result_keys), size):
+            for evicted_key in evicted.split(","):
+                if evicted_key not in result_keys:
+                    await asyncio.to_thread(blob_store.delete, evicted_key)
+    except BaseException:
+        if not submitted:
+            # ключ освобождается до сообщения ожидающим, чтобы их повторные запросы не присоединились к этой задаче
+            await result_cache.release(key)
+            await abandon_task(task, task_id)
+        raise
+    finally:
+        await result_cache.release(key)
+
+    return result_keys
+
+
+async def save_photos(messages: list[Message], user_id: int, name: str) -> int:
+    """
+    Скачивание фотографий сообщений (альбома) и сохранение их в хранилище изображений пользователя
+    под именами name_0, name_1, ... Возвращает число фотографий.
+    """
+    bot = messages[0].bot
+
+    for i, message in enumerate(messages):
+        with TELEGRAM_SECONDS.labels("download").time():
+            photo = await bot.get_file(file_id=message.photo[-1].file_id)
+            downloaded_photo = await bot.download_file(photo.file_path)
+        await save_user_image(user_id=user_id, img=downloaded_photo.read(), name=f"{name}_{i}")
+
+    return len(messages)
+
+
+async def send_results(callback: CallbackQuery, results: list[bytes], caption: str):
+    """
+    Отправка результатов: одно фото с подписью или альбомы (не больше MEDIA_GROUP_SIZE фото) и сообщение с подписью.
+    """
+    bot = callback.message.bot
+    chat_id = callback.message.chat.id
+
+    if len(results) == 1:
+        with TELEGRAM_SECONDS.labels("send").time():
+            await bot.send_photo(chat_id=chat_id, photo=BufferedInputFile(results[0], filename='result.jpg'),
+                                 caption=caption, reply_markup=start_keyboard)
+        return
+
+    for start in range(0, len(results), MEDIA_GROUP_SIZE):
+        media = [InputMediaPhoto(media=BufferedInputFile(result, filename=f'result_{start + i}.jpg'))
+                 for i, result in enumerate(results[start:start + MEDIA_GROUP_SIZE])]
+        with TELEGRAM_SECONDS.labels("send").time():
+            await bot.send_media_group(chat_id=chat_id, media=media)
+
+    await bot.send_message(chat_id=chat_id, text=caption, reply_markup=start_keyboard)
+
+
 
 @nst_router.message(Command(commands=["nst"]), StateFilter(default_state))
 async def process_nst_request(message: Message, state: FSMContext):
@@ -115,25 +314,27 @@ async def warn_incorrect_method(message: Message):
 @nst_router.message(StateFilter(FsmNstData.send_content), F.photo)
 async def process_content_photo(message: Message, state: FSMContext):
     """
-    Обработка полученного фото-контента.
-    Скачивание и сохранение на сервер во временную директорию для пользователя.
+    Обработка полученного фото-контента (или альбома фото для AdaIN).
+    Скачивание и сохранение в хранилище изображений пользователя (в исходном виде, без перекодирования).
     """
-    bot = message.bot
+    messages = await media_groups.collect(message)
+    if messages is None:
+        return
 
-    photo_id = message.photo[-1].file_id
-    photo = await bot.get_file(file_id=photo_id)
-    downloaded_photo = await bot.download_file(photo.file_path)
+    if len(messages) > 1 and not await _album_allowed(message):
+        return
 
-    # При сохранении файла может возникнуть исключительная ситуация, если вдруг файловая структура бота была нарушена
-    # (удаление папки бота/пользователя). Обрабатываем исключение, выводим лог.
+    # При сохранении изображения может возникнуть исключительная ситуация (например, недоступен Redis).
+    # Обрабатываем исключение, выводим лог.
     try:
-        await create_user_temp_file(user_id=message.from_user.id, img=downloaded_photo.read(), filename="content.jpg")
-    except BaseServerError as error:
+        content_count = await save_photos(messages, user_id=message.from_user.id, name="content")
+    except (BaseServerError, RedisError) as error:
         logger.error(error)
-        await delete_user_temp_dir(user_id=message.from_user.id)
+        await delete_user_images(user_id=message.from_user.id)
         await message.answer(LEXICON_RU["errors"]["internal_server_error"])
         await state.clear()
     else:
+        await state.update_data(content_count=content_count)
         await message.answer(LEXICON_RU["nst"]["content"])
         await state.set_state(FsmNstData.send_style)
 
@@ -147,85 +348,167 @@ async def warn_incorrect_content(message: Message):
 
 @nst_router.message(StateFilter(FsmNstData.send_style), F.photo)
 async def process_style_photo(message: Message, state: FSMContext):
-    bot = message.bot
+    """
+    Обработка полученного фото стиля. Для AdaIN можно отправить альбом стилей - они смешиваются с весами
+    из подписей к фото (см. parse_weights).
+    """
+    messages = await media_groups.collect(message)
+    if messages is None:
+        return
 
-    photo_id = message.photo[-1].file_id
-    photo = await bot.get_file(file_id=photo_id)
-    downloaded_photo = await bot.download_file(photo.file_path)
+    if len(messages) > 1 and not await _album_allowed(message):
+        return
 
     try:
-        await create_user_temp_file(user_id=message.from_user.id, img=downloaded_photo.read(), filename="style.jpg")
-    except BaseServerError as error:
+        style_count = await save_photos(messages, user_id=message.from_user.id, name="style")
+    except (BaseServerError, RedisError) as error:
         logger.error(error)
-        await delete_user_temp_dir(user_id=message.from_user.id)
+        await delete_user_images(user_id=message.from_user.id)
         await message.answer(LEXICON_RU["errors"]["internal_server_error"])
         await state.clear()
     else:
-        await message.answer(LEXICON_RU["nst"]["style"], reply_markup=degree_keyboard)
+        await state.update_data(style_count=style_count,
+                                style_weights=parse_weights([item.caption for item in messages]))
+
+        method = await redis.get(f"{message.from_user.id}")
+        if method is not None and method.decode("utf-8") == 'adain':
+            await message.answer(LEXICON_RU["nst"]["style_adain"], reply_markup=adain_degree_keyboard)
+        else:
+            await message.answer(LEXICON_RU["nst"]["style"], reply_markup=degree_keyboard)
         await state.set_state(FsmNstData.send_degree)
 
 
 
+async def _album_allowed(message: Message) -> bool:
+    """
+    Альбомы обрабатываются только AdaIN (алгоритм Гатиса слишком долгий для пакетной обработки).
+    """
+    method = await redis.get(f"{message.from_user.id}")
+    if method is not None and method.decode("utf-8") == 'adain':
+        return True
+
+    await message.answer(LEXICON_RU["nst"]["album_gatys"])
+    return False
+
+
+
 @nst_router.message(StateFilter(FsmNstData.send_style))
 async def warn_incorrect_style(message: Message):
     await message.answer(LEXICON_RU["nst"]["bad_photo"])
 
 
 
-@nst_router.callback_query(StateFilter(FsmNstData.send_degree), F.data.in_([str(i) for i in range(1, 6)]))
+@nst_router.callback_query(StateFilter(FsmNstData.send_degree), F.data.in_(DEGREE_BUTTONS))
 async def process_style_transfer_degree(callback: CallbackQuery, state: FSMContext):
     """
     Обработка степени стилизации. Запуск процедуры получения стилизации.
+    Кнопка compare (только для AdaIN) - сразу все степени в одном изображении для сравнения.
     """
     user_id = callback.from_user.id
 
     method = await redis.get(f"{user_id}")
     method = method.decode("utf-8")
 
-    await callback.message.answer(LEXICON_RU["nst"][f"degree_{method}"])
+    if callback.data == "compare" and method != 'adain':
+        await callback.answer(LEXICON_RU["nst"]["bad_button"])
+        return
 
-    try:
-        content: bytes = await read_user_temp_file(user_id=user_id, filename='content.jpg')
-        style: bytes = await read_user_temp_file(user_id=user_id, filename='style.jpg')
+    degree = COMPARE_DEGREE if callback.data == "compare" else int(callback.data)
 
-        # Состояние пользователя переводим в ожидание:
-        await state.set_state(FsmNstData.wait_result)
+    await callback.message.answer(LEXICON_RU["nst"][f"degree_{method}"])
 
-        logger.debug(f"Стилизация для {callback.from_user.first_name} с id {user_id} в очереди.")
+    cancelled = False
 
-        # получение стилизации, задача добавляется в очередь celery:
-        result = None
+    # трасса запроса: span'ы бота и воркера с общим trace_id (см. services/tracing.py)
+    with start_trace("stylization", user_id=user_id, method=method, degree=degree) as trace:
+        # прогресс публикуют только долгие задачи Гатиса
+        progress = None
         if method == 'gatys':
-            result = transfer_style_by_gatys.delay(content, style, int(callback.data))
-        else:
-            result = transfer_style_by_adain.delay(content, style, int(callback.data))
-
-        # пока задача не выполнена, ждем результат, пользователь должен быть в состоянии ожидания
-        while not result.ready():
-            await asyncio.sleep(2)
-
-        logger.debug(f"Стилизация для {callback.from_user.first_name} с id {user_id} завершена.")
-
-        # сохранение полученной стилизации в папку пользователя
-        await create_user_temp_file(user_id=user_id, img=result.get(), filename='result.jpg')
-        user_dir_path = await get_user_dir_full_path(user_id=user_id)
-        photo = FSInputFile(user_dir_path + '/result.jpg')
-
-        # отправка ответа
-        bot = callback.message.bot
-        await bot.send_photo(caption=LEXICON_RU["nst"]["done"], chat_id=callback.message.chat.id, photo=photo,
-                             reply_markup=start_keyboard)
-
-    except BaseServerError as error:
-        logger.error(error)
-        await callback.message.answer(LEXICON_RU["errors"]["internal_server_error"])
-
-    finally:
-        await delete_user_temp_dir(user_id=user_id)
-        await state.clear()
-
-
-@nst_router.callback_query(~StateFilter(FsmNstData.send_degree), F.data.in_([str(i) for i in range(1, 6)]))
+            progress = ProgressMessage(bot=callback.message.bot, chat_id=callback.message.chat.id,
+                                       template=LEXICON_RU["nst"]["progress"],
+                                       load_preview=lambda key: asyncio.to_thread(blob_store.get, key))
+
+        # изображения запроса в хранилище, удаляемые после его завершения
+        input_keys = []
+
+        try:
+            data = await state.get_data()
+            with span("read_images"):
+                contents = [await read_user_image(user_id=user_id, name=f'content_{i}')
+                            for i in range(data["content_count"])]
+                styles = [await read_user_image(user_id=user_id, name=f'style_{i}') for i in range(data["style_count"])]
+
+            # Состояние пользователя переводим в ожидание:
+            await state.set_state(FsmNstData.wait_result)
+
+            with span("blob_store_put"):
+                content_keys = [await asyncio.to_thread(blob_store.hold, content) for content in contents]
+                input_keys += content_keys
+                style_keys = [await asyncio.to_thread(blob_store.hold, style) for style in styles]
+                input_keys += style_keys
+
+            logger.debug(f"Стилизация для {callback.from_user.first_name} с id {user_id} в очереди.")
+
+            # получение стилизации (из кэша или задачей celery):
+            with span("get_stylization"):
+                result_keys = await get_stylization(user_id, method, content_keys, style_keys, data["style_weights"],
+                                                    degree, progress)
+
+            logger.debug(f"Стилизация для {callback.from_user.first_name} с id {user_id} завершена. "
+                         f"Кэш результатов: {await result_cache.stats()}")
+
+            # полученные стилизации отправляются из памяти, без записи на диск
+            with span("blob_store_get"):
+                try:
+                    results = [await asyncio.to_thread(blob_store.get, result_key) for result_key in result_keys]
+                except BlobNotFound as error:
+                    # результат из кэша мог быть вытеснен (и удалён) другим запросом уже после того,
+                    # как get_stylization вернул его ключ: такого результата в кэше больше нет, получаем заново
+                    logger.debug(error)
+                    result_keys = await get_stylization(user_id, method, content_keys, style_keys,
+                                                        data["style_weights"], degree, progress)
+                    results = [await asyncio.to_thread(blob_store.get, result_key) for result_key in result_keys]
+
+            with span("send_results", count=len(results)):
+                await send_results(callback, results,
+                                   LEXICON_RU["nst"]["done_compare" if degree == COMPARE_DEGREE else "done"])
+            trace["outcome"] = "done"
+
+        except asyncio.CancelledError:
+            # ожидание прервано командой /cancel (см. cancel_stylization), состояние уже сброшено
+            cancelled = True
+            trace["outcome"] = "cancelled"
+            logger.debug(f"Стилизация для {callback.from_user.first_name} с id {user_id} отменена.")
+
+        except QuotaExceeded as error:
+            trace["outcome"] = "quota_exceeded"
+            logger.debug(error)
+            await callback.message.answer(LEXICON_RU["errors"]["quota_exceeded"], reply_markup=start_keyboard)
+
+        except (TaskCancelled, TaskRevokedError, asyncio.TimeoutError) as error:
+            trace["outcome"] = "deadline_exceeded"
+            logger.debug(error)
+            await callback.message.answer(LEXICON_RU["errors"]["deadline_exceeded"], reply_markup=start_keyboard)
+
+        except (BaseServerError, RedisError) as error:
+            trace["outcome"] = "error"
+            logger.error(error)
+            await callback.message.answer(LEXICON_RU["errors"]["internal_server_error"])
+
+        finally:
+            if waiting_tasks.get(user_id, (None,))[0] is asyncio.current_task():
+                waiting_tasks.pop(user_id)
+            if progress is not None:
+                await progress.delete()
+            # изображение удаляется, только если его не использует другой запрос (например, ожидающий ту же задачу)
+            for key in input_keys:
+                await asyncio.to_thread(blob_store.release, key)
+            if not cancelled:
+                await delete_user_images(user_id=user_id)
+                await state.clear()
+
+
+@nst_router.callback_query(~StateFilter(FsmNstData.send_degree), F.data.in_(DEGREE_BUTTONS))
 async def warn_degree_button_bad_pressed(callback: CallbackQuery):
     await callback.answer(LEXICON_RU["nst"]["bad_button"])
 
@@ -235,6 +518,26 @@ async def warn_incorrect_degree(message: Message):
     await message.answer(LEXICON_RU["nst"]["bad_degree"])
 
 
+@nst_router.message(Command(commands=["cancel"]), StateFilter(FsmNstData.wait_result))
+async def cancel_stylization(message: Message, state: FSMContext):
+    """
+    Отмена ожидаемой стилизации: пользователь перестаёт ждать задачу, и если её больше никто не ждёт,
+    воркер не начнёт её или прервёт между итерациями.
+    """
+    user_id = message.from_user.id
+
+    waiting = waiting_tasks.pop(user_id, None)
+    if waiting is not None:
+        handler_task, task_id = waiting
+        if await task_requesters.remove(task_id, user_id):
+            logger.debug(f"Задача {task_id} отменена: результат больше никто не ждёт.")
+        handler_task.cancel()
+
+    await message.answer(LEXICON_RU["commands"]["cancel"])
+    await delete_user_images(user_id=user_id)
+    await state.clear()
+
+
 @nst_router.message(StateFilter(FsmNstData.wait_result))
 async def wait_result(message: Message):
     await message.answer(LEXICON_RU["nst"]["wait"])
\ No newline at end of file
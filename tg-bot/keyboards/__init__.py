@@ -1,4 +1,4 @@
 from .set_menu import set_main_menu
 from .start_button import start_keyboard
-from .degree_keyboard import degree_keyboard
+from .degree_keyboard import degree_keyboard, adain_degree_keyboard
 from .method_keyboard import method_keyboard
@@ -1,6 +1,16 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from lexicon import LEXICON_RU
 
 
 buttons = [InlineKeyboardButton(text=str(i), callback_data=str(i)) for i in range(1, 6)]
 
-degree_keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons])
\ No newline at end of file
+degree_keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
+# для AdaIN можно получить сразу все степени стилизации для сравнения
+compare_button = InlineKeyboardButton(
+    text=LEXICON_RU["buttons"]["compare_button"],
+    callback_data="compare"
+)
+
+adain_degree_keyboard = InlineKeyboardMarkup(inline_keyboard=[buttons, [compare_button]])
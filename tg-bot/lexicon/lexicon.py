@@ -41,38 +41,58 @@ LEXICON_RU = {
                 "<strong>Совет:</strong> начните с AdaIN. Если захотите чего-то другого, то можете попробовать метод Гатиса.\n\n"
                  "Если захотите досрочно завершить стилизацию, отправляйте команду /cancel.",
 
-        "method": "Метод стилизации выбран. Теперь отправьте мне изображение, которое будем стилизовать.",
+        "method": "Метод стилизации выбран. Теперь отправьте мне изображение, которое будем стилизовать.\n"
+                  "Для AdaIN можно отправить сразу альбом изображений.",
 
-        "content": "Принято! Теперь я жду изображение со стилем. Можете использовать @pic [описание стиля] для отправки изображения.",
+        "content": "Принято! Теперь я жду изображение со стилем. Можете использовать @pic [описание стиля] для отправки изображения.\n"
+                   "Для AdaIN можно отправить альбом стилей - они смешаются. Веса стилей можно указать в подписях "
+                   "к фото (например, 2 у одного и 1 у другого) или одной подписью через пробел.",
 
         "style": "Стиль получен!\nТеперь выберите число <strong>от 1 до 5</strong> - степень переноса стиля.\n",
 
+        "style_adain": "Стиль получен!\nТеперь выберите число <strong>от 1 до 5</strong> - степень переноса стиля, "
+                       "или получите сразу все степени для сравнения.\n",
+
         "degree_gatys": "Начинаю стилизацию! Это может занять несколько минут...",
 
         "degree_adain": "Начинаю стилизацию! Будет готово через несколько секунд...",
 
         "bad_method": "Используйте одну из кнопок выше пожалуйста. Если хотите завершить, отправьте /cancel.",
 
+        "album_gatys": "Альбом изображений можно обработать только AdaIN. Для алгоритма Гатиса отправьте одно фото.",
+
         "bad_photo": "Мне нужно фото. Если хотите завершить, отправьте /cancel.",
 
         "bad_degree": "Используйте одну из кнопок выше пожалуйста. Если хотите завершить, отправьте /cancel.",
 
         "bad_button": "Кнопка неактуальна. Пожалуйста, следуйте инструкциям.",
 
-        "wait": "Ваше изображение обрабатывается. Нужно немного подождать.",
+        "wait": "Ваше изображение обрабатывается. Нужно немного подождать. Если передумали, отправьте /cancel.",
+
+        "progress": "Стилизация: итерация {step} из {total_steps} (потери {loss:.3g}).\n"
+                    "Осталось примерно {eta} с.",
+
+        "done_compare": "Стилизации со всеми степенями готовы (степень подписана под каждой). Хотите попробовать ещё? "
+                        "Жмите на кнопку ниже или отправляйте /nst",
 
         "done": "Ваша стилизация готова! Хотите попробовать ещё? Жмите на кнопку ниже или отправляйте /nst"
     },
     "default": "Не знаю, что на это ответить. Хотите сделать стилизацию? Тогда отправляйте команду /nst или жмите на кнопку ниже👇",
 
     "errors": {
-        "internal_server_error": "Произошла ошибка на стороне сервера. Попробуйте ещё раз или чуть позже."
+        "internal_server_error": "Произошла ошибка на стороне сервера. Попробуйте ещё раз или чуть позже.",
+
+        "deadline_exceeded": "Стилизация не успела выполниться за отведённое время. Попробуйте ещё раз чуть позже.",
+
+        "quota_exceeded": "Вы отправили слишком много запросов на стилизацию этим методом. Попробуйте чуть позже "
+                          "или выберите другой метод."
     },
 
     "buttons": {
         "start_button": "Стилизовать",
         "gatys_button": "Алгоритм Гатиса",
         "adain_button": "AdaIN-стилизатор",
+        "compare_button": "Сравнить все степени",
     }
 }
 
@@ -5,6 +5,7 @@ from aiogram.enums import ParseMode
 
 from aiogram.fsm.storage.redis import RedisStorage
 
+from redis import Redis as SyncRedis
 from redis.asyncio import Redis
 
 import logging
@@ -12,7 +13,9 @@ import sys
 
 from config import Config, load_config
 from handlers import basic_router, nst_router, user_router
-from services import create_bot_dir
+from services import (create_bot_dir, create_image_spool, start_metrics_server, QueueDepthCollector,
+                      configure_tracing, install_trace_logging)
+from celery_config import app as celery_app, GATYS_QUEUE, ADAIN_QUEUE
 
 from keyboards import set_main_menu
 
@@ -38,6 +41,24 @@ async def main():
 
         storage = RedisStorage(redis=redis)
 
+        logging.info(f"Хранилище изображений пользователей: {app_config.spool.BACKEND}")
+        await create_image_spool(app_config.spool, redis=redis)
+
+        if app_config.tracing.FILE:
+            logging.info(f"Трассы запросов: {app_config.tracing.FILE}")
+        configure_tracing(app_config.tracing.FILE, service="bot")
+
+        if app_config.metrics.PORT:
+            logging.info(f"Метрики Prometheus: порт {app_config.metrics.PORT}")
+            transport_options = celery_app.conf.broker_transport_options
+            # длина очередей читается из Redis-брокера celery (db 1)
+            start_metrics_server(app_config.metrics.PORT, queue_depth=QueueDepthCollector(
+                redis=SyncRedis(host=app_config.redis.HOST, port=app_config.redis.PORT, db=1),
+                queues=[GATYS_QUEUE, ADAIN_QUEUE],
+                priority_steps=transport_options["priority_steps"],
+                sep=transport_options["sep"]
+            ))
+
         bot = Bot(token=app_config.bot.TOKEN,
                 default=DefaultBotProperties(parse_mode=ParseMode.HTML))
 
@@ -57,9 +78,12 @@ async def main():
 
 
 if __name__ == "__main__":
+    # trace_id запроса на стилизацию (см. services/tracing.py) - в каждой записи лога
+    install_trace_logging()
+
     handler = logging.StreamHandler(sys.stdout)
     logging.basicConfig(level=logging.DEBUG,
-                        format='[{asctime}] #{levelname:8} {filename}: {lineno} - {name} - {message}',
+                        format='[{asctime}] #{levelname:8} {filename}: {lineno} - {name} - [{trace_id}] {message}',
                         style='{',
                         handlers=[handler])
     logging.info("Конфигурирование и запуск бота...")
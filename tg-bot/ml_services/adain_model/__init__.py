@@ -1,2 +1,4 @@
 from .adain_model import AdainStyleTransferModel
+from .adain_model_config import adain_model_config
+from .style_cache import StyleStatsCache, style_image_key
 from .pre_post_processing import preprocess_tensor, denorm_images
\ No newline at end of file
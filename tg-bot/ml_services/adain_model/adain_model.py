@@ -1,8 +1,55 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 
 from ml_services.adain_model.modules import Encoder, MeanStdCalculator, AdaIN, Decoder
+from ml_services.adain_model.pre_post_processing import (VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD,
+                                                         preprocess_tensor, denorm_images)
+from ml_services.normalization_folding import NormalizedInputConv2d, denormalized_output_conv
+
+
+# энкодер уменьшает изображение в 8 раз (три max-pooling слоя до relu4_1), декодер во столько же раз увеличивает
+SCALE_FACTOR = 8
+
+
+def _tile_spans(length: int, tile_size: int, overlap: int) -> list[tuple[int, int, int, int]]:
+    """
+    Разбиение отрезка [0, length) на перекрывающиеся тайлы.
+    Для каждого тайла возвращается (start, end, own_start, own_end), где [own_start, own_end) - часть тайла,
+    которая "принадлежит" только ему (такие части не пересекаются и покрывают весь отрезок).
+    Все значения кратны SCALE_FACTOR, если length, tile_size и overlap им кратны.
+    """
+    if length <= tile_size:
+        return [(0, length, 0, length)]
+
+    stride = tile_size - overlap
+    starts = list(range(0, length - tile_size, stride)) + [length - tile_size]
+
+    spans = []
+    for i, start in enumerate(starts):
+        own_start = 0 if i == 0 else spans[-1][3]
+        if i == len(starts) - 1:
+            own_end = length
+        else:
+            # граница - середина области перекрытия с соседним тайлом
+            own_end = (start + tile_size + starts[i + 1]) // 2 // SCALE_FACTOR * SCALE_FACTOR
+        spans.append((start, start + tile_size, own_start, own_end))
+
+    return spans
+
+
+def _blend_ramp(length: int, overlap: int, device) -> torch.Tensor:
+    """
+    Веса для смешивания тайлов вдоль одной оси: линейно растут на краях длиной overlap и равны 1 в середине.
+    """
+    ramp = torch.ones(length, device=device)
+    overlap = min(overlap, length // 2)
+    if overlap > 0:
+        edge = torch.arange(1, overlap + 1, device=device, dtype=ramp.dtype) / (overlap + 1)
+        ramp[:overlap] = edge
+        ramp[-overlap:] = edge.flip(0)
+    return ramp
 
 
 class AdainStyleTransferModel(nn.Module):
@@ -12,19 +59,63 @@ class AdainStyleTransferModel(nn.Module):
         self.adain = AdaIN()
         self.decoder = Decoder()
         self.mean_std_calc = MeanStdCalculator()
+        self.normalization_folded: bool = False
 
-    def stylize(self, content: torch.Tensor, style: torch.Tensor, alpha: float = 1.0):
+    def fold_normalization(self):
+        """
+        Внесение нормализации входа в первую свёртку энкодера и денормализации выхода - в последнюю свёртку декодера.
+        После этого модель принимает и возвращает изображения в [0, 1] (см. preprocess / postprocess).
+        Только для инференса: обучение (forward) считает потери на нормализованных изображениях.
+        """
+        if self.normalization_folded:
+            return
+
+        self.encoder.encoder[0] = NormalizedInputConv2d(self.encoder.encoder[0],
+                                                        VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD)
+        self.decoder.block3[-1] = denormalized_output_conv(self.decoder.block3[-1],
+                                                           VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD)
+        self.normalization_folded = True
+
+    def preprocess(self, tensor: torch.Tensor) -> torch.Tensor:
+        """
+        Изображение (C, H, W) в [0, 1] -> вход модели (1, 3, H, W).
+        """
+        if self.normalization_folded:
+            return tensor[:3].unsqueeze(0)
+        return preprocess_tensor(tensor)
+
+    def postprocess(self, images: torch.Tensor) -> torch.Tensor:
+        """
+        Выход модели -> изображения в [0, 1] (без ограничения диапазона).
+        """
+        if self.normalization_folded:
+            return images
+        return denorm_images(images)
+
+    def style_stats(self, style: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Средние и стандартные отклонения по каналам карт признаков стиля с последнего слоя энкодера (relu4_1).
+        Именно они и нужны блоку AdaIN, поэтому их можно посчитать один раз и переиспользовать.
+        """
+        style_features = self.encoder(style, return_all_outputs=False)
+        return self.mean_std_calc(style_features)
+
+    def stylize(self, content: torch.Tensor, style: torch.Tensor | None = None, alpha: float | torch.Tensor = 1.0,
+                style_stats: tuple[torch.Tensor, torch.Tensor] | None = None):
         """
         Функция стилизации, которая будет применяться при инференсе.
-        * alpha - число [0, 1], степень переноса стиля
+        * alpha - число [0, 1], степень переноса стиля (или тензор (B, 1, 1, 1) со своей степенью для каждого элемента батча)
+        * style_stats - заранее посчитанные статистики стиля (см. style_stats); если переданы, то стиль не кодируется
         """
         content_features = self.encoder(content,
                                         return_all_outputs=False)  # карты признаков контента с последнего слоя энкодера
-        style_features = self.encoder(style,
-                                      return_all_outputs=False)  # карты признаков стиля с последнего слоя энкодера
 
-        adain_features = self.adain(content_features,
-                                    style_features)  # модифицированные карты признаков контента (стилизованные)
+        if style_stats is None:
+            style_stats = self.style_stats(style)
+        style_mean, style_std = style_stats
+
+        adain_features = self.adain.adapt(content_features, style_mean,
+                                          style_std)  # модифицированные карты признаков контента (стилизованные)
         adain_features = alpha * adain_features + (
                     1 - alpha) * content_features  # контроль степени стилизации при помощи alpha
 
@@ -32,6 +123,94 @@ class AdainStyleTransferModel(nn.Module):
 
         return outp
 
+    def stylize_alphas(self, content: torch.Tensor, style: torch.Tensor | None = None,
+                       alphas: list[float] | tuple[float, ...] = (0.2, 0.4, 0.6, 0.8, 1.0),
+                       style_stats: tuple[torch.Tensor, torch.Tensor] | None = None) -> torch.Tensor:
+        """
+        Стилизация одного изображения сразу с несколькими степенями alpha (для сравнения).
+        Контент и стиль кодируются один раз, AdaIN выполняется один раз, а смешанные для всех alpha карты признаков
+        декодируются одним батчем, поэтому стоимость близка к одной стилизации с батчем декодера len(alphas).
+        * content - одно изображение (1, 3, H, W)
+        Возвращает тензор (len(alphas), 3, H, W) в порядке alphas.
+        """
+        content_features = self.encoder(content, return_all_outputs=False)
+
+        if style_stats is None:
+            style_stats = self.style_stats(style)
+        style_mean, style_std = style_stats
+
+        adain_features = self.adain.adapt(content_features, style_mean, style_std)
+
+        alpha = torch.tensor(alphas, dtype=content_features.dtype, device=content_features.device).reshape(-1, 1, 1, 1)
+        blended = alpha * adain_features + (1 - alpha) * content_features  # (len(alphas), C, h, w)
+
+        return self.decoder(blended)
+
+    def stylize_tiled(self, content: torch.Tensor, style: torch.Tensor | None = None, alpha: float = 1.0,
+                      style_stats: tuple[torch.Tensor, torch.Tensor] | None = None,
+                      tile_size: int = 512, overlap: int = 64):
+        """
+        Потайловая стилизация изображения произвольного размера с ограниченным потреблением памяти.
+        * content - одно изображение (1, 3, H, W)
+        * tile_size - сторона тайла; именно она, а не размер изображения, определяет пиковую память энкодера/декодера
+        * overlap - ширина перекрытия соседних тайлов
+
+        Чтобы между тайлами не было видно швов, статистики контента для AdaIN считаются по всему изображению
+        (первый проход энкодера по тайлам), а результаты декодера смешиваются с плавными весами в зонах перекрытия.
+        """
+        if style_stats is None:
+            style_stats = self.style_stats(style)
+        style_mean, style_std = style_stats
+
+        _, _, height, width = content.shape
+
+        tile_size = max(tile_size // SCALE_FACTOR * SCALE_FACTOR, 2 * SCALE_FACTOR)
+        overlap = min(overlap // SCALE_FACTOR * SCALE_FACTOR, tile_size - SCALE_FACTOR)
+
+        # дополняем изображение до размеров, кратных SCALE_FACTOR
+        content = F.pad(content, (0, (-width) % SCALE_FACTOR, 0, (-height) % SCALE_FACTOR), mode='replicate')
+
+        rows = _tile_spans(content.shape[2], tile_size, overlap)
+        cols = _tile_spans(content.shape[3], tile_size, overlap)
+
+        # Первый проход: статистики контента по всему изображению.
+        # Каждая позиция карты признаков учитывается один раз - в тайле, которому она принадлежит.
+        channels_sum = channels_sq_sum = 0.0
+        count = 0
+        for y0, y1, own_y0, own_y1 in rows:
+            for x0, x1, own_x0, own_x1 in cols:
+                features = self.encoder(content[:, :, y0:y1, x0:x1], return_all_outputs=False)
+                own = features[:, :,
+                               (own_y0 - y0) // SCALE_FACTOR:(own_y1 - y0) // SCALE_FACTOR,
+                               (own_x0 - x0) // SCALE_FACTOR:(own_x1 - x0) // SCALE_FACTOR].double()
+
+                channels_sum = channels_sum + own.sum(dim=(2, 3), keepdim=True)
+                channels_sq_sum = channels_sq_sum + own.pow(2).sum(dim=(2, 3), keepdim=True)
+                count += own.shape[2] * own.shape[3]
+
+        content_mean = channels_sum / count
+        # несмещённая оценка, как и в MeanStdCalculator
+        content_var = (channels_sq_sum - count * content_mean.pow(2)) / max(count - 1, 1)
+        content_stats = (content_mean.float(), content_var.clamp(min=0).sqrt().float())
+
+        # Второй проход: стилизация тайлов и их смешивание
+        output = torch.zeros_like(content)
+        weights = torch.zeros_like(content[:, :1])
+        for y0, y1, _, _ in rows:
+            for x0, x1, _, _ in cols:
+                features = self.encoder(content[:, :, y0:y1, x0:x1], return_all_outputs=False)
+
+                adain_features = self.adain.adapt(features, style_mean, style_std, content_stats=content_stats)
+                adain_features = alpha * adain_features + (1 - alpha) * features
+
+                weight = (_blend_ramp(y1 - y0, overlap, content.device)[:, None] *
+                          _blend_ramp(x1 - x0, overlap, content.device)[None, :])
+
+                output[:, :, y0:y1, x0:x1] += self.decoder(adain_features) * weight
+                weights[:, :, y0:y1, x0:x1] += weight
+
+        return (output / weights)[:, :, :height, :width]
+
     def __content_loss(self, result_enc_outp, adain_features):
         """
         * result_enc_outp - выход энкодера для D(adain_content), где D - декодер
@@ -0,0 +1,52 @@
+import torch
+
+
+adain_model_config = {
+    # версия модели (весов и алгоритма) для ключа кэша результатов; увеличивается при изменениях, меняющих результат
+    "VERSION": 1,
+    "DEVICE": torch.device('cpu'),
+    "IMSIZE": (512, 512),
+    # степень стилизации -> коэффициент alpha
+    "ALPHA": {
+        1: 0.2,
+        2: 0.4,
+        3: 0.6,
+        4: 0.8,
+        5: 1.0
+    },
+    # режим сравнения: все степени стилизации за один проход, результаты склеиваются в один ряд
+    # с подписями; THUMB_SIZE - размер каждого изображения в ряду по большей стороне
+    "COMPARE": {
+        "THUMB_SIZE": 256
+    },
+    # потоковая стилизация видео и GIF (ml_services/adain_video.py): кадров в батче и ограничение большей стороны кадра
+    "VIDEO": {
+        "BATCH_SIZE": 8,
+        "MAX_SIDE": 512
+    },
+    # бэкенд инференса энкодера и декодера: "eager", "torchscript" или "onnxruntime" (только CPU);
+    # если бэкенд недоступен или его результат расходится с eager, используется eager
+    "BACKEND": "eager",
+    # INT8-квантизованные энкодер и декодер (только CPU); файл создаётся скриптом scripts/quantize_adain_model.py;
+    # квантизованная модель уже экспортирована в TorchScript, поэтому BACKEND для неё не применяется
+    "QUANTIZED": False,
+    # (опционально) нормализация входа и денормализация выхода внесены в свёртки модели
+    # (см. AdainStyleTransferModel.fold_normalization); только для eager-бэкенда без квантизации, иначе не применяется.
+    # Включать после проверки совпадения результатов: python -m scripts.check_normalization_folding
+    "FOLD_NORMALIZATION": False,
+    # микро-батчинг: сколько секунд ждать другие задачи и максимальный размер батча
+    "BATCH_WINDOW": 0.05,
+    "MAX_BATCH_SIZE": 8,
+    # кэш статистик стиля: лимит памяти процесса, общий кэш в Redis (db 3) и время жизни записей в нём
+    "STYLE_CACHE_MAX_BYTES": 64 * 2**20,
+    "STYLE_CACHE_REDIS": True,
+    "STYLE_CACHE_TTL": 7 * 24 * 60 * 60,
+    # потайловый режим: контент не приводится к IMSIZE (сохраняется соотношение сторон), пиковая память
+    # ограничивается размером тайла; изображения больше MAX_SIDE по большей стороне уменьшаются
+    "TILED": {
+        "ENABLED": False,
+        "TILE_SIZE": 512,
+        "OVERLAP": 64,
+        "MAX_SIDE": 4096
+    }
+}
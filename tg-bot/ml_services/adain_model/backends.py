@@ -0,0 +1,157 @@
+"""
+Бэкенды инференса AdaIN-стилизатора.
+
+Граф энкодера и декодера экспортируется один раз при загрузке модели, после чего выполняется без питоновской
+диспетчеризации по слоям:
+* eager - обычный PyTorch
+* torchscript - трассировка + заморозка графа (torch.jit.optimize_for_inference), тензоры в формате channels_last
+* onnxruntime - экспорт в ONNX и выполнение в onnxruntime на CPU
+
+Блок AdaIN между энкодером и декодером остаётся в PyTorch. Перед использованием бэкенда проверяется совпадение
+его результата с eager-моделью; при ошибке или расхождении воркер откатывается на eager.
+"""
+import copy
+import hashlib
+import logging
+import os
+
+import torch
+import torch.nn as nn
+
+from ml_services.adain_model.adain_model import AdainStyleTransferModel
+
+
+logger = logging.getLogger(__name__)
+
+
+INFERENCE_BACKENDS = ("eager", "torchscript", "onnxruntime")
+
+
+class _ChannelsLast(nn.Module):
+    """
+    Перевод входа в формат channels_last, с которым свёртки oneDNN на CPU работают быстрее.
+    """
+
+    def __init__(self, module: nn.Module):
+        super(_ChannelsLast, self).__init__()
+        self.module = module.to(memory_format=torch.channels_last)
+
+    def forward(self, inp: torch.Tensor) -> torch.Tensor:
+        return self.module(inp.contiguous(memory_format=torch.channels_last))
+
+
+class _OnnxRuntimeModule(nn.Module):
+    """
+    Обёртка над сессией onnxruntime с интерфейсом nn.Module.
+    """
+
+    def __init__(self, path: str):
+        super(_OnnxRuntimeModule, self).__init__()
+        import onnxruntime
+
+        self.session = onnxruntime.InferenceSession(path, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def forward(self, inp: torch.Tensor) -> torch.Tensor:
+        output = self.session.run(None, {self.input_name: inp.detach().cpu().numpy()})[0]
+        return torch.from_numpy(output).to(inp.device)
+
+
+def _to_torchscript(module: nn.Module, example_input: torch.Tensor) -> nn.Module:
+    with torch.no_grad():
+        traced = torch.jit.trace(_ChannelsLast(module).eval(), example_input)
+    return torch.jit.optimize_for_inference(traced)
+
+
+def _module_hash(module: nn.Module) -> str:
+    """
+    Хэш структуры и весов модуля: экспорт, сделанный для других весов или другого кода модели, не переиспользуется.
+    """
+    module_hash = hashlib.sha256(repr(module).encode())
+    for name, tensor in module.state_dict().items():
+        module_hash.update(name.encode())
+        module_hash.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return module_hash.hexdigest()[:16]
+
+
+def _to_onnxruntime(module: nn.Module, example_input: torch.Tensor, path: str) -> nn.Module:
+    # экспорт выполняется один раз для каждой версии модуля, дальше используется готовый файл
+    path = f"{os.path.splitext(path)[0]}-{_module_hash(module)}.onnx"
+    if not os.path.exists(path):
+        torch.onnx.export(
+            module.eval(), (example_input,), path,
+            input_names=["input"], output_names=["output"],
+            dynamic_axes={"input": {0: "batch", 2: "height", 3: "width"},
+                          "output": {0: "batch", 2: "height", 3: "width"}},
+            dynamo=False
+        )
+    return _OnnxRuntimeModule(path)
+
+
+def build_backend(model: AdainStyleTransferModel, backend: str, export_dir: str = ".") -> AdainStyleTransferModel:
+    """
+    Копия модели, энкодер и декодер которой выполняются бэкендом backend.
+    * export_dir - папка для экспортированных файлов (для onnxruntime)
+    """
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд инференса: {backend}")
+
+    model = copy.deepcopy(model).cpu().eval()
+    if backend == "eager":
+        return model
+
+    example_input = torch.rand(1, 3, 64, 64)
+    with torch.no_grad():
+        example_features = model.encoder(example_input)
+
+    if backend == "torchscript":
+        model.encoder.encoder = _to_torchscript(model.encoder.encoder, example_input)
+        model.decoder = _to_torchscript(model.decoder, example_features)
+
+    elif backend == "onnxruntime":
+        model.encoder.encoder = _to_onnxruntime(model.encoder.encoder, example_input,
+                                                os.path.join(export_dir, "adain_encoder.onnx"))
+        model.decoder = _to_onnxruntime(model.decoder, example_features,
+                                        os.path.join(export_dir, "adain_decoder.onnx"))
+
+    return model
+
+
+def parity_error(reference: AdainStyleTransferModel, candidate: AdainStyleTransferModel,
+                 imsize: tuple[int, int] = (128, 128), alpha: float = 0.6) -> float:
+    """
+    Максимальное абсолютное отличие результатов стилизации candidate от reference на случайных изображениях.
+    Размер отличается от размера, использованного при экспорте, - так проверяется и поддержка других размеров.
+    """
+    generator = torch.Generator().manual_seed(0)
+    content = torch.randn(2, 3, *imsize, generator=generator)
+    style = torch.randn(2, 3, *imsize, generator=generator)
+
+    with torch.no_grad():
+        expected = reference.stylize(content, style, alpha=alpha)
+        actual = candidate.stylize(content, style, alpha=alpha)
+
+    return (expected - actual).abs().max().item()
+
+
+def apply_backend(model: AdainStyleTransferModel, backend: str, export_dir: str = ".",
+                  atol: float = 1e-3) -> AdainStyleTransferModel:
+    """
+    Модель с выбранным бэкендом, если он собрался и совпадает с eager-моделью с точностью atol, иначе - сама model.
+    """
+    if backend == "eager":
+        return model
+
+    try:
+        candidate = build_backend(model, backend, export_dir)
+        error = parity_error(model, candidate)
+    except Exception as exception:
+        logger.warning(f"Бэкенд {backend} недоступен ({exception!r}), используется eager")
+        return model
+
+    if error > atol:
+        logger.warning(f"Бэкенд {backend} расходится с eager (max abs diff = {error:.2e}), используется eager")
+        return model
+
+    logger.info(f"Бэкенд инференса AdaIN: {backend} (max abs diff с eager = {error:.2e})")
+    return candidate
@@ -8,16 +8,18 @@ class Encoder(nn.Module):
         self.encoder = base_cnn
 
     def forward(self, inp, return_all_outputs=False):
+        # при инференсе нужен только relu_4_1: прогоняем весь энкодер целиком, без нарезки на блоки
+        # (так энкодер можно подменить квантизованной или скомпилированной версией)
+        if not return_all_outputs:
+            return self.encoder(inp)
+
         outp1 = self.encoder[:2](inp)  # relu_1_1
         outp2 = self.encoder[2:7](outp1)  # relu_2_1
         outp3 = self.encoder[7:12](outp2)  # relu_3_1
         outp4 = self.encoder[12:21](outp3)  # relu_4_1
 
         # для подсчёта потери стиля
-        if return_all_outputs:
-            return outp1, outp2, outp3, outp4
-
-        return outp4
+        return outp1, outp2, outp3, outp4
 
 
 
@@ -52,9 +54,20 @@ class AdaIN(nn.Module):
         self.mean_std_calc = MeanStdCalculator()
 
     def forward(self, content_features, style_features) -> torch.Tensor:
-        content_mean, content_std = self.mean_std_calc(content_features)
-        content_std = content_std + 1e-8
         style_mean, style_std = self.mean_std_calc(style_features)
+
+        return self.adapt(content_features, style_mean, style_std)
+
+    def adapt(self, content_features, style_mean, style_std, content_stats=None) -> torch.Tensor:
+        """
+        То же преобразование, но по заранее посчитанным статистикам стиля (например, взятым из кэша).
+        * content_stats - статистики контента, посчитанные по всему изображению (нужны при потайловой обработке,
+          когда content_features - карты признаков лишь одного тайла)
+        """
+        if content_stats is None:
+            content_stats = self.mean_std_calc(content_features)
+        content_mean, content_std = content_stats
+        content_std = content_std + 1e-8
         style_std = style_std + 1e-8
 
         norm_content = (content_features - content_mean) / content_std
@@ -1,5 +1,4 @@
 import torch
-from torchvision.transforms import Normalize
 
 
 DEVICE = torch.device('cuda') if torch.cuda.is_available() else torch.device('cpu')
@@ -7,9 +6,23 @@ DEVICE = torch.device('cuda') if torch.cuda.is_available() else torch.device('cp
 VGG19_NORMALIZATION_MEAN = torch.tensor([0.485, 0.456, 0.406])
 VGG19_NORMALIZATION_STD = torch.tensor([0.229, 0.224, 0.225])
 
+# константы нормализации формы (3, 1, 1) для каждой пары (device, dtype): не создаются заново на каждый вызов
+_NORMALIZATION_CONSTANTS: dict[tuple, tuple[torch.Tensor, torch.Tensor]] = {}
+
+
+def _normalization_constants(device, dtype) -> tuple[torch.Tensor, torch.Tensor]:
+    key = (device, dtype)
+    constants = _NORMALIZATION_CONSTANTS.get(key)
+    if constants is None:
+        constants = (VGG19_NORMALIZATION_MEAN.to(device=device, dtype=dtype).reshape(3, 1, 1),
+                     VGG19_NORMALIZATION_STD.to(device=device, dtype=dtype).reshape(3, 1, 1))
+        _NORMALIZATION_CONSTANTS[key] = constants
+    return constants
+
 
 def preprocess_tensor(tensor: torch.Tensor):
-    return Normalize(VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD)(tensor[:3]).unsqueeze(0)
+    mean, std = _normalization_constants(tensor.device, tensor.dtype)
+    return ((tensor[:3] - mean) / std).unsqueeze(0)
 
 
 def denorm_images(images):
@@ -18,7 +31,6 @@ def denorm_images(images):
     Args:
         * images (torch.Tensor) : батч нормализованных картинок
     """
-    means = torch.tensor(VGG19_NORMALIZATION_MEAN).reshape(1, 3, 1, 1).to(DEVICE)
-    stds = torch.tensor(VGG19_NORMALIZATION_STD).reshape(1, 3, 1, 1).to(DEVICE)
+    means, stds = _normalization_constants(images.device, images.dtype)
 
-    return images * stds + means
\ No newline at end of file
+    return images * stds + means
@@ -0,0 +1,85 @@
+"""
+Статическая INT8-квантизация AdaIN-стилизатора для инференса на CPU.
+
+Квантизуются свёрточные части модели - энкодер (VGG-19 до relu4_1) и декодер. Блок AdaIN и смешивание по alpha
+остаются в float32: статистики по каналам чувствительны к ошибкам округления, а вычислений там немного.
+
+Динамическая квантизация torch применяется только к Linear/LSTM-слоям, свёртки она не затрагивает,
+поэтому используется статическая пост-тренировочная квантизация (FX graph mode) с калибровкой.
+"""
+import copy
+from typing import Iterable
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+from ml_services.adain_model.adain_model import AdainStyleTransferModel
+
+
+class _QuantizedParts(nn.Module):
+    """
+    Контейнер для сохранения квантизованных энкодера и декодера в одном TorchScript-файле.
+    """
+
+    def __init__(self, encoder: nn.Module, decoder: nn.Module):
+        super(_QuantizedParts, self).__init__()
+        self.encoder = encoder
+        self.decoder = decoder
+
+    def forward(self, inp: torch.Tensor) -> torch.Tensor:
+        return self.decoder(self.encoder(inp))
+
+
+def quantize_adain_model(model: AdainStyleTransferModel,
+                         calibration_pairs: Iterable[tuple[torch.Tensor, torch.Tensor]],
+                         alpha: float = 1.0) -> AdainStyleTransferModel:
+    """
+    Возвращает копию модели с квантизованными энкодером и декодером.
+    * calibration_pairs - пары (контент, стиль) нормализованных изображений для калибровки диапазонов активаций
+    """
+    model = copy.deepcopy(model).cpu().eval()
+
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    example_input = (torch.rand(1, 3, 64, 64),)
+
+    model.encoder.encoder = prepare_fx(model.encoder.encoder, qconfig_mapping, example_input)
+    with torch.no_grad():
+        example_features = model.encoder(example_input[0])
+    model.decoder = prepare_fx(model.decoder, qconfig_mapping, (example_features,))
+
+    # калибровка: наблюдатели собирают диапазоны активаций на реальных изображениях
+    with torch.no_grad():
+        for content, style in calibration_pairs:
+            model.stylize(content, style, alpha=alpha)
+
+    model.encoder.encoder = convert_fx(model.encoder.encoder)
+    model.decoder = convert_fx(model.decoder)
+
+    return model
+
+
+def save_quantized(model: AdainStyleTransferModel, path: str):
+    """
+    Сохранение квантизованных энкодера и декодера (TorchScript).
+    """
+    example_input = torch.rand(1, 3, 64, 64)
+
+    with torch.no_grad():
+        encoder = torch.jit.trace(model.encoder.encoder, example_input)
+        decoder = torch.jit.trace(model.decoder, encoder(example_input))
+
+    torch.jit.save(torch.jit.script(_QuantizedParts(encoder, decoder)), path)
+
+
+def load_quantized(model: AdainStyleTransferModel, path: str) -> AdainStyleTransferModel:
+    """
+    Подмена энкодера и декодера модели квантизованными версиями из файла, созданного save_quantized.
+    """
+    parts = torch.jit.load(path, map_location=torch.device('cpu'))
+
+    model.encoder.encoder = parts.encoder
+    model.decoder = parts.decoder
+
+    return model.cpu().eval()
@@ -0,0 +1,131 @@
+"""
+Кэш статистик стиля (среднее и стандартное отклонение карт признаков relu4_1) для AdaIN-стилизатора.
+
+Пользователи часто выбирают одни и те же картины, поэтому статистики стиля достаточно посчитать один раз.
+Ключ кэша - хэш пикселей декодированного (и приведённого к нужному размеру) изображения стиля и версии модели.
+Попадание даёт только изображение с теми же пикселями (картинка, пересжатая телеграмом иначе, - другой ключ),
+а статистики разных вариантов модели (INT8, ONNX, внесённая нормализация, другие веса) не смешиваются.
+
+Локальный уровень - LRU, ограниченный по суммарному объёму тензоров в байтах.
+Опционально второй уровень - Redis, общий для всех воркеров.
+"""
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+import torch
+from PIL import Image
+from redis import Redis, RedisError
+
+
+logger = logging.getLogger(__name__)
+
+
+StyleStats = tuple[torch.Tensor, torch.Tensor]
+
+
+def style_image_key(image: Image.Image, model_version: str) -> str:
+    """
+    Хэш пикселей декодированного изображения стиля и версии модели model_version, посчитавшей статистики.
+    """
+    image_hash = hashlib.sha256(image.tobytes())
+    image_hash.update(f"{image.mode}:{image.size}:{model_version}".encode())
+    return image_hash.hexdigest()
+
+
+def _stats_size(stats: StyleStats) -> int:
+    return sum(tensor.nelement() * tensor.element_size() for tensor in stats)
+
+
+class StyleStatsCache:
+    """
+    * max_bytes - ограничение на суммарный объём хранимых в памяти процесса статистик
+    * redis - клиент Redis для общего между воркерами кэша (None - только локальный кэш)
+    * redis_ttl - время жизни записи в Redis в секундах
+    """
+
+    def __init__(self, max_bytes: int, redis: Redis | None = None, redis_ttl: int | None = None,
+                 prefix: str = "adain:style_stats:"):
+        self.max_bytes = max_bytes
+        self.redis = redis
+        self.redis_ttl = redis_ttl
+        self.prefix = prefix
+
+        self._entries: OrderedDict[str, StyleStats] = OrderedDict()
+        self._size: int = 0
+        self._lock = threading.Lock()
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, key: str) -> StyleStats | None:
+        with self._lock:
+            stats = self._entries.get(key)
+            if stats is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return stats
+
+        # счётчики меняются под той же блокировкой, что и LRU: кэш общий для потоков пула воркера
+        stats = self._redis_get(key)
+        if stats is not None:
+            self._put_local(key, stats)
+            with self._lock:
+                self.hits += 1
+            return stats
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, stats: StyleStats):
+        stats = tuple(tensor.detach().cpu() for tensor in stats)
+        self._put_local(key, stats)
+        self._redis_put(key, stats)
+
+    def _put_local(self, key: str, stats: StyleStats):
+        size = _stats_size(stats)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= _stats_size(self._entries.pop(key))
+
+            self._entries[key] = stats
+            self._size += size
+
+            # вытесняем давно не использовавшиеся записи
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= _stats_size(evicted)
+
+    def _redis_get(self, key: str) -> StyleStats | None:
+        if self.redis is None:
+            return None
+
+        # Недоступность общего кэша не должна ломать стилизацию - просто считаем это промахом
+        try:
+            data = self.redis.get(self.prefix + key)
+        except RedisError as error:
+            logger.warning(f"Кэш статистик стиля в Redis недоступен: {error}")
+            return None
+
+        if data is None:
+            return None
+
+        return tuple(torch.load(io.BytesIO(data), weights_only=True))
+
+    def _redis_put(self, key: str, stats: StyleStats):
+        if self.redis is None:
+            return
+
+        buffer = io.BytesIO()
+        torch.save(stats, buffer)
+
+        try:
+            self.redis.set(self.prefix + key, buffer.getvalue(), ex=self.redis_ttl)
+        except RedisError as error:
+            logger.warning(f"Кэш статистик стиля в Redis недоступен: {error}")
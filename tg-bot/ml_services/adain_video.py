@@ -0,0 +1,111 @@
+"""
+Потоковая стилизация видео и GIF AdaIN-стилизатором.
+
+Кадры читаются из файла по одному, собираются в батчи фиксированного размера, проходят энкодер/AdaIN/декодер
+и сразу дописываются в выходной mp4-файл. В памяти одновременно находится не больше одного батча кадров,
+поэтому потребление памяти не зависит от длины ролика. Статистики стиля считаются один раз на весь ролик.
+
+Чтение и запись - через OpenCV (FFmpeg): поддерживаются обычные видеоформаты и GIF на входе, на выходе - mp4.
+"""
+import dataclasses
+import time
+from typing import Callable, Iterator
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+from torchvision.transforms import ToTensor
+
+from ml_services.adain_model import AdainStyleTransferModel
+from ml_services.adain_model.adain_model import SCALE_FACTOR
+
+
+@dataclasses.dataclass
+class VideoStylizationStats:
+    frames: int
+    seconds: float
+    frame_size: tuple[int, int]
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.seconds if self.seconds > 0 else 0.0
+
+
+def _output_size(width: int, height: int, max_side: int) -> tuple[int, int]:
+    """
+    Размер выходных кадров: большая сторона не больше max_side, обе стороны кратны SCALE_FACTOR
+    (иначе декодер вернёт кадр другого размера).
+    """
+    scale = min(max_side / max(width, height), 1.0)
+    return (max(int(width * scale) // SCALE_FACTOR * SCALE_FACTOR, SCALE_FACTOR),
+            max(int(height * scale) // SCALE_FACTOR * SCALE_FACTOR, SCALE_FACTOR))
+
+
+def _read_frames(capture: cv2.VideoCapture, size: tuple[int, int],
+                 preprocess: Callable[[torch.Tensor], torch.Tensor]) -> Iterator[torch.Tensor]:
+    """
+    Кадры размера size по одному, подготовленные для модели (preprocess, см. AdainStyleTransferModel.preprocess).
+    """
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            return
+
+        frame = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+        yield preprocess(torch.from_numpy(frame).permute(2, 0, 1).float() / 255)
+
+
+def _batches(frames: Iterator[torch.Tensor], batch_size: int) -> Iterator[torch.Tensor]:
+    batch = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == batch_size:
+            yield torch.cat(batch)
+            batch = []
+
+    if batch:
+        yield torch.cat(batch)
+
+
+def stylize_video(model: AdainStyleTransferModel, input_path: str, style_image: Image.Image, output_path: str,
+                  alpha: float = 1.0, batch_size: int = 8, max_side: int = 512, style_imsize=(512, 512),
+                  device=torch.device('cpu')) -> VideoStylizationStats:
+    """
+    Стилизация ролика input_path (видео или GIF) стилем style_image с записью результата в output_path (mp4).
+    * batch_size - число кадров в одном проходе энкодера/декодера (определяет пиковую память)
+    * max_side - ограничение большей стороны кадра
+    """
+    capture = cv2.VideoCapture(input_path)
+    if not capture.isOpened():
+        raise ValueError(f"Не удалось открыть ролик {input_path}")
+
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    size = _output_size(int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                        max_side)
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        capture.release()
+        raise ValueError(f"Не удалось создать файл {output_path}")
+
+    frames = 0
+    started_at = time.perf_counter()
+
+    try:
+        with torch.no_grad():
+            style = model.preprocess(ToTensor()(style_image.convert("RGB").resize(style_imsize))).to(device)
+            style_stats = model.style_stats(style)
+
+            for batch in _batches(_read_frames(capture, size, model.preprocess), batch_size):
+                output = model.postprocess(model.stylize(batch.to(device), alpha=alpha, style_stats=style_stats))
+                output = (output.clamp(0, 1) * 255).round().byte().permute(0, 2, 3, 1).cpu().numpy()
+
+                for frame in output:
+                    writer.write(cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_RGB2BGR))
+                frames += len(output)
+    finally:
+        capture.release()
+        writer.release()
+
+    return VideoStylizationStats(frames=frames, seconds=time.perf_counter() - started_at, frame_size=size)
@@ -0,0 +1,51 @@
+"""
+Кооперативная отмена задач стилизации.
+
+Бот добавляет пользователя в множество ожидающих задачу (TASK_REQUESTERS_KEY) перед её запуском и удаляет его
+по команде /cancel. Время жизни множества - дедлайн задачи. Если ожидающих не осталось (отмена, истёк дедлайн,
+flushall при перезапуске бота), задача не начинается, а выполняющаяся оптимизация Гатиса прерывается
+между итерациями.
+"""
+import time
+
+from redis import Redis, RedisError
+
+from celery_config import app_config, TASK_REQUESTERS_KEY, TASK_REQUESTERS_DB
+
+
+redis = Redis(host=app_config.redis.HOST, port=app_config.redis.PORT, db=TASK_REQUESTERS_DB)
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+def requesters_gone(task_id: str) -> bool:
+    """
+    Результат задачи больше никто не ждёт. При недоступности Redis задача продолжается.
+    """
+    try:
+        return not redis.exists(TASK_REQUESTERS_KEY.format(task_id=task_id))
+    except RedisError:
+        return False
+
+
+class CancellationCheck:
+    """
+    Проверка отмены задачи task_id между итерациями: Redis опрашивается не чаще раза в interval секунд,
+    поэтому проверка почти ничего не стоит.
+    """
+
+    def __init__(self, task_id: str, interval: float = 0.5):
+        self.task_id = task_id
+        self.interval = interval
+
+        self.cancelled: bool = False
+        self._checked_at: float = float("-inf")
+
+    def __call__(self) -> bool:
+        if not self.cancelled and time.perf_counter() - self._checked_at >= self.interval:
+            self.cancelled = requesters_gone(self.task_id)
+            self._checked_at = time.perf_counter()
+
+        return self.cancelled
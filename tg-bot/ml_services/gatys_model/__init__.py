@@ -1,2 +1,4 @@
-from .gatys_model import GatysModel
-from .gatys_model_config import gatys_model_config
\ No newline at end of file
+from .gatys_model import GatysModel, bf16_supported
+from .batched_gatys_model import BatchedGatysModel
+from .gatys_model_config import gatys_model_config
+from .stopping_policy import StoppingPolicy
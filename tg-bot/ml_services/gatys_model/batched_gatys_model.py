@@ -0,0 +1,163 @@
+"""
+Оптимизация Гатиса для нескольких пользователей одним батчем.
+
+Изображения разных задач (одной степени стилизации и одного размера) оптимизируются вместе: свёртки VGG
+выполняются на батче, а у каждого элемента батча - свои цели контента и стиля, свои матрицы Грама и потери.
+Потери элементов не смешиваются: градиент суммы потерь по изображению элемента равен градиенту его собственных
+потерь, а Adam обновляет каждый пиксель независимо. Поэтому результат каждого элемента совпадает с результатом
+одиночной оптимизации GatysModel: потери элемента считаются теми же операциями на его срезе, а свёртки oneDNN
+на рабочих размерах (от 128x128) дают для элемента батча те же биты, что и для одного изображения. На маленьких
+изображениях oneDNN может выбрать для батча другой алгоритм свёртки - тогда результаты расходятся в пределах
+округления float32. Проверка совпадения и сравнение пропускной способности - benchmarks/gatys_batching.py.
+
+У каждого элемента своё правило остановки: остановившийся элемент убирается из батча вместе с его состоянием
+оптимизатора, остальные продолжают оптимизацию.
+"""
+from typing import Callable
+
+import torch
+import torch.optim as optim
+
+from ml_services.gatys_model.gatys_model import GatysModel
+from ml_services.gatys_model.modules import BatchedContentLoss, BatchedStyleLoss
+from ml_services.gatys_model.stopping_policy import StoppingPolicy
+
+
+class BatchedGatysModel(GatysModel):
+    """
+    GatysModel для батча: content_img и style_img - батчи (B, 3, H, W), i-й элемент стилизуется i-м стилем.
+    Оптимизатор должен обновлять параметры поэлементно (Adam, SGD): иначе элементы батча влияли бы друг на друга.
+    """
+
+    content_loss_class = BatchedContentLoss
+    style_loss_class = BatchedStyleLoss
+
+    def _keep(self, indices: list[int]):
+        for loss_module in self.content_losses + self.style_losses:
+            loss_module.keep(indices)
+
+    @staticmethod
+    def _select(image: torch.Tensor, optimizer: optim.Optimizer, indices: list[int], optimizer_class, gamma):
+        """
+        Новые изображение, оптимизатор и планировщик только для элементов indices: состояние оптимизатора
+        (моменты Adam) переносится, поэтому оставшиеся элементы продолжают оптимизацию так же, как без удаления.
+        """
+        index = torch.tensor(indices, device=image.device)
+
+        selected = image.detach().index_select(0, index).requires_grad_(True)
+        selected_optimizer = optimizer_class([selected], lr=optimizer.param_groups[0]["lr"])
+        selected_optimizer.state[selected] = {
+            key: value.index_select(0, index) if torch.is_tensor(value) and value.shape == image.shape
+            else value.clone() if torch.is_tensor(value) else value
+            for key, value in optimizer.state[image].items()
+        }
+
+        scheduler = optim.lr_scheduler.ExponentialLR(optimizer=selected_optimizer, gamma=gamma)
+
+        return selected, selected_optimizer, scheduler
+
+    def transfer_style(self, input_images, device, optimizer_class=None, lr=0.05,
+                       num_steps=300, style_weight=100000, content_weight=1,
+                       scheduler_step: int | None = None, gamma=1.0,
+                       stopping_policies: list[StoppingPolicy] | None = None,
+                       progress_callbacks: list[Callable[[int, float, torch.Tensor], None] | None] | None = None,
+                       mixed_precision: bool = False) -> list[torch.Tensor]:
+        """
+        Оптимизация батча input_images (B, 3, H, W). Параметры - как у GatysModel.transfer_style, но правило остановки
+        и callback прогресса - свои у каждого элемента (callback получает изображение элемента (1, 3, H, W)).
+        Возвращает список результатов (1, 3, H, W) в порядке батча. steps_done - как у GatysModel, итерации батча
+        (до остановки последнего элемента); sample_steps_done - число итераций каждого элемента.
+        """
+        batch_size = input_images.shape[0]
+        optimizer_class = optimizer_class or optim.Adam
+
+        if stopping_policies is None:
+            stopping_policies = [StoppingPolicy(max_steps=num_steps) for _ in range(batch_size)]
+        if progress_callbacks is None:
+            progress_callbacks = [None] * batch_size
+
+        image = input_images.to(device).detach().clone().requires_grad_(True)
+        self.model.eval()
+
+        optimizer = optimizer_class([image], lr=lr)
+        scheduler = optim.lr_scheduler.ExponentialLR(optimizer=optimizer, gamma=gamma)
+
+        for stopping_policy in stopping_policies:
+            stopping_policy.start()
+
+        # индексы (в исходном батче) элементов, которые ещё оптимизируются; i-я строка image - элемент active[i]
+        active = list(range(batch_size))
+        results: list[torch.Tensor | None] = [None] * batch_size
+        self.sample_steps_done: list[int] = [0] * batch_size
+
+        for i in range(1, max(stopping_policy.max_steps for stopping_policy in stopping_policies) + 1):
+            sample_losses = []
+
+            def closure():
+                optimizer.zero_grad()
+
+                with torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16,
+                                    enabled=mixed_precision):
+                    self.model(image)
+
+                # потери каждого элемента - в том же порядке операций, что и в GatysModel.transfer_style
+                sample_losses.clear()
+                for position in range(len(active)):
+                    content_final_loss = 0.0
+                    style_final_loss = 0.0
+
+                    for content_loss in self.content_losses:
+                        content_final_loss += content_loss.losses[position]
+
+                    for style_loss in self.style_losses:
+                        style_final_loss += style_loss.losses[position]
+
+                    sample_losses.append(content_weight * content_final_loss + style_weight * style_final_loss)
+
+                loss = torch.stack(sample_losses).sum()
+                loss.backward()
+
+                return loss
+
+            optimizer.step(closure)
+
+            if scheduler_step:
+                if i % scheduler_step == 0:
+                    scheduler.step()
+
+            with torch.no_grad():
+                image.clamp_(0, 1)
+
+            self.steps_done = i
+
+            stopped = []
+            for position, index in enumerate(active):
+                loss = sample_losses[position].item()
+                self.sample_steps_done[index] = i
+
+                if progress_callbacks[index] is not None:
+                    progress_callbacks[index](i, loss, image[position:position + 1])
+
+                if stopping_policies[index].should_stop(i, loss):
+                    stopped.append(position)
+
+            if not stopped:
+                continue
+
+            for position in stopped:
+                results[active[position]] = image[position:position + 1].detach().clone()
+
+            keep = [position for position in range(len(active)) if position not in stopped]
+            if not keep:
+                break
+
+            active = [active[position] for position in keep]
+            self._keep(keep)
+            image, optimizer, scheduler = BatchedGatysModel._select(image, optimizer, keep, optimizer_class, gamma)
+
+        # элементы с max_steps = 0 не оптимизировались
+        for position, index in enumerate(active):
+            if results[index] is None:
+                results[index] = image[position:position + 1].detach().clamp(0, 1)
+
+        return results
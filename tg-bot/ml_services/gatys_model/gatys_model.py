@@ -1,7 +1,11 @@
+from typing import Callable
+
 import torch
 import torch.nn as nn
 import torch.optim as optim
 from ml_services.gatys_model.modules import Normalization, ContentLoss, StyleLoss
+from ml_services.gatys_model.stopping_policy import StoppingPolicy
+from ml_services.normalization_folding import NormalizedInputConv2d
 
 VGG19_NORMALIZATION_MEAN = torch.tensor([0.485, 0.456, 0.406])
 VGG19_NORMALIZATION_STD = torch.tensor([0.229, 0.224, 0.225])
@@ -10,11 +14,33 @@ CONTENT_LAYERS_DEFAULT = ['Conv_4']
 STYLE_LAYERS_DEFAULT = ['Conv_1', 'Conv_2', 'Conv_3', 'Conv_4', 'Conv_5']
 
 
+def bf16_supported(device) -> bool:
+    """
+    Есть ли у устройства аппаратная поддержка bfloat16. На CPU без AVX512-BF16 или AMX операции в bfloat16
+    эмулируются и выполняются медленнее, чем в float32.
+    """
+    device = torch.device(device)
+
+    if device.type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+
+    if device.type == 'cpu':
+        checks = (getattr(torch.cpu, "_is_avx512_bf16_supported", None),
+                  getattr(torch.cpu, "_is_amx_tile_supported", None))
+        return any(check is not None and check() for check in checks)
+
+    return False
+
+
 class GatysModel:
     """
     Класс-интерфейс переноса стиля.
     """
 
+    # модули потерь, встраиваемые после слоёв CONTENT_LAYERS / STYLE_LAYERS (см. BatchedGatysModel)
+    content_loss_class = ContentLoss
+    style_loss_class = StyleLoss
+
     def __init__(self, base_cnn, content_img, style_img, device,
                  normalization_mean=VGG19_NORMALIZATION_MEAN,
                  normalization_std=VGG19_NORMALIZATION_STD,
@@ -26,8 +52,56 @@ class GatysModel:
         self.model = nn.Sequential().to(device)
         self.content_losses = []
         self.style_losses = []
+        self.steps_done: int = 0  # сколько итераций реально выполнил последний вызов transfer_style
+
+        # если нормализация уже внесена в первую свёртку (load_base_cnn(fold_normalization=True)),
+        # отдельный модуль нормализации не нужен: на каждой итерации на один поэлементный проход меньше
+        if isinstance(next(iter(base_cnn.children())), NormalizedInputConv2d):
+            normalization = nn.Identity()
+        else:
+            normalization = Normalization(mean=normalization_mean, std=normalization_std).to(device)
+
+        layers = GatysModel._name_layers(base_cnn, device)
+
+        # Слои после самого глубокого слоя с потерей на результат не влияют - отрезаем их
+        loss_layers = set(content_layers) | set(style_layers)
+        last_loss_layer = max((i for i, (module_name, _) in enumerate(layers) if module_name in loss_layers),
+                              default=-1)
+        layers = layers[:last_loss_layer + 1]
+
+        # Целевые карты признаков собираются за один прямой проход для каждого изображения
+        content_targets = GatysModel._collect_targets(normalization, layers, content_img, content_layers)
+        style_targets = GatysModel._collect_targets(normalization, layers, style_img, style_layers)
+
+        if not isinstance(normalization, nn.Identity):
+            self.model.add_module("ImageNorm", normalization)
+
+        conv_counter: int = 0
+
+        for module_name, layer in layers:
+            if isinstance(layer, nn.Conv2d):
+                conv_counter += 1
+
+            self.model.add_module(module_name, layer)
+
+            if module_name in content_targets:
+                content_loss_module = self.content_loss_class(content_targets[module_name])
+                self.content_losses.append(content_loss_module)
+                self.model.add_module(f"ContentLoss_{conv_counter}", content_loss_module)
+
+            if module_name in style_targets:
+                style_loss_module = self.style_loss_class(style_targets[module_name])
+                self.style_losses.append(style_loss_module)
+                self.model.add_module(f"StyleLoss_{conv_counter}", style_loss_module)
+
+        self.model.to(device)
 
-        self.model.add_module("ImageNorm", Normalization(mean=normalization_mean, std=normalization_std).to(device))
+    @staticmethod
+    def _name_layers(base_cnn, device) -> list[tuple[str, nn.Module]]:
+        """
+        Именование слоёв базовой сети: Conv_i, ReLU_i, MaxPool2d_i, где i - номер последней свёртки.
+        """
+        layers = []
 
         conv_counter: int = 0
         module_name: str = ""
@@ -47,30 +121,51 @@ class GatysModel:
             else:
                 raise ValueError
 
-            self.model.add_module(module_name, layer.to(device))
+            layers.append((module_name, layer.to(device)))
 
-            if module_name in content_layers:
-                target = self.model(content_img).detach().to(device)
-                content_loss_module = ContentLoss(target)
-                self.content_losses.append(content_loss_module)
-                self.model.add_module(f"ContentLoss_{conv_counter}", content_loss_module)
+        return layers
 
-            if module_name in style_layers:
-                target = self.model(style_img).detach().to(device)
-                style_loss_module = StyleLoss(target)
-                self.style_losses.append(style_loss_module)
-                self.model.add_module(f"StyleLoss_{conv_counter}", style_loss_module)
+    @staticmethod
+    def _collect_targets(normalization, layers, img, target_layers) -> dict[str, torch.Tensor]:
+        """
+        Один прямой проход изображения img с сохранением выходов слоёв из target_layers.
+        """
+        targets = {}
+        target_layers = set(target_layers) & {module_name for module_name, _ in layers}
 
-        self.model.to(device)
+        if not target_layers:
+            return targets
+
+        with torch.no_grad():
+            out = normalization(img)
+            for module_name, layer in layers:
+                out = layer(out)
+
+                if module_name in target_layers:
+                    targets[module_name] = out.detach()
+
+                    if len(targets) == len(target_layers):
+                        break
+
+        return targets
 
     def __repr__(self):
         return f'{self.__class__.__name__}(model = {self.model})'
 
     def transfer_style(self, input_image, device, optimizer_class=None, lr=0.05,
                        num_steps=300, style_weight=100000, content_weight=1,
-                       scheduler_step: int | None = None, gamma=1.0):
+                       scheduler_step: int | None = None, gamma=1.0,
+                       stopping_policy: StoppingPolicy | None = None,
+                       progress_callback: Callable[[int, float, torch.Tensor], None] | None = None,
+                       mixed_precision: bool = False):
         """
         Функция, реализующая алгоритм Гатиса. Итеративная оптимизация изображения для получения стилизации.
+        * stopping_policy - правило досрочной остановки (плато потерь, бюджет времени);
+          если не задано, выполняется ровно num_steps итераций
+        * progress_callback - вызывается после каждой итерации с номером итерации, потерями и текущим изображением
+          (частоту публикации прогресса ограничивает сам callback)
+        * mixed_precision - прямой проход VGG в bfloat16 (torch.autocast); матрицы Грама и потери считаются
+          в float32, изображение и состояние оптимизатора остаются в float32 (см. bf16_supported)
         """
         input_image = input_image.to(device)
 
@@ -85,12 +180,18 @@ class GatysModel:
 
         scheduler = optim.lr_scheduler.ExponentialLR(optimizer=optimizer, gamma=gamma)
 
-        for i in range(1, num_steps + 1):
+        if stopping_policy is None:
+            stopping_policy = StoppingPolicy(max_steps=num_steps)
+        stopping_policy.start()
+
+        for i in range(1, stopping_policy.max_steps + 1):
 
             def closure():
                 optimizer.zero_grad()
 
-                self.model(input_image)
+                with torch.autocast(device_type=torch.device(device).type, dtype=torch.bfloat16,
+                                    enabled=mixed_precision):
+                    self.model(input_image)
                 content_final_loss = 0.0
                 style_final_loss = 0.0
 
@@ -105,7 +206,7 @@ class GatysModel:
 
                 return loss
 
-            optimizer.step(closure)
+            loss = optimizer.step(closure)
 
             if scheduler_step:
                 if i % scheduler_step == 0:
@@ -114,6 +215,14 @@ class GatysModel:
             with torch.no_grad():
                 input_image.clamp_(0, 1)
 
+            self.steps_done = i
+            loss = loss.item()
+
+            if progress_callback is not None:
+                progress_callback(i, loss, input_image)
+
+            if stopping_policy.should_stop(i, loss):
+                break
 
         with torch.no_grad():
             input_image.clamp_(0, 1)
@@ -3,52 +3,126 @@ import torch.optim as optim
 
 
 gatys_model_config = {
+    # версия модели (весов и алгоритма) для ключа кэша результатов; увеличивается при изменениях, меняющих результат
+    "VERSION": 1,
     "DEVICE": torch.device('cuda') if torch.cuda.is_available() else torch.device('cpu'),
     "IMSIZE": (512, 512) if torch.cuda.is_available() else (256, 256),
     "OPTIMIZER": optim.Adam,
+    # (опционально) нормализация входа внесена в первую свёртку VGG (ml_services/normalization_folding.py):
+    # на каждой итерации нет отдельных проходов нормализации и её градиента. С исходной моделью совпадает только
+    # градиент потерь, посчитанный в float64 (scripts/check_normalization_folding.py); итоговые изображения
+    # в float32 расходятся (ошибки округления усиливаются оптимизатором), поэтому по умолчанию выключено
+    "FOLD_NORMALIZATION": False,
+    # Пирамидальный режим: оптимизация на низком разрешении, затем уточнение увеличенного результата
+    # на каждом следующем уровне. Число итераций на уровнях задаётся в PYRAMID_STEPS для каждой степени.
+    "PYRAMID": {
+        "ENABLED": False,
+        "IMSIZES": [(128, 128), (256, 256), (512, 512)]
+    },
+    # Прогресс оптимизации для бота: события не чаще раза в MIN_INTERVAL секунд, превью размера PREVIEW_SIZE
+    # (по большей стороне) - не чаще раза в PREVIEW_EVERY итераций (None - без превью)
+    "PROGRESS": {
+        "MIN_INTERVAL": 2.0,
+        "PREVIEW_EVERY": 25,
+        "PREVIEW_SIZE": 128
+    },
+    # Батчинг задач разных пользователей (BatchedGatysModel): задачи одной степени и одного размера, пришедшие
+    # в воркер за WINDOW секунд, оптимизируются одним батчем не больше MAX_BATCH_SIZE (1 - каждая задача отдельно).
+    # Батч собирается из задач, которые воркер выполняет одновременно (GATYS_CONCURRENCY в entrypoint.sh).
+    # Батч выгоден на GPU; на CPU свёртки одного изображения 256x256 уже загружают все потоки torch, и батч
+    # не увеличивает пропускную способность, а только задержку (benchmarks/gatys_batching.py)
+    "BATCH": {
+        "WINDOW": 0.5,
+        "MAX_BATCH_SIZE": 4 if torch.cuda.is_available() else 1
+    },
+    # STOPPING - условия досрочной остановки (см. StoppingPolicy): бюджет времени в секундах и плато потерь.
+    # NUM_STEPS остаётся верхней границей числа итераций.
+    # MIXED_PRECISION - оптимизация с прямым проходом VGG в bfloat16 (матрицы Грама и потери - в float32);
+    # включается только на устройствах с аппаратной поддержкой bfloat16 (см. bf16_supported),
+    # сравнение качества и скорости с float32: scripts/compare_gatys_precision.py
     "1": {
         "LR": 0.05,
         "NUM_STEPS": 20,
+        "PYRAMID_STEPS": [40, 5, 3],
         "STYLE_WEIGHT": 10**8,
         "SCHEDULER_STEP": None,
         "GAMMA": 1.0,
+        "MIXED_PRECISION": False,
         "CONTENT_LAYERS": [f'Conv_{i}' for i in range(14, 17)],
-        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 7)]
+        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 7)],
+        "STOPPING": {
+            "TIME_BUDGET": 20,
+            "REL_TOL": 1e-3,
+            "PATIENCE": 5,
+            "MIN_STEPS": 10
+        }
     },
     "2": {
         "LR": 0.05,
         "NUM_STEPS": 40,
+        "PYRAMID_STEPS": [80, 10, 5],
         "STYLE_WEIGHT": 10**8,
         "SCHEDULER_STEP": None,
         "GAMMA": 1.0,
+        "MIXED_PRECISION": False,
         "CONTENT_LAYERS": [f'Conv_{i}' for i in range(14, 17)],
-        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 9)]
+        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 9)],
+        "STOPPING": {
+            "TIME_BUDGET": 35,
+            "REL_TOL": 1e-3,
+            "PATIENCE": 5,
+            "MIN_STEPS": 10
+        }
     },
     "3": {
         "LR": 0.05,
         "NUM_STEPS": 60,
+        "PYRAMID_STEPS": [120, 15, 8],
         "STYLE_WEIGHT": 10**8,
         "SCHEDULER_STEP": None,
         "GAMMA": 1.0,
+        "MIXED_PRECISION": False,
         "CONTENT_LAYERS": [f'Conv_{i}' for i in range(14, 17)],
-        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 11)]
+        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 11)],
+        "STOPPING": {
+            "TIME_BUDGET": 50,
+            "REL_TOL": 1e-3,
+            "PATIENCE": 5,
+            "MIN_STEPS": 10
+        }
     },
     "4": {
         "LR": 0.05,
         "NUM_STEPS": 80,
+        "PYRAMID_STEPS": [160, 20, 10],
         "STYLE_WEIGHT": 10**8,
         "SCHEDULER_STEP": None,
         "GAMMA": 1.0,
+        "MIXED_PRECISION": False,
         "CONTENT_LAYERS": [f'Conv_{i}' for i in range(14, 17)],
-        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 13)]
+        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 13)],
+        "STOPPING": {
+            "TIME_BUDGET": 80,
+            "REL_TOL": 1e-3,
+            "PATIENCE": 5,
+            "MIN_STEPS": 10
+        }
     },
     "5": {
         "LR": 0.08,
         "NUM_STEPS": 100,
+        "PYRAMID_STEPS": [200, 25, 12],
         "STYLE_WEIGHT": 10**8,
         "SCHEDULER_STEP": 25,
         "GAMMA": 0.85,
+        "MIXED_PRECISION": False,
         "CONTENT_LAYERS": [],
-        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 17)]
+        "STYLE_LAYERS": [f'Conv_{i}' for i in range(1, 17)],
+        "STOPPING": {
+            "TIME_BUDGET": 90,
+            "REL_TOL": 1e-3,
+            "PATIENCE": 5,
+            "MIN_STEPS": 10
+        }
     }
 }
\ No newline at end of file
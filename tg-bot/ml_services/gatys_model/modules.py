@@ -9,7 +9,8 @@ class ContentLoss(nn.Module):
         self.target = target.detach()
 
     def forward(self, inp):
-        self.loss = F.mse_loss(inp, self.target)
+        # при смешанной точности признаки приходят в bfloat16, потери считаются в float32
+        self.loss = F.mse_loss(inp.float(), self.target)
         return inp
 
 
@@ -24,7 +25,11 @@ class StyleLoss(nn.Module):
 
         features = inp.view(batch_size * nmaps, w * h)  # Получаем для каждой карты признаков вектор размера wxh
 
-        G = torch.mm(features, features.T)
+        # матрица Грама всегда накапливается в float32: внутри autocast torch.mm выполнялся бы в bfloat16,
+        # а суммы по w * h элементам в bfloat16 слишком неточны
+        with torch.autocast(device_type=inp.device.type, enabled=False):
+            features = features.float()
+            G = torch.mm(features, features.T)
 
         return G.div(batch_size * nmaps * w * h)
 
@@ -34,6 +39,46 @@ class StyleLoss(nn.Module):
         return inp
 
 
+class BatchedContentLoss(nn.Module):
+    """
+    Потери контента для батча изображений со своей целью у каждого элемента.
+    Потери каждого элемента (список losses) считаются теми же операциями, что и в ContentLoss, на его срезе батча.
+    """
+
+    def __init__(self, target):
+        super(BatchedContentLoss, self).__init__()
+        self.targets = [sample.detach() for sample in target.split(1)]
+
+    def keep(self, indices: list[int]):
+        """
+        Оставить цели только элементов indices (остальные элементы убраны из батча).
+        """
+        self.targets = [self.targets[i] for i in indices]
+
+    def forward(self, inp):
+        self.losses = [F.mse_loss(sample.float(), target) for sample, target in zip(inp.split(1), self.targets)]
+        return inp
+
+
+class BatchedStyleLoss(nn.Module):
+    """
+    Потери стиля для батча изображений со своим стилем у каждого элемента: матрица Грама и потери
+    считаются отдельно для каждого элемента так же, как в StyleLoss.
+    """
+
+    def __init__(self, target):
+        super(BatchedStyleLoss, self).__init__()
+        self.targets = [StyleLoss.gram_matrix(sample).detach() for sample in target.split(1)]
+
+    def keep(self, indices: list[int]):
+        self.targets = [self.targets[i] for i in indices]
+
+    def forward(self, inp):
+        self.losses = [F.mse_loss(StyleLoss.gram_matrix(sample), target)
+                       for sample, target in zip(inp.split(1), self.targets)]
+        return inp
+
+
 class Normalization(nn.Module):
     def __init__(self, mean, std):
         super(Normalization, self).__init__()
@@ -0,0 +1,88 @@
+import time
+from typing import Callable
+
+
+class StoppingPolicy:
+    """
+    Правило досрочной остановки оптимизации в алгоритме Гатиса.
+
+    Оптимизация завершается по первому из сработавших условий:
+    * max_steps - достигнуто максимальное число итераций
+    * time_budget - истёк бюджет времени в секундах (None - без ограничения)
+    * rel_tol, patience - функция потерь вышла на плато: на протяжении patience итераций подряд
+      лучшее значение потерь улучшалось меньше, чем на rel_tol (относительно) (rel_tol=None - не проверять)
+    * min_steps - плато не проверяется на первых min_steps итерациях: в начале оптимизации потери могут колебаться
+    * is_cancelled - задача отменена (результат никто не ждёт), проверяется первым
+    """
+
+    def __init__(self, max_steps: int, time_budget: float | None = None,
+                 rel_tol: float | None = None, patience: int = 5, min_steps: int = 0,
+                 is_cancelled: Callable[[], bool] | None = None):
+        self.max_steps = max_steps
+        self.time_budget = time_budget
+        self.rel_tol = rel_tol
+        self.patience = patience
+        self.min_steps = min_steps
+        self.is_cancelled = is_cancelled
+
+        self.reason: str | None = None
+        self._started_at: float = 0.0
+        self._best_loss: float = float("inf")
+        self._bad_steps: int = 0
+
+    @classmethod
+    def from_config(cls, degree_config: dict, max_steps: int | None = None,
+                    is_cancelled: Callable[[], bool] | None = None) -> "StoppingPolicy":
+        """
+        Создание правила по записи степени стилизации из gatys_model_config.
+        max_steps позволяет переопределить NUM_STEPS (например, для уровня пирамиды).
+        """
+        stopping_config = degree_config.get("STOPPING", {})
+
+        return cls(
+            max_steps=degree_config["NUM_STEPS"] if max_steps is None else max_steps,
+            time_budget=stopping_config.get("TIME_BUDGET"),
+            rel_tol=stopping_config.get("REL_TOL"),
+            patience=stopping_config.get("PATIENCE", 5),
+            min_steps=stopping_config.get("MIN_STEPS", 0),
+            is_cancelled=is_cancelled
+        )
+
+    def start(self):
+        self.reason = None
+        self._started_at = time.perf_counter()
+        self._best_loss = float("inf")
+        self._bad_steps = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started_at
+
+    def should_stop(self, step: int, loss: float) -> bool:
+        """
+        Вызывается после каждой итерации: step - номер выполненной итерации (с единицы), loss - её потери.
+        """
+        if self.is_cancelled is not None and self.is_cancelled():
+            self.reason = "cancelled"
+            return True
+
+        if self.rel_tol is not None:
+            if loss < self._best_loss * (1 - self.rel_tol):
+                self._bad_steps = 0
+            else:
+                self._bad_steps += 1
+
+            self._best_loss = min(self._best_loss, loss)
+
+            if step > self.min_steps and self._bad_steps >= self.patience:
+                self.reason = "plateau"
+                return True
+
+        if self.time_budget is not None and self.elapsed() >= self.time_budget:
+            self.reason = "time_budget"
+            return True
+
+        if step >= self.max_steps:
+            self.reason = "max_steps"
+            return True
+
+        return False
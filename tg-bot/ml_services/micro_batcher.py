@@ -0,0 +1,121 @@
+"""
+Микро-батчинг задач инференса.
+
+Задачи, поступающие из разных потоков воркера celery, накапливаются в очереди в течение короткого окна
+(или пока не наберётся MAX_BATCH_SIZE задач), после чего обрабатываются одним батчем.
+Каждая задача получает свой собственный результат.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ("item", "key", "future", "enqueued_at")
+
+    def __init__(self, item: Any, key: Hashable):
+        self.item = item
+        self.key = key
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Собирает задачи в батчи и передаёт их в функцию process_batch.
+
+    * process_batch - функция, принимающая список элементов и возвращающая список результатов той же длины
+    * window - время (в секундах), в течение которого ожидаются другие задачи после прихода первой
+    * max_batch_size - максимальный размер батча; батч отправляется сразу, как только он набран
+    * name - имя батчера для логов
+
+    В один батч попадают только задачи с одинаковым ключом key (например, с одинаковым размером тензоров).
+    """
+
+    def __init__(self, process_batch: Callable[[list], list], window: float = 0.05,
+                 max_batch_size: int = 8, name: str = "batcher"):
+        self.process_batch = process_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.name = name
+
+        self._queue: deque[_Job] = deque()
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+        self.last_batch_size: int = 0
+        self.last_queue_delay: float = 0.0
+
+    def submit(self, item: Any, key: Hashable = None) -> Any:
+        """
+        Добавляет задачу в очередь и блокирует вызывающий поток до получения результата.
+        Исключение, возникшее при обработке батча, пробрасывается в каждую задачу этого батча.
+        """
+        job = _Job(item, key)
+
+        with self._condition:
+            self._ensure_started()
+            self._queue.append(job)
+            self._condition.notify()
+
+        return job.future.result()
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-thread", daemon=True)
+            self._thread.start()
+
+    def _collect_batch(self) -> list[_Job]:
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+
+            # окно отсчитывается от момента постановки в очередь самой старой задачи
+            deadline = self._queue[0].enqueued_at + self.window
+            key = self._queue[0].key
+
+            while True:
+                same_key = sum(1 for job in self._queue if job.key == key)
+                remaining = deadline - time.perf_counter()
+                if same_key >= self.max_batch_size or remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+
+            batch = []
+            rest = deque()
+            for job in self._queue:
+                if job.key == key and len(batch) < self.max_batch_size:
+                    batch.append(job)
+                else:
+                    rest.append(job)
+            self._queue = rest
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            started_at = time.perf_counter()
+            delays = [started_at - job.enqueued_at for job in batch]
+            self.last_batch_size = len(batch)
+            self.last_queue_delay = max(delays)
+
+            try:
+                results = self.process_batch([job.item for job in batch])
+            except Exception as error:
+                for job in batch:
+                    job.future.set_exception(error)
+            else:
+                for job, result in zip(batch, results):
+                    job.future.set_result(result)
+
+            logger.info(f"{self.name}: batch_size={len(batch)} "
+                        f"queue_delay_avg={sum(delays) / len(delays):.3f}s queue_delay_max={max(delays):.3f}s "
+                        f"process_time={time.perf_counter() - started_at:.3f}s")
@@ -0,0 +1,110 @@
+"""
+Загрузка весов моделей.
+
+Веса загружаются через mmap и присваиваются параметрам моделей без копирования (load_state_dict(assign=True)).
+Поэтому данные весов - это страницы файла в page cache, общие для всех процессов воркера: и для дочерних процессов
+prefork, унаследовавших модель от родителя, и для отдельно запущенных воркеров.
+"""
+import logging
+
+import torch
+import torch.nn as nn
+from torchvision.models import vgg19
+
+from ml_services.adain_model import AdainStyleTransferModel
+from ml_services.adain_model.quantization import load_quantized
+from ml_services.adain_model.backends import apply_backend
+from ml_services.gatys_model.gatys_model import VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD
+from ml_services.normalization_folding import NormalizedInputConv2d
+
+
+logger = logging.getLogger(__name__)
+
+
+VGG19_ENCODER_WEIGHTS = './ml_services/models/vgg19_encoder_weights.pt'
+ADAIN_ENCODER_WEIGHTS = './ml_services/models/adain_encoder_weights.pt'
+ADAIN_MODEL_WEIGHTS = './ml_services/models/adain_style_model.pt'
+ADAIN_MODEL_INT8_WEIGHTS = './ml_services/models/adain_style_model_int8.pt'
+MODELS_DIR = './ml_services/models'
+
+
+def _load_weights(path: str):
+    return torch.load(path, map_location=torch.device('cpu'), mmap=True)
+
+
+def load_base_cnn(device, fold_normalization: bool = False) -> nn.Sequential:
+    """
+    VGG-19 (35 слоёв) для алгоритма Гатиса. Градиенты по весам не нужны.
+    При fold_normalization=True нормализация входа внесена в первую свёртку: сеть принимает изображения в [0, 1].
+    """
+    base_cnn = vgg19().features[0: 35]
+    base_cnn.load_state_dict(_load_weights(VGG19_ENCODER_WEIGHTS), assign=True)
+
+    if fold_normalization:
+        base_cnn[0] = NormalizedInputConv2d(base_cnn[0], VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD)
+
+    base_cnn = base_cnn.to(device)
+
+    for param in base_cnn.parameters():
+        param.requires_grad = False
+
+    return base_cnn
+
+
+def load_adain_model(device, quantized: bool = False, backend: str = "eager",
+                     fold_normalization: bool = False) -> AdainStyleTransferModel:
+    """
+    AdaIN-стилизатор. При quantized=True энкодер и декодер заменяются INT8-версиями (только CPU),
+    иначе на CPU они могут выполняться выбранным бэкендом инференса (см. adain_model/backends.py).
+    fold_normalization=True вносит нормализацию входа и денормализацию выхода в свёртки (см. fold_normalization);
+    применяется только к eager-модели: граф TorchScript/ONNX зафиксировал бы краевые поправки одного размера входа.
+    Фактически используемый вариант модели (int8 или бэкенд после возможного отката на eager) - в inference_backend.
+    """
+    base_cnn = vgg19().features[:21]
+    base_cnn.load_state_dict(_load_weights(ADAIN_ENCODER_WEIGHTS), assign=True)
+
+    adain_model = AdainStyleTransferModel(base_cnn)
+    adain_model.load_state_dict(_load_weights(ADAIN_MODEL_WEIGHTS)['model_state_dict'], assign=True)
+
+    if quantized:
+        adain_model = load_quantized(adain_model, ADAIN_MODEL_INT8_WEIGHTS)
+    else:
+        eager_model = adain_model = adain_model.to(device).eval()
+
+        if torch.device(device).type == 'cpu':
+            adain_model = apply_backend(adain_model, backend, export_dir=MODELS_DIR)
+
+        if fold_normalization and adain_model is eager_model:
+            adain_model.fold_normalization()
+
+    adain_model.inference_backend = "int8" if quantized else "eager" if adain_model is eager_model else backend
+
+    for param in adain_model.parameters():
+        param.requires_grad = False
+
+    return adain_model
+
+
+def parameters_size(module: nn.Module) -> int:
+    """
+    Объём параметров модели в байтах.
+    """
+    return sum(param.nelement() * param.element_size() for param in module.parameters())
+
+
+def process_memory() -> dict[str, int]:
+    """
+    Rss и Pss текущего процесса в байтах (Linux). Pss делит общие страницы между процессами,
+    поэтому разница Rss - Pss показывает, сколько памяти процесс делит с другими.
+    """
+    memory = {}
+    try:
+        with open('/proc/self/smaps_rollup') as smaps:
+            for line in smaps:
+                key, value = line.split(':', 1)
+                if key in ('Rss', 'Pss'):
+                    memory[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+
+    return memory
@@ -0,0 +1,105 @@
+"""
+Нормализация изображений, внесённая в свёртки сети.
+
+Обе модели работают с нормализованными изображениями: (x - mean) / std на входе VGG и x * std + mean на выходе
+декодера AdaIN. Эти поэлементные операции можно внести в веса соседних свёрток, и тогда модель принимает
+и возвращает изображения в [0, 1]. Для Гатиса это убирает нормализацию (и её обратный проход) из каждой итерации,
+для AdaIN - ещё и денормализацию результата.
+
+Проверка совпадения с исходными модулями: scripts/check_normalization_folding.py.
+"""
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class NormalizedInputConv2d(nn.Conv2d):
+    """
+    Свёртка с внесённой в неё нормализацией входа (x - mean) / std: веса делятся на std, из смещения вычитается
+    вклад mean. Вход - изображение без нормализации.
+
+    Исходная свёртка дополняет нулями нормализованное изображение, то есть исходное - значениями mean. Поэтому
+    вход дополняется явно: нулями и затем рамкой из mean (рамка хранится для каждого размера входа), а сама
+    свёртка выполняется без дополнения. Рамка складывается с трёхканальным входом, а не с выходом свёртки,
+    поэтому это дешевле отдельной нормализации и в прямом, и в обратном проходе.
+    """
+
+    # рамки хранятся для нескольких последних размеров входа (размер изображения, уровни пирамиды, тайлы)
+    MAX_CACHED_SIZES = 8
+
+    def __init__(self, conv: nn.Conv2d, mean: torch.Tensor, std: torch.Tensor):
+        if conv.groups != 1 or conv.padding_mode != "zeros" or isinstance(conv.padding, str):
+            raise ValueError(f"Нормализацию можно внести только в обычную свёртку с дополнением нулями, а не в {conv}")
+
+        super(NormalizedInputConv2d, self).__init__(conv.in_channels, conv.out_channels, conv.kernel_size,
+                                                    stride=conv.stride, padding=conv.padding,
+                                                    dilation=conv.dilation, bias=True,
+                                                    device=conv.weight.device, dtype=conv.weight.dtype)
+
+        # новые веса считаются в float64, чтобы округление не добавляло ошибки к исходным весам
+        weight = conv.weight.detach().double()
+        mean = mean.to(weight).view(1, -1, 1, 1)
+        std = std.to(weight).view(1, -1, 1, 1)
+
+        with torch.no_grad():
+            bias = conv.bias.double() if conv.bias is not None else torch.zeros_like(self.bias, dtype=torch.float64)
+            self.weight.copy_(weight / std)
+            self.bias.copy_(bias - (weight * mean / std).sum(dim=(1, 2, 3)))
+
+        self.weight.requires_grad_(conv.weight.requires_grad)
+        self.bias.requires_grad_(conv.weight.requires_grad)
+
+        self.register_buffer("pad_value", mean.to(conv.weight.dtype), persistent=False)
+        self._borders: dict[tuple, torch.Tensor] = {}
+
+    def _border(self, height: int, width: int, dtype: torch.dtype) -> torch.Tensor:
+        """
+        Рамка шириной padding со значениями mean (внутри - нули) для входа размера height x width.
+        """
+        key = (height, width, self.pad_value.device, dtype)
+        border = self._borders.get(key)
+        if border is not None:
+            return border
+
+        pad_h, pad_w = self.padding
+        border = self.pad_value.to(dtype).expand(1, -1, height + 2 * pad_h, width + 2 * pad_w).clone()
+        border[:, :, pad_h:pad_h + height, pad_w:pad_w + width] = 0
+
+        if len(self._borders) >= self.MAX_CACHED_SIZES:
+            self._borders.clear()
+        self._borders[key] = border
+
+        return border
+
+    def forward(self, inp: torch.Tensor) -> torch.Tensor:
+        pad_h, pad_w = self.padding
+        if pad_h == 0 and pad_w == 0:
+            return F.conv2d(inp, self.weight, self.bias, self.stride, 0, self.dilation)
+
+        height, width = inp.shape[-2:]
+        padded = F.pad(inp, (pad_w, pad_w, pad_h, pad_h)) + self._border(height, width, inp.dtype)
+
+        return F.conv2d(padded, self.weight, self.bias, self.stride, 0, self.dilation)
+
+
+def denormalized_output_conv(conv: nn.Conv2d, mean: torch.Tensor, std: torch.Tensor) -> nn.Conv2d:
+    """
+    Свёртка с внесённой в неё денормализацией результата x * std + mean (по выходным каналам - точное равенство).
+    """
+    folded = nn.Conv2d(conv.in_channels, conv.out_channels, conv.kernel_size, stride=conv.stride,
+                       padding=conv.padding, dilation=conv.dilation, groups=conv.groups, bias=True,
+                       padding_mode=conv.padding_mode, device=conv.weight.device, dtype=conv.weight.dtype)
+
+    weight = conv.weight.detach().double()
+    mean = mean.to(weight)
+    std = std.to(weight)
+
+    with torch.no_grad():
+        bias = conv.bias.double() if conv.bias is not None else torch.zeros_like(folded.bias, dtype=torch.float64)
+        folded.weight.copy_(weight * std.view(-1, 1, 1, 1))
+        folded.bias.copy_(bias * std + mean)
+
+    folded.weight.requires_grad_(conv.weight.requires_grad)
+    folded.bias.requires_grad_(conv.weight.requires_grad)
+
+    return folded
@@ -0,0 +1,61 @@
+"""
+Время этапов задач стилизации: декодирование, изменение размера, построение модели, оптимизация/инференс,
+кодирование JPEG.
+
+Время накапливается отдельно в каждом потоке, поэтому задачи воркера с пулом потоков не смешивают свои замеры.
+Задача сбрасывает замеры в начале (reset) и пишет их в лог в конце; бенчмарк (benchmarks/ml_services.py)
+забирает их после вызова задачи.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from services.tracing import span, record_span
+
+
+STAGES = ("decode", "resize", "batch_wait", "build", "optimize", "infer", "encode")
+
+
+class StageTimer:
+    def __init__(self):
+        self._local = threading.local()
+
+    def _stages(self) -> dict[str, float]:
+        if not hasattr(self._local, "stages"):
+            self._local.stages = {}
+        return self._local.stages
+
+    def reset(self):
+        self._local.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Замер этапа name. Повторные замеры одного этапа (например, на уровнях пирамиды) суммируются.
+        Внутри трассы запроса этап записывается ещё и как span.
+        """
+        started_at = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            stages = self._stages()
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - started_at
+
+    def record(self, name: str, start: float, end: float):
+        """
+        Этап с известными временами начала и конца (time.time()), выполненный в другом потоке (например, батчером):
+        время добавляется к замерам текущего потока, а span - к трассе текущей задачи.
+        """
+        stages = self._stages()
+        stages[name] = stages.get(name, 0.0) + max(end - start, 0.0)
+        record_span(name, start, end)
+
+    def stages(self) -> dict[str, float]:
+        return dict(self._stages())
+
+    def summary(self) -> str:
+        return ", ".join(f"{name}={seconds * 1000:.0f} мс" for name, seconds in self._stages().items())
+
+
+STAGE_TIMER = StageTimer()
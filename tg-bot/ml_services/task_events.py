@@ -0,0 +1,153 @@
+"""
+Публикация событий задач стилизации в Redis pub/sub.
+
+Бот подписан на канал TASK_EVENTS_CHANNEL и узнаёт о завершении задачи сразу, без периодического опроса
+бэкенда результатов. Долгие задачи дополнительно публикуют события прогресса (состояние PROGRESS_STATE).
+"""
+import json
+import logging
+import time
+from typing import Callable
+
+import torch
+import torch.nn.functional as F
+from torchvision.transforms import ToPILImage
+
+from celery.signals import task_postrun, task_revoked
+from redis import Redis, RedisError
+
+from celery_config import app_config, TASK_EVENTS_CHANNEL, PROGRESS_STATE
+from utils import image_to_bytes
+
+
+logger = logging.getLogger(__name__)
+
+
+redis = Redis(host=app_config.redis.HOST, port=app_config.redis.PORT)
+
+# издатели прогресса выполняющихся задач, превью которых нужно удалить после завершения задачи
+_publishers: dict[str, "ProgressPublisher"] = {}
+
+
+def publish_task_event(task_id: str, state: str, **payload):
+    """
+    Публикация события задачи task_id. Потеря события не критична: бот подстрахован редким опросом.
+    """
+    try:
+        redis.publish(TASK_EVENTS_CHANNEL, json.dumps({"task_id": task_id, "state": state, **payload}))
+    except RedisError as error:
+        logger.warning(f"Не удалось опубликовать событие задачи {task_id}: {error}")
+
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, state=None, **kwargs):
+    """
+    Сигнал отправляется после сохранения результата задачи в бэкенд, поэтому бот может сразу его забрать.
+    """
+    publish_task_event(task_id, state)
+
+    # превью завершившейся задачи больше не нужны
+    publisher = _publishers.pop(task_id, None)
+    if publisher is not None:
+        publisher.delete_previews()
+
+
+@task_revoked.connect
+def on_task_revoked(request=None, **kwargs):
+    """
+    Задача, истёкшая в очереди (дедлайн), не выполняется и task_postrun не отправляет.
+    """
+    publish_task_event(request.id, "REVOKED")
+
+
+
+class ProgressPublisher:
+    """
+    Публикация прогресса итеративной задачи с ограничением частоты, чтобы публикация занимала ничтожную долю
+    времени итерации.
+    * total_steps - плановое число итераций (уменьшается при досрочной остановке, см. skip_steps)
+    * time_budget - бюджет времени задачи в секундах, ограничивает оценку оставшегося времени
+    * min_interval - события публикуются не чаще раза в min_interval секунд
+    * preview_every, preview_size - превью (уменьшенное до preview_size по большей стороне) прикладывается не чаще
+      раза в preview_every итераций; None - без превью
+    * save_preview - сохранение JPEG-превью, возвращает его ключ в хранилище изображений
+    * delete_preview - удаление превью по ключу: превью удаляются после завершения задачи (on_task_postrun)
+    """
+
+    def __init__(self, task_id: str, total_steps: int, time_budget: float | None = None, min_interval: float = 2.0,
+                 preview_every: int | None = None, preview_size: int = 128,
+                 save_preview: Callable[[bytes], str] | None = None,
+                 delete_preview: Callable[[str], None] | None = None):
+        self.task_id = task_id
+        self.total_steps = total_steps
+        self.time_budget = time_budget
+        self.min_interval = min_interval
+        self.preview_every = preview_every if save_preview is not None else None
+        self.preview_size = preview_size
+        self.save_preview = save_preview
+        self.delete_preview = delete_preview
+        self.preview_keys: list[str] = []
+
+        if delete_preview is not None:
+            _publishers[task_id] = self
+
+        # суммарное время публикации - для контроля накладных расходов
+        self.overhead: float = 0.0
+
+        self._started_at = time.perf_counter()
+        self._last_published_at = float("-inf")
+        self._last_preview_step = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started_at
+
+    def skip_steps(self, count: int):
+        """
+        Уменьшение планового числа итераций (уровень оптимизации остановлен досрочно).
+        """
+        self.total_steps -= count
+
+    def eta(self, step: int) -> float:
+        elapsed = self.elapsed()
+        eta = elapsed / step * max(self.total_steps - step, 0)
+
+        if self.time_budget is not None:
+            eta = min(eta, max(self.time_budget - elapsed, 0.0))
+
+        return eta
+
+    def __call__(self, step: int, loss: float, image: torch.Tensor):
+        """
+        Вызывается после каждой итерации: step - номер итерации с начала задачи, loss - потери, image - текущее
+        изображение (1, 3, H, W).
+        """
+        now = time.perf_counter()
+        if now - self._last_published_at < self.min_interval:
+            return
+
+        payload = {"step": step, "total_steps": self.total_steps, "loss": loss,
+                   "elapsed": now - self._started_at, "eta": self.eta(step)}
+
+        if self.preview_every is not None and step - self._last_preview_step >= self.preview_every:
+            payload["preview_key"] = self.save_preview(self._preview(image))
+            self.preview_keys.append(payload["preview_key"])
+            self._last_preview_step = step
+
+        publish_task_event(self.task_id, PROGRESS_STATE, **payload)
+
+        self._last_published_at = time.perf_counter()
+        self.overhead += self._last_published_at - now
+
+    def delete_previews(self):
+        for key in self.preview_keys:
+            self.delete_preview(key)
+        self.preview_keys.clear()
+
+    def _preview(self, image: torch.Tensor) -> bytes:
+        with torch.no_grad():
+            height, width = image.shape[-2:]
+            scale = self.preview_size / max(height, width)
+            if scale < 1:
+                image = F.interpolate(image, scale_factor=scale, mode='bilinear', align_corners=False)
+
+        return image_to_bytes(ToPILImage()(image[0].detach().cpu().clamp(0, 1)))
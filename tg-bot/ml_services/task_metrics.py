@@ -0,0 +1,85 @@
+"""
+Метрики задач стилизации на стороне воркера (определения метрик - в services/metrics.py).
+
+Бот передаёт время постановки задачи в очередь в заголовке TASK_ENQUEUED_AT_HEADER, по нему считается ожидание
+в очереди. Время этапов самой задачи берётся из STAGE_TIMER (ml_services/stage_timer.py).
+"""
+import os
+import time
+
+from celery.signals import task_prerun, task_postrun, worker_process_shutdown, worker_shutdown
+from prometheus_client import multiprocess
+
+from celery_config import TASK_ENQUEUED_AT_HEADER
+from services.metrics import STAGE_SECONDS, JOBS_IN_FLIGHT, GATYS_STEP_SECONDS
+
+
+TASK_METHODS = {
+    "ml_services.transfer_style.transfer_style_by_gatys": "gatys",
+    "ml_services.transfer_style.transfer_style_by_adain": "adain",
+    "ml_services.transfer_style.transfer_style_by_adain_album": "adain",
+}
+
+
+def observe_stages(method: str, stages: dict[str, float]):
+    for stage, seconds in stages.items():
+        STAGE_SECONDS.labels(method, stage).observe(seconds)
+
+
+class StepTimer:
+    """
+    Время итераций оптимизации Гатиса: вызывается после каждой итерации, restart - перед началом оптимизации
+    (чтобы построение модели не попало в первую итерацию).
+    """
+
+    def __init__(self, degree: int | str):
+        self.histogram = GATYS_STEP_SECONDS.labels(str(degree))
+        self._last = time.perf_counter()
+
+    def restart(self):
+        self._last = time.perf_counter()
+
+    def __call__(self):
+        now = time.perf_counter()
+        self.histogram.observe(now - self._last)
+        self._last = now
+
+
+@task_prerun.connect
+def on_task_prerun(task=None, **kwargs):
+    method = TASK_METHODS.get(task.name)
+    if method is None:
+        return
+
+    JOBS_IN_FLIGHT.labels(method, "worker").inc()
+
+    enqueued_at = task.request.get(TASK_ENQUEUED_AT_HEADER)
+    if enqueued_at is not None:
+        STAGE_SECONDS.labels(method, "queue_wait").observe(max(time.time() - enqueued_at, 0.0))
+
+
+@task_postrun.connect
+def on_task_postrun(task=None, **kwargs):
+    method = TASK_METHODS.get(task.name)
+    if method is not None:
+        JOBS_IN_FLIGHT.labels(method, "worker").dec()
+
+
+def mark_process_dead(pid: int):
+    """
+    Значения gauge завершившегося процесса больше не учитываются (режим livesum).
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(pid=None, **kwargs):
+    # дочерний процесс prefork
+    mark_process_dead(pid or os.getpid())
+
+
+@worker_shutdown.connect
+def on_worker_shutdown(**kwargs):
+    # главный процесс воркера: с пулом потоков (entrypoint.sh) задачи выполняются в нём
+    mark_process_dead(os.getpid())
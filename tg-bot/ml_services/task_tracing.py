@@ -0,0 +1,60 @@
+"""
+Продолжение трассы запроса на воркере (см. services/tracing.py).
+
+Контекст трассы приходит в заголовках задачи: на время выполнения задачи он устанавливается в contextvar,
+поэтому trace_id попадает во все записи логов задачи, а этапы задачи (STAGE_TIMER) записываются
+как дочерние span'ы span'а task. Ожидание в очереди - отдельный span queue_wait.
+"""
+import os
+import time
+
+from celery.signals import task_prerun, task_postrun
+
+from celery_config import app, app_config, TASK_ENQUEUED_AT_HEADER
+from services.tracing import (TRACE_ID, SPAN_ID, TRACE_ID_HEADER, PARENT_SPAN_ID_HEADER, configure_tracing,
+                              install_trace_logging, new_id, record_span)
+
+
+install_trace_logging()
+configure_tracing(app_config.tracing.FILE, service="worker")
+
+app.conf.worker_log_format = "[%(asctime)s: %(levelname)s/%(processName)s] [%(trace_id)s] %(message)s"
+app.conf.worker_task_log_format = ("[%(asctime)s: %(levelname)s/%(processName)s] [%(trace_id)s] "
+                                   "%(task_name)s[%(task_id)s]: %(message)s")
+
+
+# выполняющиеся задачи: task_id -> (токены contextvar, span_id задачи, родительский span, время начала)
+_running: dict[str, tuple] = {}
+
+
+@task_prerun.connect
+def on_task_prerun(task_id=None, task=None, **kwargs):
+    trace_id = task.request.get(TRACE_ID_HEADER)
+    if trace_id is None:
+        return
+
+    trace_token = TRACE_ID.set(trace_id)
+    parent_span_id = task.request.get(PARENT_SPAN_ID_HEADER) or None
+    started_at = time.time()
+
+    enqueued_at = task.request.get(TASK_ENQUEUED_AT_HEADER)
+    if enqueued_at is not None:
+        record_span("queue_wait", enqueued_at, started_at, parent_span_id=parent_span_id,
+                    queue=(task.request.delivery_info or {}).get("routing_key"))
+
+    span_id = new_id()
+    _running[task_id] = (trace_token, SPAN_ID.set(span_id), span_id, parent_span_id, started_at)
+
+
+@task_postrun.connect
+def on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    running = _running.pop(task_id, None)
+    if running is None:
+        return
+
+    trace_token, span_token, span_id, parent_span_id, started_at = running
+
+    SPAN_ID.reset(span_token)
+    record_span("task", started_at, time.time(), span_id=span_id, parent_span_id=parent_span_id,
+                task=task.name, task_id=task_id, state=state, pid=os.getpid())
+    TRACE_ID.reset(trace_token)
@@ -1,95 +1,627 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, NamedTuple
+
 import torch
+import torch.nn.functional as F
 
 from torchvision.transforms import ToTensor, ToPILImage
-from torchvision.models import vgg19
 
-from celery_config import app
+from redis import Redis
+
+from celery.signals import worker_init, worker_process_init
+from celery.utils.log import get_task_logger
+
+from celery_config import app, app_config
+
+from utils import bytes_to_image, image_to_bytes, make_contact_sheet
+from services import BlobStore
+from ml_services.gatys_model import BatchedGatysModel, StoppingPolicy, gatys_model_config, bf16_supported
+from ml_services.adain_model import adain_model_config, StyleStatsCache, style_image_key
+from ml_services.model_loader import load_base_cnn, load_adain_model, parameters_size, process_memory
+from ml_services.micro_batcher import MicroBatcher
+from ml_services.cancellation import TaskCancelled, CancellationCheck, requesters_gone
+from ml_services.stage_timer import STAGE_TIMER
+from ml_services import task_events  # подключает публикацию событий о завершении задач и их прогрессе
+from ml_services.task_metrics import observe_stages, StepTimer  # модуль подключает метрики задач
+from ml_services import task_tracing  # подключает продолжение трасс запросов на воркере
+from services.metrics import STAGE_SECONDS
 
-from utils import bytes_to_image, image_to_bytes
-from ml_services.gatys_model import GatysModel, gatys_model_config
-from ml_services.adain_model import AdainStyleTransferModel, preprocess_tensor, denorm_images
+
+logger = get_task_logger(__name__)
 
 
 BASE_CNN = None
 
 ADAIN_MODEL = None
 
+# модели могут загружаться из разных потоков воркера, поэтому загрузку защищаем блокировкой
+MODELS_LOCK = threading.Lock()
+
+
+def worker_models() -> tuple[str, ...]:
+    """
+    Методы, модели которых загружает воркер: WORKER_MODELS через запятую (entrypoint.sh задаёт воркеру
+    модель его очереди, чтобы воркер не держал в памяти веса чужого метода). Без переменной - обе модели.
+    """
+    methods = os.environ.get("WORKER_MODELS")
+    return tuple(method.strip() for method in methods.split(",")) if methods else ("gatys", "adain")
+
+
+def load_models(methods: tuple[str, ...] = ("gatys", "adain")):
+    """
+    Загрузка моделей методов methods, если они ещё не загружены.
+    Обычно модели загружаются при старте воркера (on_worker_init), здесь же - подстраховка для запуска задач
+    вне воркера celery.
+    """
+    global BASE_CNN, ADAIN_MODEL
+
+    with MODELS_LOCK:
+        if "gatys" in methods and BASE_CNN is None:
+            with STAGE_SECONDS.labels("gatys", "model_load").time():
+                BASE_CNN = load_base_cnn(gatys_model_config["DEVICE"],
+                                         fold_normalization=gatys_model_config["FOLD_NORMALIZATION"])
+
+        if "adain" in methods and ADAIN_MODEL is None:
+            with STAGE_SECONDS.labels("adain", "model_load").time():
+                ADAIN_MODEL = load_adain_model(adain_model_config["DEVICE"],
+                                               quantized=adain_model_config["QUANTIZED"],
+                                               backend=adain_model_config["BACKEND"],
+                                               fold_normalization=adain_model_config["FOLD_NORMALIZATION"])
+
+
+def warm_up_models(methods: tuple[str, ...] = ("gatys", "adain")):
+    """
+    Прогревочный прямой проход, чтобы инициализация torch (пулы потоков, выделение памяти)
+    не ложилась на первую задачу.
+    """
+    dummy = torch.rand(1, 3, 64, 64)
+
+    with torch.no_grad():
+        if "gatys" in methods:
+            BASE_CNN(dummy.to(gatys_model_config["DEVICE"]))
+        if "adain" in methods:
+            ADAIN_MODEL.stylize(dummy.to(adain_model_config["DEVICE"]), dummy.to(adain_model_config["DEVICE"]))
+
+
+def configure_torch_threads():
+    """
+    Число потоков torch задаётся для каждого воркера переменной окружения TORCH_NUM_THREADS (см. entrypoint.sh):
+    воркерам Гатиса - больше потоков на задачу, воркерам AdaIN - меньше, зато больше воркеров.
+    """
+    num_threads = os.environ.get("TORCH_NUM_THREADS")
+    if num_threads:
+        torch.set_num_threads(int(num_threads))
+
+
+def log_memory(title: str):
+    """
+    Rss и Pss процесса после загрузки моделей. Веса отображены из файлов (mmap), поэтому страницы весов
+    общие у всех воркеров одной очереди: Pss делит их между процессами, и Rss - Pss - фактически общая память.
+    """
+    memory = process_memory()
+    if memory:
+        logger.info(f"{title}: Rss={memory['Rss'] / 2**20:.1f} МБ, Pss={memory['Pss'] / 2**20:.1f} МБ, "
+                    f"общая с другими процессами: {(memory['Rss'] - memory['Pss']) / 2**20:.1f} МБ")
+
+
+@worker_init.connect
+def on_worker_init(sender, **kwargs):
+    """
+    Загрузка моделей очереди воркера (worker_models) до того, как он начнёт принимать задачи.
+    """
+    configure_torch_threads()
+
+    methods = worker_models()
+
+    started_at = time.perf_counter()
+    load_models(methods)
+
+    models = {"gatys": BASE_CNN, "adain": ADAIN_MODEL}
+    weights_size = sum(parameters_size(models[method]) for method in methods)
+
+    logger.info(f"Модели {', '.join(methods)} загружены за {time.perf_counter() - started_at:.2f} с. "
+                f"Веса: {weights_size / 2**20:.1f} МБ; потоков torch на процесс: {torch.get_num_threads()}")
+
+    # в prefork прогрев выполняется в каждом дочернем процессе (on_worker_process_init)
+    pool = sender.pool_cls if isinstance(sender.pool_cls, str) else sender.pool_cls.__module__
+    if 'prefork' not in pool:
+        warm_up_models(methods)
+        log_memory("Воркер готов")
+
+
+@worker_process_init.connect
+def on_worker_process_init(**kwargs):
+    configure_torch_threads()
+
+    methods = worker_models()
+    load_models(methods)
+    warm_up_models(methods)
+
+    log_memory("Дочерний процесс воркера готов")
+
+
+BLOB_STORE = BlobStore(root=app_config.blob_store.DIR, ttl=app_config.blob_store.TTL)
 
-@app.task()
-def transfer_style_by_gatys(content: bytes, style: bytes, degree: int) -> bytes:
 
-    global BASE_CNN
+# ключи конфигураций, от которых зависит результат стилизации (и степени Гатиса "1".."5" целиком); остальные
+# (прогресс, батчинг, бэкенд, кэши) меняют только скорость и не должны сбрасывать кэш результатов
+GATYS_RESULT_KEYS = ("VERSION", "IMSIZE", "OPTIMIZER", "FOLD_NORMALIZATION", "PYRAMID")
+ADAIN_RESULT_KEYS = ("VERSION", "IMSIZE", "ALPHA", "COMPARE", "QUANTIZED", "FOLD_NORMALIZATION", "TILED")
 
-    # Загружаем модель при самом первом запросе
-    if BASE_CNN is None:
-        vgg19_encoder_weights = torch.load('./ml_services/models/vgg19_encoder_weights.pt')
 
-        BASE_CNN = vgg19().features[0 : 35]
-        BASE_CNN.load_state_dict(vgg19_encoder_weights)
+def model_version(method: str) -> str:
+    """
+    Версия модели метода method для ключа кэша результатов: VERSION из конфигурации и хэш параметров,
+    влияющих на результат (GATYS_RESULT_KEYS, ADAIN_RESULT_KEYS), чтобы их изменение не отдавало старые результаты.
+    Для Гатиса добавляется фактическая точность: MIXED_PRECISION включает bfloat16 только на устройствах
+    с его аппаратной поддержкой, и одна и та же конфигурация на разных машинах даёт разные результаты.
+    """
+    if method == "gatys":
+        degrees = {key: value for key, value in gatys_model_config.items() if key.isdigit()}
+        params = {key: gatys_model_config[key] for key in GATYS_RESULT_KEYS} | degrees
 
-        BASE_CNN = BASE_CNN.to(gatys_model_config["DEVICE"])
+        mixed_precision = any(degree["MIXED_PRECISION"] for degree in degrees.values())
+        precision = "bf16" if mixed_precision and bf16_supported(gatys_model_config["DEVICE"]) else "fp32"
+    else:
+        params = {key: adain_model_config[key] for key in ADAIN_RESULT_KEYS}
+        precision = None
 
-        for param in BASE_CNN.parameters():
-            param.requires_grad = False
+    version = f"{params['VERSION']}:{hashlib.sha256(repr(params).encode()).hexdigest()[:16]}"
 
-    content = ToTensor()(bytes_to_image(content).resize(gatys_model_config["IMSIZE"]))[:3].unsqueeze(0)
-    style = ToTensor()(bytes_to_image(style).resize(gatys_model_config["IMSIZE"]))[:3].unsqueeze(0)
-    input_ = content.clone()
+    return f"{version}:{precision}" if precision else version
+
+
+def style_stats_version() -> str:
+    """
+    Версия статистик стиля для ключа кэша статистик (общего для воркеров через Redis): версия модели AdaIN
+    и фактически используемый вариант модели (при расхождении с eager бэкенд откатывается на eager).
+    """
+    return f"{model_version('adain')}:{ADAIN_MODEL.inference_backend}"
+
+
+class AdainJob(NamedTuple):
+    content: torch.Tensor
+    style: torch.Tensor | None  # None, если статистики стиля уже есть в кэше
+    style_key: str
+    style_stats: tuple[torch.Tensor, torch.Tensor] | None
+    alpha: float
+
+
+class GatysJob(NamedTuple):
+    content: torch.Tensor
+    style: torch.Tensor
+    input_image: torch.Tensor
+    degree: str
+    num_steps: int
+    stopping_policy: StoppingPolicy
+    progress_callback: Callable[[int, float, torch.Tensor], None]
+    step_timer: StepTimer
+
+
+@app.task(bind=True)
+def transfer_style_by_gatys(self, content_key: str, style_key: str, degree: int) -> str:
+    """
+    Стилизация алгоритмом Гатиса. Изображения передаются ключами хранилища BLOB_STORE, возвращается ключ результата.
+    Прогресс оптимизации (и превью) публикуется в канал событий задач.
+    Задача, результат которой никто не ждёт, не начинается, а начатая - прерывается между итерациями.
+    """
+    if requesters_gone(self.request.id):
+        raise TaskCancelled(f"Задача {self.request.id} отменена до начала выполнения")
+
+    load_models(("gatys",))
+    STAGE_TIMER.reset()
+
+    with STAGE_TIMER.stage("decode"):
+        content_image = _decode_image(BLOB_STORE.get(content_key))
+        style_image = _decode_image(BLOB_STORE.get(style_key))
 
     degree = str(degree)
+    degree_config = gatys_model_config[degree]
+
+    # Пирамидальный режим: несколько уровней разрешения, иначе - один уровень размера IMSIZE
+    if gatys_model_config["PYRAMID"]["ENABLED"]:
+        levels = list(zip(gatys_model_config["PYRAMID"]["IMSIZES"], degree_config["PYRAMID_STEPS"]))
+    else:
+        levels = [(gatys_model_config["IMSIZE"], degree_config["NUM_STEPS"])]
+
+    time_budget = degree_config.get("STOPPING", {}).get("TIME_BUDGET")
+    started_at = time.perf_counter()
+
+    # bfloat16 только там, где он аппаратный: эмулированный медленнее float32
+    mixed_precision = degree_config["MIXED_PRECISION"] and bf16_supported(gatys_model_config["DEVICE"])
+
+    progress_config = gatys_model_config["PROGRESS"]
+    progress = task_events.ProgressPublisher(
+        task_id=self.request.id,
+        total_steps=sum(num_steps for _, num_steps in levels),
+        time_budget=time_budget,
+        min_interval=progress_config["MIN_INTERVAL"],
+        preview_every=progress_config["PREVIEW_EVERY"],
+        preview_size=progress_config["PREVIEW_SIZE"],
+        save_preview=BLOB_STORE.put,
+        delete_preview=BLOB_STORE.delete
+    )
+    steps_before = 0
+
+    is_cancelled = CancellationCheck(self.request.id)
+    step_timer = StepTimer(degree)
+
+    def on_step(step: int, loss: float, image: torch.Tensor):
+        step_timer()
+        progress(steps_before + step, loss, image)
+
+    output = None
+
+    for level, (imsize, num_steps) in enumerate(levels):
+        # бюджет времени исчерпан на предыдущих уровнях: оставшиеся уровни не выполняются (даже одной итерацией),
+        # результат только увеличивается до размера последнего уровня
+        if time_budget is not None and output is not None and time.perf_counter() - started_at >= time_budget:
+            final_imsize = levels[-1][0]
+            with STAGE_TIMER.stage("resize"):
+                output = F.interpolate(output.detach(), size=(final_imsize[1], final_imsize[0]), mode='bilinear',
+                                       align_corners=False).clamp_(0, 1)
+
+            logger.info(f"Gatys degree={degree}: бюджет времени {time_budget} с исчерпан, "
+                        f"пропущено уровней пирамиды: {len(levels) - level}")
+            progress.skip_steps(sum(steps for _, steps in levels[level:]))
+            break
+
+        # целевые карты признаков (в т.ч. матрицы Грама стиля) считаются заново на каждом уровне
+        with STAGE_TIMER.stage("resize"):
+            content = ToTensor()(content_image.resize(imsize))[:3].unsqueeze(0)
+            style = ToTensor()(style_image.resize(imsize))[:3].unsqueeze(0)
+
+            # первый уровень стартует с контента, следующие - с увеличенного результата предыдущего уровня
+            if output is None:
+                input_ = content.clone()
+            else:
+                input_ = F.interpolate(output.detach(), size=(imsize[1], imsize[0]), mode='bilinear',
+                                       align_corners=False)
+
+        # бюджет времени общий на все уровни пирамиды
+        stopping_policy = StoppingPolicy.from_config(degree_config, max_steps=num_steps, is_cancelled=is_cancelled)
+        if time_budget is not None:
+            stopping_policy.time_budget = max(time_budget - (time.perf_counter() - started_at), 0.0)
+
+        job = GatysJob(content, style, input_, degree, num_steps, stopping_policy, on_step, step_timer)
+
+        # задача ставится в общую очередь батчера и оптимизируется вместе с задачами той же степени и размера,
+        # без батчинга - сразу в своём потоке. Этапы батча (ожидание батча, построение модели, оптимизация)
+        # записываются в замеры и трассу задачи по временам, которые вернул батч
+        submitted_at = time.time()
+        if GATYS_BATCHER.max_batch_size > 1:
+            output, steps_done, (build_start, build_end) = GATYS_BATCHER.submit(job, key=(degree, imsize, num_steps))
+            STAGE_TIMER.record("batch_wait", submitted_at, build_start)
+        else:
+            [(output, steps_done, (build_start, build_end))] = _stylize_gatys_batch([job])
+
+        STAGE_TIMER.record("build", build_start, build_end)
+        STAGE_TIMER.record("optimize", build_end, time.time())
+
+        logger.info(f"Gatys degree={degree} imsize={imsize}{' bf16' if mixed_precision else ''}: "
+                    f"выполнено {steps_done} из {num_steps} "
+                    f"итераций за {stopping_policy.elapsed():.2f} с (остановка: {stopping_policy.reason})")
+
+        if stopping_policy.reason == "cancelled":
+            raise TaskCancelled(f"Задача {self.request.id} отменена после {steps_before + steps_done} итераций")
+
+        steps_before += steps_done
+        progress.skip_steps(num_steps - steps_done)
+
+    logger.info(f"Публикация прогресса заняла {progress.overhead * 1000:.1f} мс "
+                f"({100 * progress.overhead / max(progress.elapsed(), 1e-9):.2f}% времени задачи)")
+
+    with STAGE_TIMER.stage("encode"):
+        result = image_to_bytes(ToPILImage()(output[0]))
 
-    style_model = GatysModel(
+    logger.info(f"Gatys degree={degree}, этапы: {STAGE_TIMER.summary()}")
+    observe_stages("gatys", STAGE_TIMER.stages())
+
+    return BLOB_STORE.put(result)
+
+
+# степень стилизации AdaIN, означающая режим сравнения всех степеней
+COMPARE_DEGREE = 0
+
+
+@app.task(bind=True)
+def transfer_style_by_adain(self, content_key: str, style_key: str, degree: int) -> str:
+    """
+    Стилизация AdaIN. Изображения передаются ключами хранилища BLOB_STORE, возвращается ключ результата.
+    При degree=COMPARE_DEGREE результат - ряд стилизаций со всеми степенями (см. _stylize_adain_compare).
+    Задача, результат которой никто не ждёт, не начинается.
+    """
+    if requesters_gone(self.request.id):
+        raise TaskCancelled(f"Задача {self.request.id} отменена до начала выполнения")
+
+    load_models(("adain",))
+    STAGE_TIMER.reset()
+
+    imsize = adain_model_config["IMSIZE"]
+
+    with STAGE_TIMER.stage("decode"):
+        content_image = _decode_image(BLOB_STORE.get(content_key))
+        style_image = _decode_image(BLOB_STORE.get(style_key))
+
+    # при попадании в кэш статистик стиль не нужно даже переводить в тензор
+    with STAGE_TIMER.stage("resize"):
+        style_image = style_image.resize(imsize)
+        style_key = style_image_key(style_image, style_stats_version())
+        style_stats = STYLE_CACHE.get(style_key)
+        style = ADAIN_MODEL.preprocess(ToTensor()(style_image)) if style_stats is None else None
+
+    if degree == COMPARE_DEGREE:
+        with STAGE_TIMER.stage("infer"):
+            output_image = _stylize_adain_compare(content_image, style, style_key, style_stats)
+    else:
+        alpha = adain_model_config["ALPHA"][degree]
+
+        if adain_model_config["TILED"]["ENABLED"]:
+            with STAGE_TIMER.stage("infer"):
+                output = _stylize_adain_tiled(content_image, style, style_key, style_stats, alpha)
+        else:
+            with STAGE_TIMER.stage("resize"):
+                content = ADAIN_MODEL.preprocess(ToTensor()(content_image.resize(imsize)))
+
+            # задача ставится в общую очередь батчера и ждёт свой результат (время ожидания входит в infer)
+            with STAGE_TIMER.stage("infer"):
+                output = ADAIN_BATCHER.submit(AdainJob(content, style, style_key, style_stats, alpha),
+                                              key=content.shape)
+
+        output = ADAIN_MODEL.postprocess(output)[0]
+        output_image = ToPILImage()(output.clamp_(0, 1))
+
+    with STAGE_TIMER.stage("encode"):
+        result = image_to_bytes(output_image)
+
+    logger.info(f"AdaIN degree={degree}, этапы: {STAGE_TIMER.summary()}")
+    observe_stages("adain", STAGE_TIMER.stages())
+
+    return BLOB_STORE.put(result)
+
+
+@app.task(bind=True)
+def transfer_style_by_adain_album(self, content_keys: list[str], style_keys: list[str], style_weights: list[float],
+                                  degree: int) -> list[str]:
+    """
+    Стилизация AdaIN альбома: несколько изображений контента и смесь нескольких стилей с весами style_weights.
+    Статистики стилей интерполируются в пространстве признаков, все изображения контента проходят
+    энкодер/декодер общими батчами (не больше MAX_BATCH_SIZE). Возвращает ключи результатов в порядке content_keys.
+    При degree=COMPARE_DEGREE для каждого изображения контента - ряд стилизаций со всеми степенями.
+    """
+    if requesters_gone(self.request.id):
+        raise TaskCancelled(f"Задача {self.request.id} отменена до начала выполнения")
+
+    load_models(("adain",))
+    STAGE_TIMER.reset()
+
+    device = adain_model_config["DEVICE"]
+    imsize = adain_model_config["IMSIZE"]
+
+    with STAGE_TIMER.stage("decode"):
+        style_images = [_decode_image(BLOB_STORE.get(key)) for key in style_keys]
+        content_images = [_decode_image(BLOB_STORE.get(key)) for key in content_keys]
+
+    with STAGE_TIMER.stage("resize"):
+        style_images = [img.resize(imsize) for img in style_images]
+
+    with STAGE_TIMER.stage("infer"):
+        style_stats = _blended_style_stats(style_images, style_weights)
+
+    if degree == COMPARE_DEGREE:
+        with STAGE_TIMER.stage("infer"):
+            output_images = [_stylize_adain_compare(content_image, None, "", style_stats)
+                             for content_image in content_images]
+    else:
+        alpha = adain_model_config["ALPHA"][degree]
+
+        with STAGE_TIMER.stage("resize"):
+            content = torch.cat([ADAIN_MODEL.preprocess(ToTensor()(img.resize(imsize)))
+                                 for img in content_images])
+
+        outputs = []
+        with STAGE_TIMER.stage("infer"), torch.no_grad():
+            for batch in content.split(adain_model_config["MAX_BATCH_SIZE"]):
+                outputs.append(ADAIN_MODEL.stylize(batch.to(device), alpha=alpha, style_stats=style_stats))
+
+        output = ADAIN_MODEL.postprocess(torch.cat(outputs)).clamp_(0, 1)
+        output_images = [ToPILImage()(img) for img in output]
+
+    with STAGE_TIMER.stage("encode"):
+        results = [image_to_bytes(img) for img in output_images]
+
+    logger.info(f"AdaIN альбом ({len(content_keys)} изобр.) degree={degree}, этапы: {STAGE_TIMER.summary()}")
+    observe_stages("adain", STAGE_TIMER.stages())
+
+    return [BLOB_STORE.put(result) for result in results]
+
+
+def _decode_image(data: bytes):
+    """
+    Декодирование сразу, а не при первом обращении к пикселям: иначе время декодирования попадёт в этап resize.
+    """
+    image = bytes_to_image(data)
+    image.load()
+    return image
+
+
+def _blended_style_stats(style_images: list, weights: list[float]) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Статистики смеси стилей: взвешенные (веса нормируются) средние и стандартные отклонения признаков relu4_1.
+    Стили, которых нет в кэше, кодируются одним батчем.
+    """
+    device = adain_model_config["DEVICE"]
+
+    version = style_stats_version()
+    keys = [style_image_key(img, version) for img in style_images]
+    stats = {key: STYLE_CACHE.get(key) for key in keys}
+    missed = {key: img for key, img in zip(keys, style_images) if stats[key] is None}
+
+    with torch.no_grad():
+        if missed:
+            style = torch.cat([ADAIN_MODEL.preprocess(ToTensor()(img)) for img in missed.values()]).to(device)
+            style_mean, style_std = ADAIN_MODEL.style_stats(style)
+
+            for i, key in enumerate(missed):
+                stats[key] = (style_mean[i:i + 1], style_std[i:i + 1])
+                STYLE_CACHE.put(key, stats[key])
+
+    weights = torch.tensor(weights, dtype=torch.float32, device=device).reshape(-1, 1, 1, 1)
+    weights = weights / weights.sum()
+
+    style_mean = (torch.cat([stats[key][0].to(device) for key in keys]) * weights).sum(dim=0, keepdim=True)
+    style_std = (torch.cat([stats[key][1].to(device) for key in keys]) * weights).sum(dim=0, keepdim=True)
+
+    return style_mean, style_std
+
+
+def _stylize_gatys_batch(jobs: list[GatysJob]) -> list[tuple[torch.Tensor, int, tuple[float, float]]]:
+    """
+    Оптимизация Гатиса для батча задач одной степени и одного размера (BatchedGatysModel): у каждой задачи свои
+    контент, стиль, правило остановки и прогресс. Возвращает для каждой задачи результат, число выполненных
+    итераций и времена начала и конца построения модели (time.time()).
+    """
+    degree = jobs[0].degree
+    degree_config = gatys_model_config[degree]
+    device = gatys_model_config["DEVICE"]
+
+    build_start = time.time()
+    style_model = BatchedGatysModel(
         base_cnn=BASE_CNN,
-        content_img=content,
-        style_img=style,
-        device=gatys_model_config["DEVICE"],
-        content_layers=gatys_model_config[degree]["CONTENT_LAYERS"],
-        style_layers=gatys_model_config[degree]["STYLE_LAYERS"]
+        content_img=torch.cat([job.content for job in jobs]),
+        style_img=torch.cat([job.style for job in jobs]),
+        device=device,
+        content_layers=degree_config["CONTENT_LAYERS"],
+        style_layers=degree_config["STYLE_LAYERS"]
     )
+    build_end = time.time()
 
-    output = style_model.transfer_style(
-        input_image=input_,
-        device=gatys_model_config["DEVICE"],
+    for job in jobs:
+        job.step_timer.restart()
+
+    outputs = style_model.transfer_style(
+        input_images=torch.cat([job.input_image for job in jobs]),
+        device=device,
         optimizer_class=gatys_model_config["OPTIMIZER"],
-        lr=gatys_model_config[degree]["LR"],
-        num_steps=gatys_model_config[degree]["NUM_STEPS"],
-        style_weight=gatys_model_config[degree]["STYLE_WEIGHT"],
-        scheduler_step=gatys_model_config[degree]["SCHEDULER_STEP"],
-        gamma=gatys_model_config[degree]["GAMMA"]
+        lr=degree_config["LR"],
+        num_steps=jobs[0].num_steps,
+        style_weight=degree_config["STYLE_WEIGHT"],
+        scheduler_step=degree_config["SCHEDULER_STEP"],
+        gamma=degree_config["GAMMA"],
+        stopping_policies=[job.stopping_policy for job in jobs],
+        progress_callbacks=[job.progress_callback for job in jobs],
+        mixed_precision=degree_config["MIXED_PRECISION"] and bf16_supported(device)
     )
 
-    return image_to_bytes(ToPILImage()(output[0]))
+    return [(output, steps_done, (build_start, build_end))
+            for output, steps_done in zip(outputs, style_model.sample_steps_done)]
+
+
+def _stylize_adain_batch(jobs: list[AdainJob]) -> list[torch.Tensor]:
+    """
+    Один проход Encoder/AdaIN/Decoder для батча задач.
+    Тензоры контента склеиваются по батч-размерности, у каждой задачи своя alpha.
+    Стили, которых нет в кэше, кодируются одним батчем (каждый уникальный стиль - один раз) и попадают в кэш.
+    """
+    device = adain_model_config["DEVICE"]
+
+    content = torch.cat([job.content for job in jobs]).to(device)
+    alpha = torch.tensor([job.alpha for job in jobs], device=device).reshape(-1, 1, 1, 1)
+
+    stats = {job.style_key: job.style_stats for job in jobs if job.style_stats is not None}
+    missed = {job.style_key: job.style for job in jobs if job.style_stats is None and job.style_key not in stats}
+
+    with torch.no_grad():
+        if missed:
+            style = torch.cat(list(missed.values())).to(device)
+            style_mean, style_std = ADAIN_MODEL.style_stats(style)
+
+            for i, style_key in enumerate(missed):
+                stats[style_key] = (style_mean[i:i + 1], style_std[i:i + 1])
+                STYLE_CACHE.put(style_key, stats[style_key])
+
+        style_mean = torch.cat([stats[job.style_key][0] for job in jobs]).to(device)
+        style_std = torch.cat([stats[job.style_key][1] for job in jobs]).to(device)
+
+        output = ADAIN_MODEL.stylize(content, alpha=alpha, style_stats=(style_mean, style_std))
+
+    return list(output.split(1))
+
+
+def _stylize_adain_compare(content_image, style: torch.Tensor | None, style_key: str,
+                           style_stats: tuple[torch.Tensor, torch.Tensor] | None):
+    """
+    Стилизация со всеми степенями из ALPHA за один проход энкодера (батч декодера из всех степеней),
+    результаты склеиваются в один ряд с подписями степеней.
+    Контент обрабатывается сразу в размере миниатюры THUMB_SIZE: декодер - самая дорогая часть модели,
+    и на этом размере батч из всех степеней стоит примерно как одна стилизация в IMSIZE.
+    """
+    device = adain_model_config["DEVICE"]
+    degrees = sorted(adain_model_config["ALPHA"])
+    thumb_size = adain_model_config["COMPARE"]["THUMB_SIZE"]
+
+    content = ADAIN_MODEL.preprocess(ToTensor()(content_image.resize((thumb_size, thumb_size)))).to(device)
+
+    with torch.no_grad():
+        if style_stats is None:
+            style_stats = ADAIN_MODEL.style_stats(style.to(device))
+            STYLE_CACHE.put(style_key, style_stats)
+
+        output = ADAIN_MODEL.stylize_alphas(content, alphas=[adain_model_config["ALPHA"][d] for d in degrees],
+                                            style_stats=tuple(stat.to(device) for stat in style_stats))
+
+    output = ADAIN_MODEL.postprocess(output).clamp_(0, 1)
+
+    return make_contact_sheet([ToPILImage()(img) for img in output], labels=[str(d) for d in degrees],
+                              thumb_size=thumb_size)
+
+
+def _stylize_adain_tiled(content_image, style: torch.Tensor | None, style_key: str,
+                         style_stats: tuple[torch.Tensor, torch.Tensor] | None, alpha: float) -> torch.Tensor:
+    """
+    Потайловая стилизация контента в исходном разрешении (без батчинга - размеры изображений разные).
+    """
+    device = adain_model_config["DEVICE"]
+    tiled_config = adain_model_config["TILED"]
 
+    # слишком большие изображения уменьшаем с сохранением соотношения сторон
+    content_image = content_image.copy()
+    content_image.thumbnail((tiled_config["MAX_SIDE"], tiled_config["MAX_SIDE"]))
+    content = ADAIN_MODEL.preprocess(ToTensor()(content_image)).to(device)
 
-@app.task()
-def transfer_style_by_adain(content: bytes, style: bytes, degree: int) -> bytes:
-    global ADAIN_MODEL
+    with torch.no_grad():
+        if style_stats is None:
+            style_stats = ADAIN_MODEL.style_stats(style.to(device))
+            STYLE_CACHE.put(style_key, style_stats)
 
-    if ADAIN_MODEL is None:
-        base_cnn = vgg19().features[:21]
-        base_cnn_weights = torch.load('./ml_services/models/adain_encoder_weights.pt', map_location=torch.device('cpu'))
-        base_cnn.load_state_dict(base_cnn_weights)
+        style_stats = tuple(stats.to(device) for stats in style_stats)
 
-        ADAIN_MODEL = AdainStyleTransferModel(base_cnn)
-        adain_weights = torch.load('./ml_services/models/adain_style_model.pt', map_location=torch.device('cpu'))
-        ADAIN_MODEL.load_state_dict(adain_weights['model_state_dict'])
+        return ADAIN_MODEL.stylize_tiled(content, alpha=alpha, style_stats=style_stats,
+                                         tile_size=tiled_config["TILE_SIZE"], overlap=tiled_config["OVERLAP"])
 
-    imsize = (512, 512)
 
-    alpha = {
-        1: 0.2,
-        2: 0.4,
-        3: 0.6,
-        4: 0.8,
-        5: 1.0
-    }
+STYLE_CACHE = StyleStatsCache(
+    max_bytes=adain_model_config["STYLE_CACHE_MAX_BYTES"],
+    redis=Redis(host=app_config.redis.HOST, port=app_config.redis.PORT, db=3)
+    if adain_model_config["STYLE_CACHE_REDIS"] else None,
+    redis_ttl=adain_model_config["STYLE_CACHE_TTL"]
+)
 
-    content = preprocess_tensor(ToTensor()(bytes_to_image(content).resize(imsize)))
-    style = preprocess_tensor(ToTensor()(bytes_to_image(style).resize(imsize)))
 
-    output = ADAIN_MODEL.stylize(content, style, alpha=alpha[degree])
+GATYS_BATCHER = MicroBatcher(
+    process_batch=_stylize_gatys_batch,
+    window=gatys_model_config["BATCH"]["WINDOW"],
+    max_batch_size=gatys_model_config["BATCH"]["MAX_BATCH_SIZE"],
+    name="gatys-batcher"
+)
 
-    output = denorm_images(output)[0]
-    output.clamp_(0, 1)
 
-    return image_to_bytes(ToPILImage()(output))
\ No newline at end of file
+ADAIN_BATCHER = MicroBatcher(
+    process_batch=_stylize_adain_batch,
+    window=adain_model_config["BATCH_WINDOW"],
+    max_batch_size=adain_model_config["MAX_BATCH_SIZE"],
+    name="adain-batcher"
+)
\ No newline at end of file
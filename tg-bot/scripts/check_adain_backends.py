@@ -0,0 +1,71 @@
+"""
+Проверка бэкендов инференса AdaIN-стилизатора: совпадение результатов с eager-моделью и время стилизации.
+
+Проверка результатов вместо тестов (в репозитории их нет) - запускается перед сменой BACKEND в adain_model_config.
+Скрипт завершается с кодом 1, если какой-либо бэкенд расходится с eager больше, чем на --atol, или если
+недоступен бэкенд из конфигурации (воркер молча откатился бы на eager).
+
+Запуск из папки tg-bot:
+    python -m scripts.check_adain_backends
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import torch
+
+from ml_services.adain_model import adain_model_config
+from ml_services.adain_model.backends import INFERENCE_BACKENDS, build_backend, parity_error
+from ml_services.model_loader import load_adain_model, MODELS_DIR
+
+
+def latency(model, imsize, repeats: int) -> float:
+    content = torch.rand(1, 3, *imsize)
+    style = torch.rand(1, 3, *imsize)
+
+    times = []
+    with torch.no_grad():
+        model.stylize(content, style)  # прогрев
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.stylize(content, style)
+            times.append(time.perf_counter() - start)
+
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--atol", type=float, default=1e-3)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    imsize = adain_model_config["IMSIZE"]
+    eager_model = load_adain_model(torch.device("cpu"))
+
+    failed = []
+    print(f"{'backend':>12} | {'max abs diff':>12} | {'latency, s':>10}")
+    for backend in INFERENCE_BACKENDS:
+        try:
+            model = build_backend(eager_model, backend, export_dir=MODELS_DIR)
+            error = parity_error(eager_model, model)
+        except Exception as exception:
+            print(f"{backend:>12} | недоступен: {exception!r}")
+            if backend == adain_model_config["BACKEND"]:
+                failed.append(f"{backend} (недоступен)")
+            continue
+
+        if error > args.atol:
+            failed.append(f"{backend} ({error:.2e} > {args.atol:.0e})")
+
+        print(f"{backend:>12} | {error:>12.2e} | {latency(model, imsize, args.repeats):>10.3f}"
+              f"{'  <- расхождение' if error > args.atol else ''}")
+
+    if failed:
+        print(f"Бэкенды не прошли проверку: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
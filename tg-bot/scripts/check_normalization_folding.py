@@ -0,0 +1,127 @@
+"""
+Проверка нормализации, внесённой в свёртки (ml_services/normalization_folding.py): совпадение результатов
+с исходными моделями и время.
+
+* Гатис - градиент потерь по изображению (ошибка относительно его максимума) с отдельным модулем Normalization
+  и с нормализацией в первой свёртке, посчитанный в float64, и время --gatys-steps итераций оптимизации.
+  В float32 градиенты обеих версий одинаково далеки от точного: ошибки округления меняют знак почти нулевых
+  входов ReLU, а Adam усиливает разницу за несколько итераций, так что float32-результаты не сравниваются
+* AdaIN - стилизация с preprocess_tensor / denorm_images и с нормализацией в свёртках энкодера и декодера
+
+Скрипт завершается с ненулевым кодом, если ошибка больше --atol.
+
+Запуск из папки tg-bot:
+    python -m scripts.check_normalization_folding --gatys-steps 20
+"""
+import argparse
+import copy
+import sys
+import time
+
+import torch
+
+from ml_services.adain_model import adain_model_config
+from ml_services.gatys_model import GatysModel, gatys_model_config
+from ml_services.gatys_model.gatys_model import VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD
+from ml_services.model_loader import load_base_cnn, load_adain_model
+from ml_services.normalization_folding import NormalizedInputConv2d
+
+
+def gatys_gradient(base_cnn, content, style, image, degree: str, fold_normalization: bool) -> torch.Tensor:
+    """
+    Градиент потерь по изображению image в точности float64 (нормализация вносится в свёртку тоже в float64).
+    """
+    config = gatys_model_config[degree]
+
+    base_cnn = copy.deepcopy(base_cnn).double()
+    if fold_normalization:
+        base_cnn[0] = NormalizedInputConv2d(base_cnn[0], VGG19_NORMALIZATION_MEAN, VGG19_NORMALIZATION_STD)
+
+    model = GatysModel(base_cnn=base_cnn, content_img=content.double(), style_img=style.double(),
+                       device=content.device, content_layers=config["CONTENT_LAYERS"],
+                       style_layers=config["STYLE_LAYERS"])
+
+    image = image.double().requires_grad_(True)
+    model.model(image)
+    loss = (sum(loss.loss for loss in model.content_losses) +
+            config["STYLE_WEIGHT"] * sum(loss.loss for loss in model.style_losses))
+    loss.backward()
+
+    return image.grad
+
+
+def run_gatys(base_cnn, content, style, degree: str, steps: int) -> float:
+    config = gatys_model_config[degree]
+    device = gatys_model_config["DEVICE"]
+
+    start = time.perf_counter()
+    model = GatysModel(base_cnn=base_cnn, content_img=content, style_img=style, device=device,
+                       content_layers=config["CONTENT_LAYERS"], style_layers=config["STYLE_LAYERS"])
+    model.transfer_style(content.clone(), device, optimizer_class=gatys_model_config["OPTIMIZER"],
+                         lr=config["LR"], num_steps=steps, style_weight=config["STYLE_WEIGHT"])
+    return time.perf_counter() - start
+
+
+def run_adain(model, content, style, repeats: int) -> tuple[torch.Tensor, float]:
+    with torch.no_grad():
+        output = model.postprocess(model.stylize(model.preprocess(content), model.preprocess(style)))
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model.postprocess(model.stylize(model.preprocess(content), model.preprocess(style)))
+
+    return output, (time.perf_counter() - start) / repeats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--atol", type=float, default=1e-3)
+    parser.add_argument("--degree", default="3", choices=[str(d) for d in range(1, 6)])
+    parser.add_argument("--gatys-steps", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    failed = False
+
+    print(f"{'model':>6} | {'error':>12} | {'time, s':>8} | {'folded time, s':>14}")
+
+    device = gatys_model_config["DEVICE"]
+    imsize = gatys_model_config["IMSIZE"]
+    content = torch.rand(1, 3, *imsize, device=device)
+    style = torch.rand(1, 3, *imsize, device=device)
+    image = torch.rand(1, 3, *imsize, device=device)
+
+    base_cnn = load_base_cnn(device)
+    folded_base_cnn = load_base_cnn(device, fold_normalization=True)
+
+    gradient = gatys_gradient(base_cnn, content, style, image, args.degree, fold_normalization=False)
+    folded_gradient = gatys_gradient(base_cnn, content, style, image, args.degree, fold_normalization=True)
+    error = ((gradient - folded_gradient).abs().max() / gradient.abs().max()).item()
+
+    seconds = run_gatys(base_cnn, content, style, args.degree, args.gatys_steps)
+    folded_seconds = run_gatys(folded_base_cnn, content, style, args.degree, args.gatys_steps)
+
+    failed = failed or error > args.atol
+    print(f"{'gatys':>6} | {error:>12.2e} | {seconds:>8.3f} | {folded_seconds:>14.3f}"
+          f"{'  <- расхождение' if error > args.atol else ''}")
+
+    device = adain_model_config["DEVICE"]
+    imsize = adain_model_config["IMSIZE"]
+    content = torch.rand(3, *imsize, device=device)
+    style = torch.rand(3, *imsize, device=device)
+
+    output, seconds = run_adain(load_adain_model(device), content, style, args.repeats)
+    folded_output, folded_seconds = run_adain(load_adain_model(device, fold_normalization=True), content, style,
+                                              args.repeats)
+
+    error = (output - folded_output).abs().max().item()
+    failed = failed or error > args.atol
+    print(f"{'adain':>6} | {error:>12.2e} | {seconds:>8.3f} | {folded_seconds:>14.3f}"
+          f"{'  <- расхождение' if error > args.atol else ''}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
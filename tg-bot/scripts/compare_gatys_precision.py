@@ -0,0 +1,109 @@
+"""
+Сравнение оптимизации Гатиса в float32 и со смешанной точностью (bfloat16, MIXED_PRECISION) на test-data.
+
+Для каждой степени стилизации обе версии выполняют одинаковое число итераций (без досрочной остановки)
+из одного и того же начального изображения. Выводятся:
+* время итерации и ускорение
+* итоговые потери обеих версий, посчитанные одинаково - в float32 (качество оптимизации)
+* PSNR результата bfloat16 относительно результата float32, дБ
+
+Запуск из папки tg-bot:
+    python -m scripts.compare_gatys_precision --degrees 1 3 5 --contents ../materials/test-data/contents/duck.jpg
+"""
+import argparse
+import math
+import os
+import statistics
+import time
+
+import torch
+from PIL import Image
+from torchvision.transforms import ToTensor
+
+from ml_services.gatys_model import GatysModel, gatys_model_config, bf16_supported
+from ml_services.model_loader import load_base_cnn
+
+
+TEST_DATA_DIR = os.path.join("..", "materials", "test-data")
+
+
+def load_image(path: str, imsize) -> torch.Tensor:
+    return ToTensor()(Image.open(path).convert("RGB").resize(imsize)).unsqueeze(0)
+
+
+def total_loss(model: GatysModel, image: torch.Tensor, style_weight: float) -> float:
+    """
+    Потери изображения в float32 (так же, как их минимизирует transfer_style при content_weight=1).
+    """
+    with torch.no_grad():
+        model.model(image)
+    return (sum(loss.loss.item() for loss in model.content_losses) +
+            style_weight * sum(loss.loss.item() for loss in model.style_losses))
+
+
+def psnr(image: torch.Tensor, reference: torch.Tensor) -> float:
+    mse = torch.mean((image - reference) ** 2).item()
+    return 10 * math.log10(1 / mse) if mse > 0 else math.inf
+
+
+def run(base_cnn, content, style, degree: str, steps: int, mixed_precision: bool) -> tuple[torch.Tensor, float, float]:
+    """
+    Результат, время одной итерации и итоговые потери (в float32).
+    """
+    config = gatys_model_config[degree]
+    device = gatys_model_config["DEVICE"]
+
+    model = GatysModel(base_cnn=base_cnn, content_img=content, style_img=style, device=device,
+                       content_layers=config["CONTENT_LAYERS"], style_layers=config["STYLE_LAYERS"])
+
+    start = time.perf_counter()
+    output = model.transfer_style(content.clone(), device, optimizer_class=gatys_model_config["OPTIMIZER"],
+                                  lr=config["LR"], num_steps=steps, style_weight=config["STYLE_WEIGHT"],
+                                  scheduler_step=config["SCHEDULER_STEP"], gamma=config["GAMMA"],
+                                  mixed_precision=mixed_precision)
+    step_seconds = (time.perf_counter() - start) / model.steps_done
+
+    output = output.detach()
+    return output, step_seconds, total_loss(model, output, config["STYLE_WEIGHT"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--contents", nargs="+", default=[os.path.join(TEST_DATA_DIR, "contents", name)
+                                                          for name in ("duck.jpg", "forest.jpg", "me.jpg")])
+    parser.add_argument("--style", default=os.path.join(TEST_DATA_DIR, "styles", "vangog.jpg"))
+    parser.add_argument("--degrees", nargs="+", default=["1", "2", "3", "4", "5"], choices=["1", "2", "3", "4", "5"])
+    parser.add_argument("--imsize", type=int, default=gatys_model_config["IMSIZE"][0])
+    parser.add_argument("--steps", type=int, default=None, help="по умолчанию - NUM_STEPS степени")
+    args = parser.parse_args()
+
+    device = gatys_model_config["DEVICE"]
+    if not bf16_supported(device):
+        print(f"Внимание: у {device} нет аппаратной поддержки bfloat16, воркер не будет его использовать")
+
+    imsize = (args.imsize, args.imsize)
+    base_cnn = load_base_cnn(device, fold_normalization=gatys_model_config["FOLD_NORMALIZATION"])
+    style = load_image(args.style, imsize).to(device)
+
+    print(f"{'degree':>6} | {'fp32, s/step':>12} | {'bf16, s/step':>12} | {'speedup':>7} | "
+          f"{'fp32 loss':>10} | {'bf16 loss':>10} | {'PSNR, dB':>8}")
+
+    for degree in args.degrees:
+        steps = args.steps or gatys_model_config[degree]["NUM_STEPS"]
+        rows = []
+
+        for path in args.contents:
+            content = load_image(path, imsize).to(device)
+
+            output, seconds, loss = run(base_cnn, content, style, degree, steps, mixed_precision=False)
+            bf16_output, bf16_seconds, bf16_loss = run(base_cnn, content, style, degree, steps, mixed_precision=True)
+
+            rows.append((seconds, bf16_seconds, loss, bf16_loss, psnr(bf16_output, output)))
+
+        seconds, bf16_seconds, loss, bf16_loss, quality = (statistics.mean(column) for column in zip(*rows))
+        print(f"{degree:>6} | {seconds:>12.3f} | {bf16_seconds:>12.3f} | {seconds / bf16_seconds:>6.2f}x | "
+              f"{loss:>10.4g} | {bf16_loss:>10.4g} | {quality:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Создание INT8-версии AdaIN-стилизатора и отчёт о компромиссе скорость/качество.
+
+Калибровка выполняется на изображениях из materials/test-data: каждый контент в паре со стилем того же номера.
+Качество оценивается на других сочетаниях контент/стиль (со сдвигом), чтобы не проверять на тех же парах.
+Квантизованные энкодер и декодер сохраняются рядом с adain_style_model.pt (adain_style_model_int8.pt).
+
+Запуск из папки tg-bot:
+    python -m scripts.quantize_adain_model
+"""
+import argparse
+import os
+import statistics
+import time
+
+import torch
+from PIL import Image
+from torchvision.transforms import ToTensor
+
+from ml_services.adain_model import adain_model_config, preprocess_tensor, denorm_images
+from ml_services.adain_model.quantization import quantize_adain_model, save_quantized
+from ml_services.model_loader import load_adain_model, ADAIN_MODEL_INT8_WEIGHTS
+
+
+TEST_DATA_DIR = os.path.join("..", "materials", "test-data")
+
+
+def load_images(directory: str, imsize) -> list[torch.Tensor]:
+    paths = sorted(os.path.join(directory, filename) for filename in os.listdir(directory))
+    return [preprocess_tensor(ToTensor()(Image.open(path).convert("RGB").resize(imsize))) for path in paths]
+
+
+def stylize(model, content, style, alpha) -> tuple[torch.Tensor, float]:
+    start = time.perf_counter()
+    with torch.no_grad():
+        output = model.stylize(content, style, alpha=alpha)
+    elapsed = time.perf_counter() - start
+    return denorm_images(output).clamp(0, 1), elapsed
+
+
+def psnr(a: torch.Tensor, b: torch.Tensor) -> float:
+    mse = torch.mean((a - b) ** 2).item()
+    return float("inf") if mse == 0 else 10 * torch.log10(torch.tensor(1 / mse)).item()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imsize", type=int, default=adain_model_config["IMSIZE"][0])
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--output", default=ADAIN_MODEL_INT8_WEIGHTS)
+    args = parser.parse_args()
+
+    imsize = (args.imsize, args.imsize)
+    contents = load_images(os.path.join(TEST_DATA_DIR, "contents"), imsize)
+    styles = load_images(os.path.join(TEST_DATA_DIR, "styles"), imsize)
+
+    float_model = load_adain_model(torch.device("cpu"))
+
+    print(f"Калибровка на {min(len(contents), len(styles))} парах ({args.imsize}x{args.imsize}), "
+          f"quantized engine: {torch.backends.quantized.engine}")
+    quantized_model = quantize_adain_model(float_model, zip(contents, styles), alpha=args.alpha)
+
+    save_quantized(quantized_model, args.output)
+    print(f"Сохранено: {args.output} ({os.path.getsize(args.output) / 2**20:.1f} МБ)")
+
+    # прогрев, чтобы не учитывать инициализацию в замерах
+    stylize(float_model, contents[0], styles[0], args.alpha)
+    stylize(quantized_model, contents[0], styles[0], args.alpha)
+
+    float_times, int8_times, diffs, psnrs = [], [], [], []
+    for i, content in enumerate(contents):
+        style = styles[(i + 1) % len(styles)]
+
+        float_output, float_time = stylize(float_model, content, style, args.alpha)
+        int8_output, int8_time = stylize(quantized_model, content, style, args.alpha)
+
+        float_times.append(float_time)
+        int8_times.append(int8_time)
+        diffs.append((float_output - int8_output).abs().mean().item())
+        psnrs.append(psnr(float_output, int8_output))
+
+    print(f"{'':>6} | {'latency, s (median)':>20}")
+    print(f"{'fp32':>6} | {statistics.median(float_times):>20.3f}")
+    print(f"{'int8':>6} | {statistics.median(int8_times):>20.3f}")
+    print(f"Ускорение: {statistics.median(float_times) / statistics.median(int8_times):.2f}x")
+    print(f"Отличие от fp32 (пиксели в [0, 1]): mean abs diff = {statistics.mean(diffs):.4f}, "
+          f"PSNR = {statistics.mean(psnrs):.2f} дБ (min {min(psnrs):.2f} дБ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Стилизация видео или GIF AdaIN-стилизатором (локальные файлы). Результат - mp4.
+
+Печатает число кадров, время и пропускную способность в кадрах в секунду.
+
+Запуск из папки tg-bot:
+    python -m scripts.stylize_video input.mp4 style.jpg output.mp4 --degree 3
+"""
+import argparse
+
+from PIL import Image
+
+from ml_services.adain_model import adain_model_config
+from ml_services.adain_video import stylize_video
+from ml_services.model_loader import load_adain_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="видео или GIF")
+    parser.add_argument("style", help="изображение стиля")
+    parser.add_argument("output", help="выходной mp4-файл")
+    parser.add_argument("--degree", type=int, default=5, choices=sorted(adain_model_config["ALPHA"]))
+    parser.add_argument("--batch-size", type=int, default=adain_model_config["VIDEO"]["BATCH_SIZE"])
+    parser.add_argument("--max-side", type=int, default=adain_model_config["VIDEO"]["MAX_SIDE"])
+    args = parser.parse_args()
+
+    device = adain_model_config["DEVICE"]
+    model = load_adain_model(device, quantized=adain_model_config["QUANTIZED"], backend=adain_model_config["BACKEND"],
+                             fold_normalization=adain_model_config["FOLD_NORMALIZATION"])
+
+    stats = stylize_video(model, args.input, Image.open(args.style), args.output,
+                          alpha=adain_model_config["ALPHA"][args.degree], batch_size=args.batch_size,
+                          max_side=args.max_side, style_imsize=adain_model_config["IMSIZE"], device=device)
+
+    print(f"Кадров: {stats.frames}, размер кадра: {stats.frame_size[0]}x{stats.frame_size[1]}, "
+          f"время: {stats.seconds:.2f} с, пропускная способность: {stats.fps:.2f} кадр/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Разбор трасс запросов на стилизацию (JSONL-файл TRACE_FILE, см. services/tracing.py).
+
+Без trace_id - список самых долгих запросов (можно отфильтровать по пользователю). С trace_id - дерево span'ов
+запроса: смещение от начала запроса, длительность, сторона (bot / worker) и атрибуты. Звёздочкой отмечен
+критический путь - цепочка span'ов, завершившихся последними на каждом уровне.
+
+Запуск из папки tg-bot:
+    python -m scripts.trace_report traces.jsonl --user 123456789
+    python -m scripts.trace_report traces.jsonl 5f0c3e...
+"""
+import argparse
+import json
+import os
+from collections import defaultdict
+
+
+def load_spans(path: str) -> dict[str, list[dict]]:
+    """
+    Span'ы по trace_id (включая ротированный файл path.1).
+    """
+    traces = defaultdict(list)
+
+    for file_path in (f"{path}.1", path):
+        if not os.path.exists(file_path):
+            continue
+
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # строка, недописанная при остановке процесса
+                    continue
+                traces[record["trace_id"]].append(record)
+
+    return traces
+
+
+def duration_ms(record: dict) -> float:
+    return (record["end_time_unix_nano"] - record["start_time_unix_nano"]) / 1e6
+
+
+def print_slowest(traces: dict[str, list[dict]], user_id: int | None, limit: int):
+    roots = [record for spans in traces.values() for record in spans if record["parent_span_id"] is None]
+    if user_id is not None:
+        roots = [record for record in roots if record["attributes"].get("user_id") == user_id]
+
+    print(f"{'trace_id':>32} | {'duration, ms':>12} | attributes")
+    for root in sorted(roots, key=duration_ms, reverse=True)[:limit]:
+        print(f"{root['trace_id']:>32} | {duration_ms(root):>12.1f} | {root['attributes']}")
+
+
+def print_trace(spans: list[dict]):
+    children = defaultdict(list)
+    for record in spans:
+        children[record["parent_span_id"]].append(record)
+    for records in children.values():
+        records.sort(key=lambda record: record["start_time_unix_nano"])
+
+    roots = children[None]
+    if not roots:
+        print("Корневой span не найден (запрос ещё выполняется или трасса неполная)")
+        return
+
+    trace_start = min(record["start_time_unix_nano"] for record in spans)
+
+    # критический путь: от корня - в дочерний span, завершившийся последним
+    critical = set()
+    record = roots[0]
+    while record is not None:
+        critical.add(record["span_id"])
+        record = max(children[record["span_id"]], key=lambda child: child["end_time_unix_nano"], default=None)
+
+    print(f"{'':1} {'offset, ms':>10} | {'duration, ms':>12} | {'service':>7} | span")
+
+    def walk(record: dict, depth: int):
+        mark = "*" if record["span_id"] in critical else " "
+        offset = (record["start_time_unix_nano"] - trace_start) / 1e6
+        attributes = f" {record['attributes']}" if record["attributes"] else ""
+        print(f"{mark} {offset:>10.1f} | {duration_ms(record):>12.1f} | {record['service']:>7} | "
+              f"{'  ' * depth}{record['name']}{attributes}")
+
+        for child in children[record["span_id"]]:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="файл трасс (TRACE_FILE)")
+    parser.add_argument("trace_id", nargs="?", default=None)
+    parser.add_argument("--user", type=int, default=None, help="только запросы пользователя")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    traces = load_spans(args.file)
+
+    if args.trace_id is None:
+        print_slowest(traces, args.user, args.limit)
+    elif args.trace_id not in traces:
+        print(f"Трасса {args.trace_id} не найдена")
+    else:
+        print_trace(traces[args.trace_id])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,13 @@
-from .bot_temp_files import (create_bot_dir, create_user_temp_file, read_user_temp_file, delete_user_temp_dir,
-                             get_user_dir_full_path)
\ No newline at end of file
+from .bot_temp_files import create_bot_dir
+from .image_spool import (create_image_spool, save_user_image, read_user_image, delete_user_images,
+                          MemoryImageSpool, RedisImageSpool)
+from .task_events import TaskEventsListener
+from .blob_store import BlobStore
+from .result_cache import ResultCache, request_key
+from .fair_queue import FairQueue
+from .progress_message import ProgressMessage
+from .task_requesters import TaskRequesters
+from .media_groups import MediaGroupCollector, parse_weights
+from .metrics import (start_metrics_server, QueueDepthCollector, STAGE_SECONDS, REQUEST_SECONDS, GATYS_STEP_SECONDS,
+                      TELEGRAM_SECONDS, JOBS_IN_FLIGHT, BLOB_STORE_WRITTEN_BYTES)
+from .tracing import configure_tracing, install_trace_logging, start_trace, span, trace_headers
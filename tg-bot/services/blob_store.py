@@ -0,0 +1,151 @@
+"""
+Хранилище изображений для передачи между ботом и воркерами celery по схеме claim-check.
+
+Изображение записывается один раз, а через брокер и бэкенд результатов celery (Redis) передаётся только его ключ -
+sha256 содержимого. Одинаковые изображения хранятся в одном экземпляре.
+
+Хранилище - папка на локальном диске (или в /dev/shm для хранения в разделяемой памяти), общая для бота и воркеров.
+Файлы старше ttl секунд удаляются периодической очисткой. Изображения запросов бот удаляет сразу после завершения
+запроса (hold / release): одно и то же изображение может одновременно использоваться несколькими запросами,
+поэтому файл удаляется, когда его отпустил последний из них.
+
+Методы синхронные: воркеры вызывают их напрямую, бот - через asyncio.to_thread.
+"""
+import hashlib
+import os
+import threading
+import time
+
+from .exceptions import BlobNotFound
+from .metrics import BLOB_STORE_WRITTEN_BYTES
+
+
+class BlobStore:
+    """
+    * root - папка хранилища
+    * ttl - время жизни изображения в секундах (отсчитывается от последней записи)
+    * cleanup_interval - как часто (в секундах) при записи запускать очистку устаревших изображений
+    """
+
+    def __init__(self, root: str, ttl: int, cleanup_interval: int = 10 * 60):
+        self.root = root
+        self.ttl = ttl
+        self.cleanup_interval = cleanup_interval
+
+        self._last_cleanup: float = time.time()
+        self._lock = threading.Lock()
+
+        # число запросов этого процесса, удерживающих изображение (см. hold)
+        self._holders: dict[str, int] = {}
+
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def put(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+
+        try:
+            # изображение уже есть - продлеваем его время жизни
+            os.utime(path)
+        except FileNotFoundError:
+            # (в том числе если его только что удалила очистка)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # запись во временный файл и атомарное переименование: читатель не увидит недописанный файл
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+            BLOB_STORE_WRITTEN_BYTES.inc(len(data))
+
+        self._maybe_cleanup()
+
+        return key
+
+    def hold(self, data: bytes) -> str:
+        """
+        Запись изображения, которое использует запрос: оно не удаляется release'ом, пока его удерживает
+        хотя бы один запрос этого процесса.
+        """
+        key = hashlib.sha256(data).hexdigest()
+
+        # запрос учитывается до записи: release другого запроса не удалит уже записанный файл
+        with self._lock:
+            self._holders[key] = self._holders.get(key, 0) + 1
+
+        return self.put(data)
+
+    def release(self, key: str):
+        """
+        Запрос больше не использует изображение: оно удаляется, если его не удерживают другие запросы.
+        """
+        with self._lock:
+            holders = self._holders.get(key, 0) - 1
+            if holders > 0:
+                self._holders[key] = holders
+                return
+
+            self._holders.pop(key, None)
+            self.delete(key)
+
+    def get(self, key: str) -> bytes:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise BlobNotFound(f"Изображение {key} не найдено в хранилище (возможно, истекло время его хранения)")
+
+    def touch(self, key: str):
+        """
+        Продление времени жизни изображения.
+        """
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            raise BlobNotFound(f"Изображение {key} не найдено в хранилище (возможно, истекло время его хранения)")
+
+    def size(self, key: str) -> int:
+        try:
+            return os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            raise BlobNotFound(f"Изображение {key} не найдено в хранилище (возможно, истекло время его хранения)")
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def cleanup(self) -> int:
+        """
+        Удаление изображений, время жизни которых истекло. Возвращает число удалённых файлов.
+        """
+        expired_before = time.time() - self.ttl
+        removed = 0
+
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+
+            for entry in os.scandir(directory.path):
+                try:
+                    if entry.stat().st_mtime < expired_before:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    # файл уже удалил другой процесс
+                    pass
+
+        return removed
+
+    def _maybe_cleanup(self):
+        with self._lock:
+            if time.time() - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = time.time()
+
+        self.cleanup()
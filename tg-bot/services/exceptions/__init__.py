@@ -1,2 +1,3 @@
 from .server_errors import (BaseServerError, TgBotDirNotFound, UserDirNotFound, UserFileNotFound,
-                           UserDirCreationError, UserDirDeletionError)
\ No newline at end of file
+                           UserDirCreationError, UserDirDeletionError, BlobNotFound, TaskNotSubmitted)
+from .user_errors import BaseUserError, QuotaExceeded
\ No newline at end of file
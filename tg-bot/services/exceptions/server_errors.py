@@ -24,4 +24,15 @@ class UserDirCreationError(BaseServerError):
 
 
 class UserDirDeletionError(BaseServerError):
+    pass
+
+
+class BlobNotFound(BaseServerError):
+    pass
+
+
+class TaskNotSubmitted(BaseServerError):
+    """
+    Задача, которую ждали одинаковые запросы, так и не была поставлена в очередь (см. get_stylization).
+    """
     pass
\ No newline at end of file
@@ -0,0 +1,10 @@
+"""
+Модуль с кастомными исключениями для ситуаций, вызванных действиями пользователя.
+"""
+
+class BaseUserError(Exception):
+    pass
+
+
+class QuotaExceeded(BaseUserError):
+    pass
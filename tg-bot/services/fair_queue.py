@@ -0,0 +1,54 @@
+"""
+Правила справедливого распределения очередей задач между пользователями.
+
+Для каждого пользователя и метода стилизации считается число задач, запущенных за последнее окно window секунд:
+* чем больше задач пользователь уже запустил, тем ниже приоритет его новой задачи в очереди celery
+  (в Redis-брокере 0 - наивысший приоритет, 9 - наименьший), поэтому задачи других пользователей его обгоняют
+* при превышении квоты max_requests новая задача не запускается (исключение QuotaExceeded)
+"""
+from redis.asyncio import Redis
+
+from .exceptions import QuotaExceeded
+
+
+LOWEST_PRIORITY = 9
+
+# INCR и EXPIRE одной атомарной операцией: счётчик без времени жизни заблокировал бы пользователя навсегда.
+# Время жизни ставится и счётчику, оставшемуся без него (TTL -1)
+ADMIT_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+
+
+class FairQueue:
+    """
+    * redis - клиент Redis
+    * window - окно подсчёта задач пользователя в секундах
+    * max_requests - квота задач на пользователя за окно для каждого метода стилизации
+    """
+
+    def __init__(self, redis: Redis, window: int, max_requests: dict[str, int], prefix: str = "fair_queue"):
+        self.redis = redis
+        self.window = window
+        self.max_requests = max_requests
+        self.prefix = prefix
+
+        self._admit = redis.register_script(ADMIT_SCRIPT)
+
+    async def admit(self, user_id: int, method: str) -> int:
+        """
+        Учёт новой задачи пользователя. Возвращает приоритет задачи для celery.
+        """
+        key = f"{self.prefix}:{method}:{user_id}"
+
+        count = await self._admit(keys=[key], args=[self.window])
+
+        if count > self.max_requests[method]:
+            raise QuotaExceeded(f"Пользователь {user_id} превысил квоту задач {method}: "
+                                f"{self.max_requests[method]} за {self.window} с")
+
+        return min(count - 1, LOWEST_PRIORITY)
@@ -0,0 +1,135 @@
+"""
+Модуль для хранения изображений пользователей в процессе получения стилизации: сохранение / чтение / удаление.
+
+Изображения хранятся в исходном виде (байты, полученные от Telegram), без перекодирования и без записи на диск.
+Бэкенд хранилища выбирается в конфигурации:
+* memory - LRU-словарь в памяти процесса бота, ограниченный по суммарному объёму
+* redis - хэш на пользователя в Redis со временем жизни (переживает перезапуск процесса бота, но не flushall)
+"""
+import time
+from collections import OrderedDict
+
+from redis.asyncio import Redis
+
+from config import SpoolConfig
+from .exceptions import UserFileNotFound
+
+
+class MemoryImageSpool:
+    """
+    * max_bytes - максимальный суммарный объём изображений, при превышении вытесняются давно сохранённые
+    * ttl - время жизни изображений пользователя в секундах (отсчитывается от последней записи)
+    """
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.size: int = 0
+        self._images: OrderedDict[tuple[int, str], tuple[bytes, float]] = OrderedDict()
+
+    async def put(self, user_id: int, name: str, data: bytes):
+        await self.delete(user_id, name)
+
+        self._images[(user_id, name)] = (data, time.monotonic() + self.ttl)
+        self.size += len(data)
+
+        while self.size > self.max_bytes and len(self._images) > 1:
+            _, (evicted, _) = self._images.popitem(last=False)
+            self.size -= len(evicted)
+
+    async def get(self, user_id: int, name: str) -> bytes:
+        item = self._images.get((user_id, name))
+
+        if item is None or item[1] < time.monotonic():
+            raise UserFileNotFound(f"Изображение {name} пользователя {user_id} не найдено "
+                                   f"(истекло время хранения или вытеснено)")
+
+        self._images.move_to_end((user_id, name))
+        return item[0]
+
+    async def delete(self, user_id: int, name: str):
+        item = self._images.pop((user_id, name), None)
+        if item is not None:
+            self.size -= len(item[0])
+
+    async def delete_user(self, user_id: int):
+        for key in [key for key in self._images if key[0] == user_id]:
+            await self.delete(*key)
+
+
+class RedisImageSpool:
+    """
+    * redis - клиент Redis
+    * ttl - время жизни изображений пользователя в секундах (отсчитывается от последней записи)
+    """
+
+    def __init__(self, redis: Redis, ttl: int, prefix: str = "image_spool"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.prefix}:{user_id}"
+
+    async def put(self, user_id: int, name: str, data: bytes):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            await pipe.hset(self._key(user_id), name, data).expire(self._key(user_id), self.ttl).execute()
+
+    async def get(self, user_id: int, name: str) -> bytes:
+        data = await self.redis.hget(self._key(user_id), name)
+
+        if data is None:
+            raise UserFileNotFound(f"Изображение {name} пользователя {user_id} не найдено "
+                                   f"(истекло время хранения)")
+
+        return data
+
+    async def delete(self, user_id: int, name: str):
+        await self.redis.hdel(self._key(user_id), name)
+
+    async def delete_user(self, user_id: int):
+        await self.redis.delete(self._key(user_id))
+
+
+IMAGE_SPOOL: MemoryImageSpool | RedisImageSpool | None = None
+
+
+async def create_image_spool(spool_config: SpoolConfig, redis: Redis | None = None):
+    """
+    Создание хранилища изображений пользователей по конфигурации. Для бэкенда redis нужен клиент redis.
+    """
+    global IMAGE_SPOOL
+
+    if spool_config.BACKEND == "memory":
+        IMAGE_SPOOL = MemoryImageSpool(max_bytes=spool_config.MAX_BYTES, ttl=spool_config.TTL)
+    elif spool_config.BACKEND == "redis":
+        if redis is None:
+            raise ValueError("Для хранилища изображений redis нужен клиент Redis")
+        IMAGE_SPOOL = RedisImageSpool(redis=redis, ttl=spool_config.TTL)
+    else:
+        raise ValueError(f"Неизвестный бэкенд хранилища изображений: {spool_config.BACKEND}")
+
+
+
+async def save_user_image(user_id: int, img: bytes, name: str):
+    """
+    Сохраняет изображение img пользователя user_id под именем name.
+    """
+    await IMAGE_SPOOL.put(user_id, name, img)
+
+
+
+async def read_user_image(user_id: int, name: str) -> bytes:
+    """
+    Чтение изображения пользователя в исходном виде. Если изображения нет - исключение UserFileNotFound.
+    """
+    return await IMAGE_SPOOL.get(user_id, name)
+
+
+
+async def delete_user_images(user_id: int):
+    """
+    Удаление всех изображений пользователя. Если изображений нет, то ничего не делается.
+    """
+    await IMAGE_SPOOL.delete_user(user_id)
@@ -0,0 +1,79 @@
+"""
+Сбор альбомов Telegram (media group).
+
+Фотографии альбома приходят отдельными сообщениями с общим media_group_id. Первое сообщение альбома ждёт,
+пока сообщения альбома не перестанут приходить (delay секунд после последнего), и получает весь альбом;
+обработчики остальных сообщений получают None и ничего не делают. Сообщения уже собранного альбома, пришедшие
+позже, тоже получают None: иначе опоздавшее фото стало бы отдельным "альбомом" (и, например, было бы сохранено
+как стиль, если диалог уже перешёл к следующему шагу).
+"""
+import asyncio
+import re
+import time
+
+from aiogram.types import Message
+
+
+class MediaGroupCollector:
+    """
+    * delay - сколько секунд после последнего сообщения альбома ждать следующее
+    * done_ttl - сколько секунд помнить собранные альбомы, чтобы отбрасывать их опоздавшие сообщения
+    """
+
+    def __init__(self, delay: float = 0.6, done_ttl: float = 60.0):
+        self.delay = delay
+        self.done_ttl = done_ttl
+
+        self._groups: dict[str, list[Message]] = {}
+        self._last_message_at: dict[str, float] = {}
+        self._done: dict[str, float] = {}
+
+    async def collect(self, message: Message) -> list[Message] | None:
+        """
+        Все сообщения альбома, к которому относится message (одно сообщение, если это не альбом),
+        или None, если альбом обрабатывается другим вызовом или уже собран.
+        """
+        if message.media_group_id is None:
+            return [message]
+
+        group_id = message.media_group_id
+        now = time.monotonic()
+
+        self._done = {done_id: done_at for done_id, done_at in self._done.items() if now - done_at < self.done_ttl}
+        if group_id in self._done:
+            return None
+
+        group = self._groups.get(group_id)
+        if group is not None:
+            group.append(message)
+            self._last_message_at[group_id] = now
+            return None
+
+        self._groups[group_id] = [message]
+        self._last_message_at[group_id] = now
+
+        # ожидание отсчитывается от последнего пришедшего сообщения альбома
+        while (remaining := self._last_message_at[group_id] + self.delay - time.monotonic()) > 0:
+            await asyncio.sleep(remaining)
+
+        self._done[group_id] = time.monotonic()
+        del self._last_message_at[group_id]
+
+        return sorted(self._groups.pop(group_id), key=lambda item: item.message_id)
+
+
+def parse_weights(captions: list[str | None]) -> list[float]:
+    """
+    Веса изображений альбома из подписей: либо одна подпись со всеми весами через пробел ("2 1 1"),
+    либо у каждого изображения своя подпись-число. Отсутствующие и неположительные веса считаются равными 1.
+    """
+    numbers = [[float(number) for number in re.findall(r"\d+(?:[.,]\d+)?", (caption or "").replace(",", "."))]
+               for caption in captions]
+
+    with_weights = [caption_numbers for caption_numbers in numbers if caption_numbers]
+    if len(with_weights) == 1 and len(with_weights[0]) == len(captions) > 1:
+        weights = with_weights[0]
+    else:
+        weights = [caption_numbers[0] if caption_numbers else 1.0 for caption_numbers in numbers]
+
+    return [weight if weight > 0 else 1.0 for weight in weights]
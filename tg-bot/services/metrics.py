@@ -0,0 +1,109 @@
+"""
+Метрики Prometheus бота и воркеров celery.
+
+Бот и воркеры - разные процессы (и воркеров каждого метода может быть несколько), поэтому метрики
+собираются в режиме multiprocess prometheus_client: каждый процесс пишет значения в файлы папки
+PROMETHEUS_MULTIPROC_DIR (задаётся в entrypoint.sh до запуска процессов), а бот отдаёт сумму по всем процессам
+на METRICS_PORT. Без PROMETHEUS_MULTIPROC_DIR каждый процесс хранит метрики у себя, и бот отдаёт только свои.
+
+Этапы (метка stage гистограммы STAGE_SECONDS):
+* воркер: queue_wait (от постановки в очередь до начала выполнения), model_load, decode, resize,
+  batch_wait (ожидание батча внутри воркера Гатиса), build, optimize (Гатис), infer (AdaIN), encode (JPEG)
+* бот: request - полное время получения результата (метка source: cache, coalesced - от такой же задачи, task)
+
+BLOB_STORE_WRITTEN_BYTES - сколько байт изображений записано в хранилище (services/blob_store.py) бота и воркеров,
+то есть не прошло через Redis в сообщениях и результатах celery.
+"""
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, multiprocess, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from redis import Redis, RedisError
+
+
+# папку multiprocess создаёт (и очищает) entrypoint.sh; при запуске без него она создаётся здесь,
+# до первой записи значений метрик
+if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 900)
+STEP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+IO_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+STAGE_SECONDS = Histogram("stylization_stage_seconds", "Время этапов задачи стилизации",
+                          ["method", "stage"], buckets=STAGE_BUCKETS)
+
+REQUEST_SECONDS = Histogram("stylization_request_seconds", "Время получения стилизации ботом",
+                            ["method", "source"], buckets=STAGE_BUCKETS)
+
+GATYS_STEP_SECONDS = Histogram("gatys_step_seconds", "Время одной итерации оптимизации Гатиса",
+                               ["degree"], buckets=STEP_BUCKETS)
+
+TELEGRAM_SECONDS = Histogram("telegram_io_seconds", "Время скачивания фото и отправки результатов в Telegram",
+                             ["operation"], buckets=IO_BUCKETS)
+
+# side=bot - запросы, ожидающие результат задачи; side=worker - выполняющиеся задачи
+JOBS_IN_FLIGHT = Gauge("stylization_jobs_in_flight", "Задачи стилизации в работе",
+                       ["method", "side"], multiprocess_mode="livesum")
+
+# только новые изображения: повторная запись того же содержимого ничего не записывает (адресация по содержимому)
+BLOB_STORE_WRITTEN_BYTES = Counter("blob_store_written_bytes",
+                                   "Байты изображений, переданные через хранилище вместо сообщений celery в Redis")
+
+
+class QueueDepthCollector:
+    """
+    Длина очередей celery в Redis-брокере на момент сбора метрик. У каждой очереди - подочереди приоритетов
+    (см. broker_transport_options в celery_config.py), длина очереди - их сумма.
+    """
+
+    def __init__(self, redis: Redis, queues: list[str], priority_steps: list[int], sep: str):
+        self.redis = redis
+        self.queues = queues
+        self.priority_steps = priority_steps
+        self.sep = sep
+
+    def _keys(self, queue: str) -> list[str]:
+        return [queue if priority == 0 else f"{queue}{self.sep}{priority}" for priority in self.priority_steps]
+
+    def collect(self):
+        depth = GaugeMetricFamily("stylization_queue_depth", "Задачи в очереди celery", labels=["queue"])
+
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for queue in self.queues:
+                for key in self._keys(queue):
+                    pipe.llen(key)
+            lengths = iter(pipe.execute())
+        except RedisError:
+            return
+
+        for queue in self.queues:
+            depth.add_metric([queue], sum(next(lengths) for _ in self._keys(queue)))
+
+        yield depth
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Реестр для отдачи метрик: сумма по всем процессам в режиме multiprocess, иначе - метрики текущего процесса.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def start_metrics_server(port: int, queue_depth: QueueDepthCollector | None = None):
+    """
+    HTTP-сервер метрик (/metrics) в фоновом потоке.
+    """
+    registry = metrics_registry()
+    if queue_depth is not None:
+        registry.register(queue_depth)
+
+    start_http_server(port, registry=registry)
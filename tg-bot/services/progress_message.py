@@ -0,0 +1,105 @@
+"""
+Сообщение со статусом долгой стилизации, которое редактируется по событиям прогресса задачи.
+
+У пользователя всегда одно сообщение статуса: текстовое, а после первого превью - фото с подписью.
+Частота правок ограничена, чтобы не упираться в лимиты Telegram.
+"""
+import logging
+import time
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Message, BufferedInputFile, InputMediaPhoto
+
+from .exceptions import BlobNotFound
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressMessage:
+    """
+    * template - шаблон текста статуса с полями step, total_steps, loss и eta (секунды)
+    * load_preview - получение JPEG-превью по его ключу в хранилище изображений (None - превью не показываются)
+    * min_interval - сообщение редактируется не чаще раза в min_interval секунд
+    """
+
+    def __init__(self, bot: Bot, chat_id: int, template: str,
+                 load_preview: Callable[[str], Awaitable[bytes]] | None = None, min_interval: float = 3.0):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.template = template
+        self.load_preview = load_preview
+        self.min_interval = min_interval
+
+        self.message: Message | None = None
+
+        self._last_update: float = float("-inf")
+        self._busy: bool = False
+        self._closed: bool = False
+
+    async def update(self, event: dict):
+        """
+        Обновление статуса по событию прогресса. События, пришедшие во время правки или слишком часто, пропускаются.
+        """
+        if self._closed or self._busy or time.monotonic() - self._last_update < self.min_interval:
+            return
+
+        self._busy = True
+        try:
+            text = self.template.format(step=event["step"], total_steps=event["total_steps"],
+                                        loss=event["loss"], eta=round(event["eta"]))
+
+            preview = None
+            if self.load_preview is not None and "preview_key" in event:
+                preview = BufferedInputFile(await self.load_preview(event["preview_key"]), filename="preview.jpg")
+
+            await self._show(text, preview)
+            self._last_update = time.monotonic()
+
+        except (TelegramAPIError, BlobNotFound) as error:
+            logger.warning(f"Не удалось обновить статус стилизации в чате {self.chat_id}: {error}")
+
+        finally:
+            self._busy = False
+
+        # задача завершилась, пока отправлялось сообщение
+        if self._closed:
+            await self.delete()
+
+    async def _show(self, text: str, preview: BufferedInputFile | None):
+        if self.message is not None and self.message.photo is None and preview is not None:
+            # текстовое сообщение нельзя превратить в фото - заменяем его
+            await self.message.delete()
+            self.message = None
+
+        if self.message is None:
+            if preview is not None:
+                self.message = await self.bot.send_photo(chat_id=self.chat_id, photo=preview, caption=text)
+            else:
+                self.message = await self.bot.send_message(chat_id=self.chat_id, text=text)
+
+        elif preview is not None:
+            edited = await self.message.edit_media(media=InputMediaPhoto(media=preview, caption=text))
+            if isinstance(edited, Message):
+                self.message = edited
+
+        elif self.message.photo is not None:
+            await self.message.edit_caption(caption=text)
+
+        else:
+            await self.message.edit_text(text=text)
+
+    async def delete(self):
+        """
+        Удаление сообщения статуса после завершения задачи.
+        """
+        self._closed = True
+
+        if self.message is not None and not self._busy:
+            try:
+                await self.message.delete()
+            except TelegramAPIError as error:
+                logger.warning(f"Не удалось удалить статус стилизации в чате {self.chat_id}: {error}")
+            self.message = None
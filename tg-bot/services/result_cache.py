@@ -0,0 +1,139 @@
+"""
+Кэш результатов стилизации.
+
+Ключ запроса - хэш от ключей контента и стиля в хранилище изображений (sha256 их содержимого), метода, степени
+стилизации и версии модели. Значение - ключ результата в хранилище изображений (services/blob_store.py).
+
+Одинаковые запросы, пришедшие одновременно, объединяются: первый запрос занимает ключ in-flight и запускает задачу,
+остальные ждут ту же задачу по её id.
+
+Кэш ограничен суммарным объёмом результатов: при превышении вытесняются записи, к которым дольше всего
+не обращались (LRU по времени последнего обращения). Записи старше ttl удаляются, так как к этому времени
+результат удаляется и из хранилища изображений.
+"""
+import hashlib
+import time
+
+from redis.asyncio import Redis
+
+
+def request_key(content_key: str, style_key: str, method: str, degree: int, model_version: str) -> str:
+    return hashlib.sha256(f"{content_key}:{style_key}:{method}:{degree}:{model_version}".encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    * redis - клиент Redis
+    * max_bytes - максимальный суммарный объём закэшированных результатов
+    * ttl - время жизни записи в секундах (отсчитывается от последнего обращения)
+    * inflight_ttl - сколько секунд хранится метка выполняющейся задачи (на случай, если бот не дождался задачи)
+    """
+
+    def __init__(self, redis: Redis, max_bytes: int, ttl: int, inflight_ttl: int = 60 * 60,
+                 prefix: str = "result_cache"):
+        self.redis = redis
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.inflight_ttl = inflight_ttl
+        self.prefix = prefix
+
+        self._results = f"{prefix}:results"
+        self._sizes = f"{prefix}:sizes"
+        self._lru = f"{prefix}:lru"
+        self._bytes = f"{prefix}:bytes"
+        self._hits = f"{prefix}:hits"
+        self._misses = f"{prefix}:misses"
+
+    async def get(self, key: str) -> str | None:
+        """
+        Ключ результата в хранилище изображений или None. Учитывается в счётчиках попаданий и промахов.
+        """
+        result_key, last_access = await (self.redis.pipeline(transaction=False)
+                                         .hget(self._results, key).zscore(self._lru, key).execute())
+
+        if result_key is None or last_access is None or last_access < time.time() - self.ttl:
+            await self.redis.incr(self._misses)
+            return None
+
+        await self.redis.pipeline(transaction=False).incr(self._hits).zadd(self._lru, {key: time.time()}).execute()
+        return result_key.decode()
+
+    async def put(self, key: str, result_key: str, size: int) -> list[str]:
+        """
+        Сохранение результата размером size байт. Возвращает ключи результатов вытесненных записей
+        (их можно удалить из хранилища изображений).
+        """
+        await self.discard(key)
+        await (self.redis.pipeline(transaction=True)
+               .hset(self._results, key, result_key)
+               .hset(self._sizes, key, size)
+               .zadd(self._lru, {key: time.time()})
+               .incrby(self._bytes, size)
+               .execute())
+
+        return await self._evict(keep=key)
+
+    async def discard(self, key: str) -> str | None:
+        """
+        Удаление записи (например, если результат уже удалён из хранилища изображений).
+        """
+        result_key, size = await (self.redis.pipeline(transaction=False)
+                                  .hget(self._results, key).hget(self._sizes, key).execute())
+        if result_key is None:
+            return None
+
+        await (self.redis.pipeline(transaction=True)
+               .hdel(self._results, key)
+               .hdel(self._sizes, key)
+               .zrem(self._lru, key)
+               .decrby(self._bytes, int(size or 0))
+               .execute())
+
+        return result_key.decode()
+
+    async def _evict(self, keep: str) -> list[str]:
+        evicted = []
+
+        # сначала - устаревшие записи
+        for key in await self.redis.zrangebyscore(self._lru, "-inf", time.time() - self.ttl):
+            result_key = await self.discard(key.decode())
+            if result_key is not None:
+                evicted.append(result_key)
+
+        # затем - давно не используемые, пока объём не уложится в лимит
+        while int(await self.redis.get(self._bytes) or 0) > self.max_bytes:
+            oldest = await self.redis.zrange(self._lru, 0, 0)
+            if not oldest or oldest[0].decode() == keep:
+                break
+
+            result_key = await self.discard(oldest[0].decode())
+            if result_key is not None:
+                evicted.append(result_key)
+
+        return evicted
+
+    async def claim(self, key: str, task_id: str) -> str | None:
+        """
+        Попытка стать единственным исполнителем запроса key задачей task_id.
+        Возвращает None, если попытка удалась, иначе - id уже выполняющейся задачи с тем же запросом.
+        """
+        inflight = f"{self.prefix}:inflight:{key}"
+
+        if await self.redis.set(inflight, task_id, nx=True, ex=self.inflight_ttl):
+            return None
+
+        running_task_id = await self.redis.get(inflight)
+        if running_task_id is None:
+            # задача успела завершиться между проверками - пробуем ещё раз
+            return await self.claim(key, task_id)
+
+        return running_task_id.decode()
+
+    async def release(self, key: str):
+        await self.redis.delete(f"{self.prefix}:inflight:{key}")
+
+    async def stats(self) -> dict[str, int]:
+        hits, misses, size, entries = await (self.redis.pipeline(transaction=False)
+                                             .get(self._hits).get(self._misses).get(self._bytes)
+                                             .zcard(self._lru).execute())
+        return {"hits": int(hits or 0), "misses": int(misses or 0), "bytes": int(size or 0), "entries": entries}
@@ -0,0 +1,107 @@
+"""
+Ожидание завершения задач celery по событиям из Redis pub/sub.
+
+На весь процесс бота - одна подписка на канал событий, поэтому нагрузка на Redis не зависит от числа
+ожидающих пользователей. На случай потери события (pub/sub не хранит сообщения) готовность задачи
+дополнительно проверяется с большим интервалом.
+
+События прогресса долгих задач передаются в callback, указанный при ожидании задачи.
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable
+
+from celery.result import AsyncResult
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from celery_config import PROGRESS_STATE
+
+
+logger = logging.getLogger(__name__)
+
+
+class TaskEventsListener:
+    def __init__(self, redis: Redis, channel: str, poll_interval: float = 30.0):
+        self.redis = redis
+        self.channel = channel
+        self.poll_interval = poll_interval
+
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._progress_callbacks: dict[str, list[Callable[[dict], Awaitable[None]]]] = {}
+        self._listener: asyncio.Task | None = None
+        # ссылки на выполняющиеся callback прогресса, чтобы их задачи не собрал сборщик мусора
+        self._callback_tasks: set[asyncio.Task] = set()
+
+    async def wait(self, result: AsyncResult, on_progress: Callable[[dict], Awaitable[None]] | None = None,
+                   timeout: float | None = None):
+        """
+        Ожидание готовности результата задачи.
+        * on_progress - корутина, вызываемая с каждым событием прогресса задачи (не дожидаясь её завершения)
+        * timeout - наибольшее время ожидания в секундах, после него - исключение asyncio.TimeoutError
+        """
+        self._ensure_started()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+
+        future = loop.create_future()
+        self._waiters.setdefault(result.id, []).append(future)
+        if on_progress is not None:
+            self._progress_callbacks.setdefault(result.id, []).append(on_progress)
+
+        try:
+            # Проверка готовности после регистрации ожидания: задача могла завершиться до подписки
+            while not result.ready():
+                interval = self.poll_interval
+                if deadline is not None:
+                    interval = min(interval, deadline - loop.time())
+                    if interval <= 0:
+                        raise asyncio.TimeoutError(f"Задача {result.id} не завершилась за {timeout} с")
+
+                done, _ = await asyncio.wait({future}, timeout=interval)
+                if done:
+                    break
+        finally:
+            waiters = self._waiters.get(result.id, [])
+            if future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._waiters.pop(result.id, None)
+
+            callbacks = self._progress_callbacks.get(result.id, [])
+            if on_progress in callbacks:
+                callbacks.remove(on_progress)
+            if not callbacks:
+                self._progress_callbacks.pop(result.id, None)
+
+    def _ensure_started(self):
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._dispatch(json.loads(message["data"]))
+
+            except (RedisError, OSError) as error:
+                logger.error(f"Подписка на события задач прервана: {error}. Переподключение...")
+                await asyncio.sleep(1)
+
+    def _dispatch(self, event: dict):
+        if event["state"] == PROGRESS_STATE:
+            for callback in self._progress_callbacks.get(event["task_id"], []):
+                task = asyncio.create_task(callback(event))
+                self._callback_tasks.add(task)
+                task.add_done_callback(self._callback_tasks.discard)
+            return
+
+        for future in self._waiters.get(event["task_id"], []):
+            if not future.done():
+                future.set_result(event)
@@ -0,0 +1,29 @@
+"""
+Учёт пользователей, ожидающих результат задачи celery (для кооперативной отмены, см. ml_services/cancellation.py).
+
+Одну задачу могут ждать несколько пользователей (одинаковые запросы объединяются), поэтому задача отменяется,
+только когда от неё отказались все. Время жизни множества ожидающих - дедлайн задачи.
+"""
+from redis.asyncio import Redis
+
+from celery_config import TASK_REQUESTERS_KEY
+
+
+class TaskRequesters:
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    async def add(self, task_id: str, user_id: int, deadline: int):
+        """
+        Пользователь user_id ждёт задачу task_id. Дедлайн (в секундах) задаётся первым ожидающим и не продлевается.
+        """
+        key = TASK_REQUESTERS_KEY.format(task_id=task_id)
+        await self.redis.pipeline(transaction=True).sadd(key, user_id).expire(key, deadline, nx=True).execute()
+
+    async def remove(self, task_id: str, user_id: int) -> bool:
+        """
+        Пользователь больше не ждёт задачу. Возвращает True, если задачу больше никто не ждёт (она будет отменена).
+        """
+        key = TASK_REQUESTERS_KEY.format(task_id=task_id)
+        _, left = await self.redis.pipeline(transaction=True).srem(key, user_id).scard(key).execute()
+        return left == 0
@@ -0,0 +1,216 @@
+"""
+Трассировка запросов на стилизацию: от нажатия кнопки степени в боте до выполнения задачи воркером и обратно.
+
+Бот создаёт trace_id на каждый запрос (start_trace) и передаёт его воркеру в заголовках задачи celery
+(trace_headers), воркер продолжает трассу (см. ml_services/task_tracing.py). trace_id текущего запроса хранится
+в contextvar и добавляется во все записи логов обеих сторон (атрибут trace_id, см. install_trace_logging).
+
+Каждый этап - span с временем начала и конца. Span'ы пишутся построчно в JSONL-файл (поля - как в OTLP:
+trace_id, span_id, parent_span_id, name, start_time_unix_nano, end_time_unix_nano, attributes), общий для бота
+и воркеров. По файлу восстанавливается критический путь любого запроса: scripts/trace_report.py.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+
+# заголовки задачи celery с контекстом трассы
+TRACE_ID_HEADER = "trace_id"
+PARENT_SPAN_ID_HEADER = "parent_span_id"
+
+TRACE_ID: contextvars.ContextVar[str | None] = contextvars.ContextVar("trace_id", default=None)
+SPAN_ID: contextvars.ContextVar[str | None] = contextvars.ContextVar("span_id", default=None)
+
+
+class TraceWriter:
+    """
+    Запись span'ов в JSONL-файл. write только ставит строку в очередь: файл дописывает фоновый поток, чтобы
+    дисковый ввод-вывод не блокировал цикл событий бота. Поток забирает все накопившиеся строки и открывает файл
+    в режиме дозаписи на каждую пачку: строки разных процессов не перемешиваются. После fork поток и очередь
+    создаются заново в дочернем процессе. При превышении max_bytes файл переименовывается в path.1.
+    """
+
+    def __init__(self, path: str, service: str, max_bytes: int = 64 * 2**20):
+        self.path = path
+        self.service = service
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self._queue: queue.SimpleQueue[str | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        atexit.register(self.close)
+
+    def write(self, record: dict):
+        line = json.dumps({**record, "service": self.service}, ensure_ascii=False) + "\n"
+
+        if self._pid != os.getpid():
+            self._start()
+
+        self._queue.put(line)
+
+    def close(self):
+        """
+        Запись строк, оставшихся в очереди, и остановка фонового потока.
+        """
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None:
+                return
+
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+            self._pid = None
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            lines = [self._queue.get()]
+            while not self._queue.empty():
+                lines.append(self._queue.get())
+
+            self._append([line for line in lines if line is not None])
+
+            if None in lines:
+                return
+
+    def _append(self, lines: list[str]):
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        except OSError:
+            # трассы не должны останавливать фоновый поток: следующие span'ы запишутся, когда файл станет доступен
+            logging.getLogger(__name__).exception(f"Не удалось записать {len(lines)} span(ов) в {self.path}")
+
+
+WRITER: TraceWriter | None = None
+
+
+def configure_tracing(path: str, service: str):
+    """
+    Включение записи span'ов в файл path (пустой путь - трассировка выключена). service - имя стороны: bot / worker.
+    """
+    global WRITER
+    if WRITER is not None:
+        WRITER.close()
+
+    WRITER = TraceWriter(path, service) if path else None
+
+
+def install_trace_logging():
+    """
+    Добавление trace_id текущего запроса (или "-") во все записи логов процесса: форматы логов бота и воркеров
+    используют его как обычное поле записи.
+    """
+    factory = logging.getLogRecordFactory()
+    if getattr(factory, "with_trace_id", False):
+        return
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id = TRACE_ID.get() or "-"
+        return record
+
+    record_factory.with_trace_id = True
+    logging.setLogRecordFactory(record_factory)
+
+
+def new_id(size: int = 8) -> str:
+    return secrets.token_hex(size)
+
+
+def record_span(name: str, start: float, end: float, span_id: str | None = None, parent_span_id: str | None = None,
+                **attributes):
+    """
+    Запись span'а с известными временами начала и конца (time.time()) в текущей трассе.
+    """
+    trace_id = TRACE_ID.get()
+    if WRITER is None or trace_id is None:
+        return
+
+    WRITER.write({
+        "trace_id": trace_id,
+        "span_id": span_id or new_id(),
+        "parent_span_id": parent_span_id if parent_span_id is not None else SPAN_ID.get(),
+        "name": name,
+        "start_time_unix_nano": int(start * 1e9),
+        "end_time_unix_nano": int(end * 1e9),
+        "attributes": attributes
+    })
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Span этапа внутри текущей трассы; вложенные span'ы становятся его потомками.
+    Возвращает словарь атрибутов span'а, который можно дополнить до его завершения.
+    Вне трассы (и при выключенной трассировке) ничего не записывается.
+    """
+    if WRITER is None or TRACE_ID.get() is None:
+        yield attributes
+        return
+
+    span_id = new_id()
+    parent_span_id = SPAN_ID.get()
+    token = SPAN_ID.set(span_id)
+    start = time.time()
+
+    try:
+        yield attributes
+    except BaseException as error:
+        attributes["error"] = type(error).__name__
+        raise
+    finally:
+        SPAN_ID.reset(token)
+        record_span(name, start, time.time(), span_id=span_id, parent_span_id=parent_span_id, **attributes)
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """
+    Новая трасса с корневым span'ом name. Возвращает словарь атрибутов корневого span'а.
+    """
+    trace_token = TRACE_ID.set(new_id(16))
+    span_token = SPAN_ID.set(None)
+
+    try:
+        with span(name, **attributes) as root_attributes:
+            yield root_attributes
+    finally:
+        SPAN_ID.reset(span_token)
+        TRACE_ID.reset(trace_token)
+
+
+def trace_headers() -> dict[str, str]:
+    """
+    Заголовки задачи celery для продолжения текущей трассы на воркере.
+    """
+    trace_id = TRACE_ID.get()
+    if trace_id is None:
+        return {}
+
+    return {TRACE_ID_HEADER: trace_id, PARENT_SPAN_ID_HEADER: SPAN_ID.get() or ""}
@@ -1 +1,2 @@
-from .image_convert import image_to_bytes, bytes_to_image
\ No newline at end of file
+from .image_convert import image_to_bytes, bytes_to_image
+from .contact_sheet import make_contact_sheet
\ No newline at end of file
@@ -0,0 +1,26 @@
+from PIL import Image, ImageDraw
+
+
+def make_contact_sheet(images: list[Image.Image], labels: list[str], thumb_size: int = 256,
+                       label_height: int = 24) -> Image.Image:
+    """
+    Склейка изображений в один ряд (каждое уменьшается до thumb_size по большей стороне) с подписями под ними.
+    """
+    thumbs = []
+    for img in images:
+        thumb = img.convert("RGB")
+        thumb.thumbnail((thumb_size, thumb_size))
+        thumbs.append(thumb)
+
+    cell_height = max(thumb.height for thumb in thumbs)
+    sheet = Image.new("RGB", (thumb_size * len(thumbs), cell_height + label_height), "white")
+    draw = ImageDraw.Draw(sheet)
+
+    for i, (thumb, label) in enumerate(zip(thumbs, labels)):
+        left = i * thumb_size
+        sheet.paste(thumb, (left + (thumb_size - thumb.width) // 2, (cell_height - thumb.height) // 2))
+
+        text_width = draw.textlength(label)
+        draw.text((left + (thumb_size - text_width) / 2, cell_height + label_height / 4), label, fill="black")
+
+    return sheet